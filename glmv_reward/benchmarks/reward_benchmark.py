@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the throughput of `RewardSystem.get_reward` on synthetic rollouts.
+
+The rollouts cover every verifier type of the datasources in the config, and mix exact matches, answers which need
+the LLM judge, wrong answers and malformed responses. The LLM judge is served by a local mock with configurable
+latency, so the benchmark runs offline. Each setting of batch size and duplication rate reports items/s and the
+p50/p99 latency of `get_reward`, and the results are written to JSON, to be compared with a baseline of an earlier
+commit by `--baseline`.
+
+Usage (from the `glmv_reward` directory):
+    python benchmarks/reward_benchmark.py --batch-sizes 64 256 --duplication-rates 0.0 0.5 --output results.json
+    python benchmarks/reward_benchmark.py --baseline results.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+import msgspec
+import numpy as np
+
+from glmv_reward.configs import RewardSystemConfig
+from glmv_reward.reward_system import RewardSystem
+from glmv_reward.utils.mock_judge_server import MockJudgeServer
+from glmv_reward.utils.msgspec import get_struct_tag
+from glmv_reward.utils.serialization import load_yaml
+
+
+class SyntheticTask(NamedTuple):
+    """A prompt, its ground truth and the candidate responses of its rollouts."""
+
+    prompt: str
+    gt_answer: str
+    # * each rollout picks one of the candidates, in the order of: exact matches, answers which need the LLM judge,
+    # * wrong answers and malformed responses
+    candidates: tuple[str, ...]
+
+
+def _boxed(answer: str, thinking: str = "Let me work it out.") -> str:
+    return f"<think>{thinking}</think><answer><|begin_of_box|>{answer}<|end_of_box|></answer>"
+
+
+def _make_numeric_task(index: int) -> SyntheticTask:
+    return SyntheticTask(
+        prompt=f"What is {index} + 1/2?",
+        gt_answer=_boxed(f"{index}.5"),
+        candidates=(
+            _boxed(f"{index}.5"),
+            _boxed(f"{2 * index + 1}/2"),
+            _boxed(f"{index + 1}"),
+            f"The answer is {index}.5",
+        ),
+    )
+
+
+def _make_text_task(index: int) -> SyntheticTask:
+    return SyntheticTask(
+        prompt=f"Which city hosts the landmark number {index}?",
+        gt_answer=_boxed(f"City {index}"),
+        candidates=(
+            _boxed(f"City {index}"),
+            _boxed(f"It is city {index}"),
+            _boxed(f"Town {index + 1}"),
+            f"It is City {index}",
+        ),
+    )
+
+
+def _make_ocr_task(index: int) -> SyntheticTask:
+    return SyntheticTask(
+        prompt=f"<|begin_of_image|><|end_of_image|>\nRead the text on sign {index}.",
+        gt_answer=_boxed(f"UNION OYSTER HOUSE {index}"),
+        candidates=(
+            _boxed(f"UNION OYSTER HOUSE {index}"),
+            _boxed(f"UNION OYSTER {index}"),
+            _boxed(f"THE UNION BAR {index + 1}"),
+            f"UNION OYSTER HOUSE {index}",
+        ),
+    )
+
+
+def _make_counting_task(index: int) -> SyntheticTask:
+    count = index % 20 + 1
+    return SyntheticTask(
+        prompt="<|begin_of_image|><|end_of_image|>\nHow many people are in the photo?",
+        gt_answer=_boxed(str(count)),
+        candidates=(
+            _boxed(str(count)),
+            _boxed(f"{count} people"),
+            _boxed(str(count + 1)),
+            f"There are {count} people.",
+        ),
+    )
+
+
+def _make_geoquest_task(index: int) -> SyntheticTask:
+    return SyntheticTask(
+        prompt=f"<|begin_of_image|><|end_of_image|>\nWhere was photo {index} taken?",
+        gt_answer=_boxed(json.dumps({"place_name": f"Park {index}", "address": f"{index} Main Street, Springfield"})),
+        candidates=(
+            _boxed(f"Park {index}, Springfield"),
+            _boxed("A park in a city"),
+            "Somewhere with trees.",
+        ),
+    )
+
+
+def _make_language_mix_task(index: int) -> SyntheticTask:
+    return SyntheticTask(
+        prompt=f"Translate sentence {index} into English.",
+        gt_answer=_boxed(""),
+        candidates=(
+            f"<think>I need to translate sentence {index}.</think><answer>This is sentence {index}.</answer>",
+            f"<think>我需要翻译第 {index} 句。</think><answer>This is sentence {index}.</answer>",
+            f"<think>I need to translate sentence {index}.</think><answer>这是第 {index} 句 in English.</answer>",
+        ),
+    )
+
+
+def _make_androidworld_task(index: int) -> SyntheticTask:
+    x, y = 100 + index % 500, 200 + index % 300
+
+    def action(box: str, action_type: str = "click") -> str:
+        return (
+            f"<think>Memory: None\nReason: Click the button {index}.</think><answer>Action: "
+            f'<|begin_of_box|>{{"action_type": "{action_type}", "box_2d": [[{box}]]}}<|end_of_box|></answer>'
+        )
+
+    return SyntheticTask(
+        prompt=f"Open the settings of app {index}.",
+        gt_answer=action(f"{x},{y},{x + 100},{y + 50}"),
+        candidates=(
+            action(f"{x},{y},{x + 100},{y + 50}"),
+            action(f"{x + 10},{y + 5},{x + 110},{y + 55}"),
+            action(f"{x},{y},{x + 100},{y + 50}", action_type="wait"),
+            "Action: click the button",
+        ),
+    )
+
+
+def _make_osworld_task(index: int) -> SyntheticTask:
+    x, y = 100 + index % 500, 200 + index % 300
+    return SyntheticTask(
+        prompt=f"Open the file {index}.",
+        gt_answer=_boxed(f"left_click(start_box='[{x}, {y}]')", thinking="Click the file."),
+        candidates=(
+            _boxed(f"left_click(start_box='[{x}, {y}]')", thinking="Click the file."),
+            _boxed(f"left_click(start_box='[{x + 10}, {y - 10}]')", thinking="Click the file."),
+            _boxed(f"right_click(start_box='[{x}, {y}]')", thinking="Click the file."),
+            "Action: left_click",
+        ),
+    )
+
+
+def _make_webvoyager_task(index: int) -> SyntheticTask:
+    x, y = 100 + index % 500, 100 + index % 300
+    return SyntheticTask(
+        prompt=f"Find the recipe {index}.",
+        gt_answer=_boxed(f"CLICK(point=({x}, {y}), element_info='Recipe {index}')", thinking=""),
+        candidates=(
+            _boxed(f"CLICK(point=({x}, {y}), element_info='Recipe {index}')", thinking=""),
+            _boxed(f"CLICK(point=({x + 16}, {y}), element_info='Recipe {index}')", thinking=""),
+            _boxed("KEY_PRESS(key='Enter')", thinking=""),
+            "CLICK the recipe",
+        ),
+    )
+
+
+# * verifier type -> synthetic task of the given index
+TASK_FACTORIES: dict[str, Callable[[int], SyntheticTask]] = {
+    "biology": _make_text_task,
+    "chart": _make_numeric_task,
+    "chemistry": _make_numeric_task,
+    "counting": _make_counting_task,
+    "general": _make_text_task,
+    "geography": _make_text_task,
+    "geoquest": _make_geoquest_task,
+    "language_mix": _make_language_mix_task,
+    "liberal_arts": _make_text_task,
+    "math": _make_numeric_task,
+    "mmsi": _make_numeric_task,
+    "multi_image": _make_numeric_task,
+    "ocr": _make_ocr_task,
+    "physics": _make_numeric_task,
+    "vqa": _make_text_task,
+    "androidworld": _make_androidworld_task,
+    "osworld": _make_osworld_task,
+    "webvoyager": _make_webvoyager_task,
+}
+
+
+class RolloutBatch(NamedTuple):
+    prompts: list[str]
+    answers: list[str]
+    gt_answers: list[str]
+    datasources: list[str]
+
+
+def generate_batch(
+    datasources: list[str],
+    verifier_types: dict[str, str],
+    batch_size: int,
+    rollouts_per_prompt: int,
+    duplication_rate: float,
+    first_task_index: int,
+    rng: random.Random,
+) -> RolloutBatch:
+    """
+    Generate `batch_size` rollouts, `rollouts_per_prompt` for each prompt, cycling over the datasources.
+
+    A rollout copies an earlier rollout of its prompt with the probability of `duplication_rate`, otherwise it
+    picks a candidate response with its own thinking, so that only the extracted answers can repeat.
+    """
+    batch = RolloutBatch([], [], [], [])
+    task_index = first_task_index
+    while len(batch.prompts) < batch_size:
+        datasource = datasources[task_index % len(datasources)]
+        task = TASK_FACTORIES[verifier_types[datasource]](task_index)
+        responses: list[str] = []
+        for rollout_index in range(min(rollouts_per_prompt, batch_size - len(batch.prompts))):
+            if len(responses) > 0 and rng.random() < duplication_rate:
+                responses.append(rng.choice(responses))
+                continue
+            response = rng.choice(task.candidates)
+            responses.append(response.replace("<think>", f"<think>Attempt {rollout_index}. ", 1))
+        batch.prompts.extend([task.prompt] * len(responses))
+        batch.answers.extend(responses)
+        batch.gt_answers.extend([task.gt_answer] * len(responses))
+        batch.datasources.extend([datasource] * len(responses))
+        task_index += 1
+    return batch
+
+
+def load_benchmark_config(config_path: str, judge_url: str, overrides: dict[str, Any]) -> RewardSystemConfig:
+    """
+    Load the reward system config, with all the LLM judges pointed at the mock judge.
+    """
+    config_dict = load_yaml(config_path)
+    for reward_config in config_dict["reward_configs"].values():
+        if "llm_judge_url" in reward_config:
+            judge_urls = reward_config["llm_judge_url"]
+            reward_config["llm_judge_url"] = (
+                [judge_url] * len(judge_urls) if isinstance(judge_urls, list) else judge_url
+            )
+    config_dict.update(overrides)
+    return msgspec.convert(config_dict, RewardSystemConfig)
+
+
+def run_setting(
+    reward_system: RewardSystem,
+    judge_server: MockJudgeServer,
+    datasources: list[str],
+    verifier_types: dict[str, str],
+    args: argparse.Namespace,
+    batch_size: int,
+    duplication_rate: float,
+    rng: random.Random,
+    first_task_index: int,
+) -> tuple[dict[str, Any], int]:
+    latencies = []
+    num_items = 0
+    num_requests = 0
+    task_index = first_task_index
+    for batch_index in range(args.warmup_batches + args.num_batches):
+        batch = generate_batch(
+            datasources, verifier_types, batch_size, args.rollouts_per_prompt, duplication_rate, task_index, rng
+        )
+        # * every batch has new prompts and a new iteration, so that no verdict is cached between batches
+        task_index += len(batch.prompts)
+        kwargs = {**batch._asdict(), "current_iteration": task_index}
+
+        num_requests_before = judge_server.num_requests
+        started_at = time.perf_counter()
+        if args.use_async:
+            asyncio.run(reward_system.aget_reward(**kwargs))
+        else:
+            reward_system.get_reward(**kwargs)
+        latency = time.perf_counter() - started_at
+
+        if batch_index >= args.warmup_batches:
+            latencies.append(latency)
+            num_items += len(batch.prompts)
+            num_requests += judge_server.num_requests - num_requests_before
+
+    result = {
+        "batch_size": batch_size,
+        "duplication_rate": duplication_rate,
+        "num_batches": args.num_batches,
+        "num_items": num_items,
+        "items_per_second": num_items / sum(latencies),
+        "latency_p50": float(np.percentile(latencies, 50)),
+        "latency_p99": float(np.percentile(latencies, 99)),
+        "latency_mean": float(np.mean(latencies)),
+        "judge_requests_per_item": num_requests / num_items,
+    }
+    return result, task_index
+
+
+def compare_with_baseline(results: list[dict[str, Any]], baseline_path: str, threshold: float) -> bool:
+    """
+    Print the relative change of each setting against the baseline.
+
+    Returns:
+        True if the items/s of any setting dropped by more than `threshold`.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    baseline_results = {(r["batch_size"], r["duplication_rate"]): r for r in baseline["results"]}
+
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    has_regression = False
+    for result in results:
+        baseline_result = baseline_results.get((result["batch_size"], result["duplication_rate"]))
+        if baseline_result is None:
+            continue
+        throughput_change = result["items_per_second"] / baseline_result["items_per_second"] - 1
+        p99_change = result["latency_p99"] / baseline_result["latency_p99"] - 1
+        is_regression = throughput_change < -threshold
+        has_regression = has_regression or is_regression
+        print(
+            f"  batch_size={result['batch_size']:<6} duplication_rate={result['duplication_rate']:<5} "
+            f"items/s {throughput_change:+.1%}  p99 {p99_change:+.1%}" + ("  REGRESSION" if is_regression else "")
+        )
+    return has_regression
+
+
+def get_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="configs/full_config.yaml", help="Reward system config.")
+    parser.add_argument(
+        "--datasources", nargs="+", default=None, help="Datasources to benchmark, defaults to all of the config."
+    )
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[64, 256])
+    parser.add_argument("--duplication-rates", nargs="+", type=float, default=[0.0, 0.5])
+    parser.add_argument("--rollouts-per-prompt", type=int, default=8)
+    parser.add_argument("--num-batches", type=int, default=5, help="Timed batches of each setting.")
+    parser.add_argument("--warmup-batches", type=int, default=1, help="Untimed batches before each setting.")
+    parser.add_argument("--judge-latency", type=float, default=0.05, help="Seconds of the mock judge latency.")
+    parser.add_argument("--judge-latency-jitter", type=float, default=0.0)
+    parser.add_argument("--judge-error-rate", type=float, default=0.0, help="Fraction of the mock judge 500 errors.")
+    parser.add_argument("--judge-throttle-rate", type=float, default=0.0, help="Fraction of the mock judge 429 errors.")
+    parser.add_argument("--executor-type", choices=["thread", "process"], default=None)
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Benchmark `aget_reward`.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--log-level", default="ERROR", help="Level of the reward system logs, the rollouts are meant to log warnings."
+    )
+    parser.add_argument("--output", default=None, help="JSON file to write the results to.")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare with.")
+    parser.add_argument(
+        "--regression-threshold",
+        type=float,
+        default=0.1,
+        help="Exit with 1 if items/s drops by more than this fraction against the baseline.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    logging.getLogger("glmv_reward").setLevel(args.log_level)
+    rng = random.Random(args.seed)  # noqa: S311
+
+    overrides: dict[str, Any] = {}
+    if args.executor_type is not None:
+        overrides["executor_type"] = args.executor_type
+
+    with MockJudgeServer(
+        latency=args.judge_latency,
+        latency_jitter=args.judge_latency_jitter,
+        error_rate=args.judge_error_rate,
+        throttle_rate=args.judge_throttle_rate,
+        seed=args.seed,
+    ) as judge_server:
+        config = load_benchmark_config(args.config, judge_server.url, overrides)
+        with RewardSystem(config) as reward_system:
+            datasources = args.datasources or [
+                datasource for datasource in reward_system.datasource_reward_configs if datasource != "default"
+            ]
+            verifier_types = {}
+            for datasource in datasources:
+                verifier_type = get_struct_tag(reward_system.get_reward_config_from_datasource(datasource))
+                if verifier_type is None or verifier_type.lower() not in TASK_FACTORIES:
+                    err_msg = f"No synthetic rollouts for the verifier of datasource {datasource}: {verifier_type}."
+                    raise ValueError(err_msg)
+                verifier_types[datasource] = verifier_type.lower()
+
+            results = []
+            task_index = 0
+            for batch_size in args.batch_sizes:
+                for duplication_rate in args.duplication_rates:
+                    result, task_index = run_setting(
+                        reward_system,
+                        judge_server,
+                        datasources,
+                        verifier_types,
+                        args,
+                        batch_size,
+                        duplication_rate,
+                        rng,
+                        task_index,
+                    )
+                    results.append(result)
+                    print(
+                        f"batch_size={batch_size:<6} duplication_rate={duplication_rate:<5} "
+                        f"items/s={result['items_per_second']:10.1f}  p50={result['latency_p50'] * 1000:9.1f}ms  "
+                        f"p99={result['latency_p99'] * 1000:9.1f}ms  "
+                        f"judge_requests/item={result['judge_requests_per_item']:.3f}"
+                    )
+
+    report = {
+        "commit": get_commit(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": vars(args),
+        "datasources": verifier_types,
+        "results": results,
+    }
+    if args.output is not None:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline is not None and compare_with_baseline(results, args.baseline, args.regression_threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the text utilities of `glmv_reward.utils.text` against their earlier implementations on long responses.
+
+Each case runs the current and the reference implementation on the same synthetic responses of a few shapes, checks
+that their outputs are identical and reports the mean time of both on each shape and the speedup.
+
+Usage (from the `glmv_reward` directory):
+    python benchmarks/text_benchmark.py --length 50000 --repeat 5 --output text_results.json
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+from glmv_reward.utils.text import (
+    detect_long_paragraph_mixing,
+    detect_long_paragraph_mixings,
+    detect_repeat,
+    detect_repeats,
+    find_boxed_content_with_boxed,
+)
+
+
+class BenchmarkCase(NamedTuple):
+    name: str
+    function: Callable[[str], Any]
+    reference: Callable[[str], Any]
+    # * the synthetic responses of a length, by shape
+    make_texts: Callable[[int, random.Random], dict[str, str]]
+
+
+def _reference_find_boxed_content_with_boxed(text: str) -> list[str]:
+    results = []
+    i = 0
+    while i < len(text):
+        if text[i : i + 7] == "\\boxed{":
+            i += 7
+            content = ""
+            brace_count = 1
+            while i < len(text) and brace_count > 0:
+                if text[i] == "{":
+                    brace_count += 1
+                elif text[i] == "}":
+                    brace_count -= 1
+                if brace_count > 0:
+                    content += text[i]
+                i += 1
+            results.append(content)
+        else:
+            i += 1
+    return results
+
+
+def _reference_detect_repeat(text: str, min_chars: int = 50, min_repetition: int = 10, exclude_length: int = 3) -> bool:
+    text = re.sub(r"\|[-]+\|", "|", text)
+    for ch in ["=", "|", "-", "~", "_", "#", "*", ".", "%", "－", "█", " ", "─"]:
+        text = re.sub(rf"{re.escape(ch)}{{{exclude_length},}}", "", text)
+
+    times: dict[int, int] = {}
+    for i in range(min_chars, len(text) + 1):
+        hash_val = hash(text[i - min_chars : i])
+        if hash_val in times:
+            times[hash_val] += 1
+            if times[hash_val] >= min_repetition:
+                return True
+        else:
+            times[hash_val] = 1
+    return False
+
+
+def _reference_detect_long_paragraph_mixing(
+    text: str, min_chinese_chars: int = 50, min_english_words: int = 200
+) -> bool:
+    paragraphs = [p.strip() for p in re.split(r"\n{2,}", text) if p.strip()]
+    has_long_chinese = False
+    has_long_english = False
+    for para in paragraphs:
+        chinese_count = len(re.findall(r"[\u4e00-\u9fff]", para))
+        english_count = len(re.findall(r"\b[a-zA-Z]{2,}\b", para))
+        if chinese_count >= min_chinese_chars and chinese_count / len(para) > 0.8:
+            has_long_chinese = True
+        if english_count >= min_english_words and english_count / (len(para.split()) + 1e-5) > 0.7:
+            has_long_english = True
+        if has_long_chinese and has_long_english:
+            return True
+    return has_long_chinese and has_long_english
+
+
+def _split_rollouts(text: str) -> list[str]:
+    return text.split("\n\n")
+
+
+def _make_reasoning(length: int, rng: random.Random) -> str:
+    words = ["so", "the", "value", "of", "x", "is", "then", "we", "get", "\\frac{1}{2}", "a^{2}", "=", "+"]
+    text = ""
+    while len(text) < length:
+        text += " ".join(rng.choices(words, k=64)) + ".\n"
+    return text[:length]
+
+
+def _make_boxed_texts(length: int, rng: random.Random) -> dict[str, str]:
+    reasoning = _make_reasoning(length, rng)
+    return {
+        "final_box": reasoning + "\\boxed{\\frac{3}{4}}",
+        "many_nested_boxes": "".join(f"\\boxed{{\\frac{{{index}}}{{2}}}} " for index in range(length // 20))[:length],
+        "unclosed_box": "\\boxed{" + reasoning,
+    }
+
+
+def _make_repeat_texts(length: int, rng: random.Random) -> dict[str, str]:
+    reasoning = _make_reasoning(length, rng)
+    table = "| step | value |\n|------|-------|\n" + "".join(
+        f"| {index} | {rng.random():.6f} |\n" for index in range(length)
+    )
+    return {
+        "reasoning": reasoning,
+        "markdown_table": table[:length],
+        "repeated_tail": reasoning[: length // 2] + ("and then I check it again. " * length)[: length // 2],
+    }
+
+
+def _make_mixing_texts(length: int, rng: random.Random) -> dict[str, str]:
+    english = _make_reasoning(length, rng)
+    chinese = "".join(rng.choices("因此的值为我们得到再检查一遍。", k=length))
+    # * the paragraphs of both languages alternate, and the last one ends in the other language
+    paragraphs = [english[start : start + 2000] for start in range(0, length // 2, 2000)]
+    mixed = "\n\n".join(f"{paragraph}\n\n{chinese[:600]}" for paragraph in paragraphs)
+    return {"english": english, "chinese": chinese, "mixed": mixed[:length]}
+
+
+def _make_rollout_batches(length: int, rng: random.Random) -> dict[str, str]:
+    # * the rollouts of a batch are separated by blank lines, e.g. 64 rollouts of 2000 characters
+    num_rollouts = max(length // 2000, 1)
+    rollouts = [_make_reasoning(2000, rng).replace("\n\n", "\n") for _ in range(num_rollouts)]
+    return {f"{num_rollouts}_rollouts": "\n\n".join(rollouts)}
+
+
+CASES = [
+    BenchmarkCase(
+        "find_boxed_content_with_boxed",
+        find_boxed_content_with_boxed,
+        _reference_find_boxed_content_with_boxed,
+        _make_boxed_texts,
+    ),
+    BenchmarkCase("detect_repeat", detect_repeat, _reference_detect_repeat, _make_repeat_texts),
+    BenchmarkCase(
+        "detect_repeats",
+        lambda text: detect_repeats(_split_rollouts(text)),
+        lambda text: [_reference_detect_repeat(rollout) for rollout in _split_rollouts(text)],
+        _make_rollout_batches,
+    ),
+    BenchmarkCase(
+        "detect_long_paragraph_mixing",
+        detect_long_paragraph_mixing,
+        _reference_detect_long_paragraph_mixing,
+        _make_mixing_texts,
+    ),
+    BenchmarkCase(
+        "detect_long_paragraph_mixings",
+        lambda text: detect_long_paragraph_mixings(_split_rollouts(text)),
+        lambda text: [_reference_detect_long_paragraph_mixing(rollout) for rollout in _split_rollouts(text)],
+        _make_rollout_batches,
+    ),
+]
+
+
+def _time_per_call(function: Callable[[str], Any], text: str, repeat: int) -> float:
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        function(text)
+    return (time.perf_counter() - started_at) / repeat
+
+
+def run_case(case: BenchmarkCase, length: int, repeat: int, seed: int) -> list[dict[str, Any]]:
+    results = []
+    texts = case.make_texts(length, random.Random(seed))  # noqa: S311
+    for shape, text in texts.items():
+        if case.function(text) != case.reference(text):
+            err_msg = f"`{case.name}` differs from its reference on the {shape} text."
+            raise AssertionError(err_msg)
+
+        seconds = _time_per_call(case.function, text, repeat)
+        reference_seconds = _time_per_call(case.reference, text, repeat)
+        results.append(
+            {
+                "name": case.name,
+                "shape": shape,
+                "length": len(text),
+                "seconds": seconds,
+                "reference_seconds": reference_seconds,
+                "speedup": reference_seconds / seconds,
+            }
+        )
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--length", type=int, default=50000, help="Characters of each synthetic response.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs over the responses of each case.")
+    parser.add_argument("--cases", nargs="+", default=None, help="Names of the cases to run, all by default.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON file to write the results to.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    results = []
+    for case in CASES:
+        if args.cases is not None and case.name not in args.cases:
+            continue
+        for result in run_case(case, args.length, args.repeat, args.seed):
+            results.append(result)
+            print(
+                f"{case.name:<32} {result['shape']:<20} {result['seconds'] * 1e3:10.3f} ms  "
+                f"reference {result['reference_seconds'] * 1e3:10.3f} ms  speedup {result['speedup']:8.1f}x"
+            )
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,7 @@
 
 
 from collections.abc import Mapping
+from typing import Literal, Optional
 
 import msgspec
 
@@ -13,3 +14,103 @@ class RewardSystemConfig(msgspec.Struct, frozen=True):
     reward_configs: Mapping[str, VerifierConfig]
     enable_mix_verifier: bool = True
     reward_log_dir: str = "logs"
+    # threads for format checking, answer extraction and rule-based judging, defaults to the number of CPUs
+    num_cpu_workers: Optional[int] = None
+    # threads for the judges which need the LLM judge, i.e. the cap on the concurrent LLM judges of
+    # `RewardSystem.get_reward`, independent of the CPU workers
+    num_io_workers: int = 128
+    # "two_phase" sends the items which need the LLM judge in one concurrent wave, once the rule-based judging of the
+    # whole batch is done, "pipelined" hands each of them over to the I/O workers as soon as its rule-based judging
+    # is done
+    llm_judge_scheduling: Literal["two_phase", "pipelined"] = "two_phase"
+    # maximum number of in-flight judge calls of `RewardSystem.aget_reward` per event loop
+    max_concurrent_judges: int = 128
+    # "process" judges the items in a long-lived pool of worker processes, for verifiers bound by sympy
+    executor_type: Literal["thread", "process"] = "thread"
+    # number of worker processes, defaults to the number of CPUs
+    num_process_workers: Optional[int] = None
+    process_start_method: Literal["spawn", "forkserver", "fork"] = "spawn"
+    # maximum number of verdicts kept in the LRU cache keyed on the extracted answer and ground truth, 0 disables it
+    verdict_cache_size: int = 100_000
+    # keep the cached verdicts when `current_iteration` changes, otherwise the cache is cleared between iterations
+    persist_verdict_cache: bool = False
+    # maximum number of extracted ground truth kept in the LRU cache, shared by the rollouts of a prompt, 0 disables it
+    gt_cache_size: int = 10_000
+    # records waiting to be written to the reward logs by the background writer
+    reward_log_queue_size: int = 65_536
+    # "block" makes `get_reward` wait when the queue of the reward logs is full, "drop" drops the new records
+    reward_log_overflow: Literal["block", "drop"] = "block"
+    # a reward log is rotated once it exceeds this number of bytes, 0 disables the rotation
+    reward_log_max_bytes: int = 0
+    reward_log_compression: Literal["none", "gzip", "zstd"] = "none"
+    # seconds between two flushes of the reward logs
+    reward_log_flush_interval: float = 1.0
+    # record the latency of each stage of the pipeline and count the events, see `RewardSystem.get_metrics`
+    enable_metrics: bool = False
+    # dump the metrics to this JSON file every `metrics_dump_interval` seconds
+    metrics_dump_path: Optional[str] = None
+    metrics_dump_interval: float = 60.0
+    # connections kept alive to each LLM judge endpoint, shared by all verifiers with the same URL and API key
+    llm_pool_size: int = 128
+    # retries of an LLM judge request which fails to connect, times out or gets a 5xx response,
+    # the n-th retry waits a random time up to min(llm_retry_max_backoff, llm_retry_backoff * 2**n) seconds
+    llm_max_retries: int = 3
+    # retries of an LLM judge request which gets a 429 response
+    llm_max_throttled_retries: int = 10
+    llm_retry_backoff: float = 0.5
+    llm_retry_max_backoff: float = 8.0
+    # maximum seconds the requests to an endpoint are held as asked by the `Retry-After` header
+    llm_max_retry_after: float = 60.0
+    llm_connect_timeout: float = 10.0
+    llm_read_timeout: float = 120.0
+    # LLM judge requests per second sent to each endpoint and API key, in bursts of at most `llm_rate_limit_burst`,
+    # 0 disables the limit
+    llm_rate_limit: float = 0.0
+    llm_rate_limit_burst: int = 1
+    # LLM judge requests in flight to each endpoint and API key, the limit is halved when the endpoint is
+    # overloaded and grows back by 1 per round of successful requests
+    llm_max_concurrency: int = 128
+    llm_min_concurrency: int = 1
+    # an LLM judge request slower than this number of seconds is taken as an overload, 0 disables it
+    llm_latency_threshold: float = 0.0
+    # interchangeable replicas of the LLM judge endpoints, keyed by the `llm_judge_url` of the verifiers, each request
+    # is sent to one of the replicas, unlike the URLs listed in `llm_judge_url`, which vote as an ensemble
+    llm_replica_pools: Mapping[str, list[str]] = msgspec.field(default_factory=dict)
+    # "least_outstanding" picks the replica with the fewest requests in flight, "ewma" the one with the lowest moving
+    # average of the latency scaled by its requests in flight
+    llm_replica_strategy: Literal["least_outstanding", "ewma"] = "least_outstanding"
+    # a replica is ejected after this number of consecutive failed requests, or a failed health check, for
+    # `llm_replica_ejection_time` seconds, doubled for each consecutive ejection up to `llm_replica_max_ejection_time`
+    llm_replica_max_failures: int = 3
+    llm_replica_ejection_time: float = 30.0
+    llm_replica_max_ejection_time: float = 300.0
+    # seconds between two health checks of the replicas at `llm_replica_health_check_path`, 0 disables them
+    llm_replica_health_check_interval: float = 0.0
+    llm_replica_health_check_path: str = "/health"
+    # send a duplicate of an LLM judge request, to another replica if the URL has a replica pool, once it takes
+    # longer than `llm_hedge_percentile` of the last `llm_hedge_window` latencies of its URL, and take the first answer
+    enable_llm_hedging: bool = False
+    llm_hedge_percentile: float = 95.0
+    # maximum ratio of the duplicated requests to all the requests of a URL
+    llm_hedge_budget: float = 0.05
+    # the duplicates are only sent after this number of seconds, whatever the recent latencies
+    llm_hedge_min_delay: float = 0.0
+    llm_hedge_window: int = 1000
+    # latencies recorded before sending any duplicate
+    llm_hedge_min_samples: int = 20
+    # send the concurrent LLM judge requests to the same endpoint, model and sampling parameters in batches of up to
+    # `llm_batch_size`, the first request of a batch waits up to `llm_batch_flush_latency` seconds for the others
+    enable_llm_batching: bool = False
+    # "packed" packs the prompts into one chat completion and parses the replies out of a JSON array,
+    # "multi_prompt" sends them as the prompt list of one request to the `/completions` endpoint next to the URL
+    llm_batch_mode: Literal["packed", "multi_prompt"] = "packed"
+    llm_batch_size: int = 16
+    llm_batch_flush_latency: float = 0.05
+    # SQLite database caching the LLM judge responses across runs and processes, None disables the cache
+    llm_cache_path: Optional[str] = None
+    # seconds a cached response stays valid, 0 keeps the responses forever
+    llm_cache_ttl: float = 0.0
+    # maximum number of cached responses, the oldest ones are deleted first, 0 keeps all of them
+    llm_cache_max_entries: int = 1_000_000
+    # only look up the cached responses without adding new ones, e.g. for evaluation runs
+    llm_cache_read_only: bool = False
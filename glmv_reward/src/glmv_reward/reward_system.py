@@ -1,39 +1,158 @@
 # -*- coding: utf-8 -*-
 
 
-import json
-import re
-from collections.abc import Sequence
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextlib
+import functools
+import math
+import multiprocessing
+import os
+import threading
+import weakref
+from collections.abc import Hashable, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Optional, Union
+from types import TracebackType
+from typing import Any, NamedTuple, Optional, Union
 
 import msgspec
 
 from .configs import RewardSystemConfig
 from .configs.verifiers import VerifierConfig
+from .utils.cache import CacheStats, LRUCache
+from .utils.executor import ExecutorStats, TrackedExecutor
+from .utils.hedging import HedgingOptions, install_hedging, uninstall_hedging
+from .utils.judge_cache import JudgeCache, install_judge_cache, uninstall_judge_cache
+from .utils.llm import (
+    LLMCallDeferred,
+    LLMClientOptions,
+    defer_llm_calls,
+    install_llm_client_options,
+    record_llm_failures,
+    uninstall_llm_client_options,
+)
+from .utils.llm_batch import BatchingOptions, JudgeBatcher, install_judge_batcher, uninstall_judge_batcher
+from .utils.log_writer import JsonlLogWriter
 from .utils.logging import get_logger
+from .utils.metrics import MetricsScope, MetricsState, PipelineMetrics, count_event, metrics_scope, timed_stage
 from .utils.misc import ensure_list
-from .utils.path import mkdir
+from .utils.path import resolve_path
+from .utils.replica_pool import ReplicaPool, ReplicaPoolOptions, register_replica_pools, unregister_replica_pools
+from .utils.response import parse_response
 from .utils.serialization import load_yaml
-from .verifiers import LanguageMixVerifier, Verifier, get_verifier_from_config
+from .verifiers import LanguageMixVerifier, Verifier, get_verifier_from_config, get_verifier_instance_key
 
 _logger = get_logger(__name__)
 
 
+class _RewardBatch(NamedTuple):
+    prompts: list[str]
+    answers: list[str]
+    gt_answers: list[str]
+    uuids: list[Optional[str]]
+    image_files: list[Optional[str]]
+    answer_lengths: list[int]
+    datasources: list[str]
+    # the ground truth extracted offline, extracted from `gt_answers` if None
+    extracted_gt_answers: Optional[list[Any]]
+
+
+class _ItemRequest(msgspec.Struct, array_like=True):
+    """A single item sent to the worker processes."""
+
+    datasource: str
+    prompt: Any
+    answer: Any
+    gt_answer: Any
+    image_file: Optional[str]
+    current_iteration: int = 0
+    # `extracted_gt` is only used if `has_extracted_gt` is set, since None is a valid extracted ground truth
+    has_extracted_gt: bool = False
+    extracted_gt: Any = None
+
+
+class _ItemResult(msgspec.Struct, array_like=True):
+    """The judging result of a single item sent back from the worker processes."""
+
+    # None if the item needs the LLM judge, which is left to the I/O pool of the main process
+    reward: Optional[float]
+    extracted_answer: Any
+    extracted_gt: Any
+
+
+class _ChunkResult(msgspec.Struct, array_like=True):
+    """The judging results of a chunk of items and the metrics recorded while judging them."""
+
+    results: list[_ItemResult]
+    metrics: Optional[MetricsState] = None
+
+
+class _RewardLogRecord(msgspec.Struct):
+    """A line of the pass@k reward logs, the fields are written in this order."""
+
+    current_iteration: int
+    prompt: Any
+    image_file: Any
+    answer: Any
+    gt_answer: Any
+    reward: Union[float, msgspec.Raw]
+    answer_token_length: int
+    reward_sum_of_this_prompt: Union[float, msgspec.Raw]
+    uuid: Optional[str]
+
+
+class _CorrectnessLogRecord(msgspec.Struct):
+    """A line of the correct and incorrect reward logs, the fields are written in this order."""
+
+    current_iteration: int
+    prompt: Any
+    image_file: Any
+    answer: Any
+    answer_token_length: int
+    gt_answer: Any
+    reward: Union[float, msgspec.Raw]
+    reward_sum_of_this_prompt: Union[float, msgspec.Raw]
+    uuid: Optional[str]
+
+
+def _encode_log_float(value: float) -> Union[float, msgspec.Raw]:
+    # * msgspec writes the non-finite floats as null, the logs keep the `Infinity`, `-Infinity` and `NaN` of `json`,
+    # * e.g. for the default `min_reward`
+    if math.isfinite(value):
+        return value
+    if math.isnan(value):
+        return msgspec.Raw(b"NaN")
+    return msgspec.Raw(b"Infinity" if value > 0 else b"-Infinity")
+
+
+# * returned by `RewardSystem._metrics_scope` when the metrics are disabled, `nullcontext` keeps no state
+_NULL_METRICS_SCOPE: contextlib.nullcontext[None] = contextlib.nullcontext()
+
+# * placeholder of the extracted ground truth which is not known yet, None means a bad ground truth
+_MISSING: Any = object()
+
+# * at most this number of chunks is sent to each worker process for one datasource group
+_CHUNKS_PER_PROCESS_WORKER = 4
+
+
 class RewardSystem(object):
-    def __init__(self, config_file: Union[Path, str]) -> None:
+    def __init__(self, config_file: Union[Path, str, RewardSystemConfig]) -> None:
         """
         Initialize the RewardSystem with configurations from a YAML file.
 
         Args:
-            config_file (Optional[str]): Path to YAML configuration file containing reward model settings
+            config_file (Union[Path, str, RewardSystemConfig]): Path to YAML configuration file containing reward
+                model settings, or an already loaded configuration
         """
 
-        # Load configuration from YAML file if provided
-        _logger.info(f"> Loading reward config file: {config_file}")
-        reward_config = msgspec.convert(load_yaml(config_file), RewardSystemConfig)
+        if isinstance(config_file, RewardSystemConfig):
+            reward_config = config_file
+        else:
+            # Load configuration from YAML file if provided
+            _logger.info(f"> Loading reward config file: {config_file}")
+            reward_config = msgspec.convert(load_yaml(config_file), RewardSystemConfig)
 
+        self.reward_config = reward_config
         self.reward_log_dir = reward_config.reward_log_dir
 
         # Set default configurations for each model if not provided
@@ -58,9 +177,515 @@ class RewardSystem(object):
         if reward_config.enable_mix_verifier:
             self.language_mix_verifier = LanguageMixVerifier()
 
-        self.think_answer_pattern = re.compile(
-            r"^<think>(.*?)</think>\s*<answer>(.*?)</answer>$", re.DOTALL | re.IGNORECASE
+        # * long-lived thread pools shared by all calls and datasources:
+        # *   - the CPU pool checks formats, extracts answers and runs the rule-based part of the judges
+        # *   - the I/O pool runs the judges which need the LLM judge, in the worker processes too
+        num_cpu_workers = reward_config.num_cpu_workers or os.cpu_count() or 1
+        self._cpu_pool = TrackedExecutor(
+            ThreadPoolExecutor(max_workers=num_cpu_workers, thread_name_prefix="glmv_reward_cpu"), num_cpu_workers
+        )
+        self._io_pool = TrackedExecutor(
+            ThreadPoolExecutor(max_workers=reward_config.num_io_workers, thread_name_prefix="glmv_reward_io"),
+            reward_config.num_io_workers,
+        )
+        self._closed = False
+        self.llm_judge_scheduling = reward_config.llm_judge_scheduling
+
+        # * semaphores used by `aget_reward`, one per event loop
+        self.max_concurrent_judges = reward_config.max_concurrent_judges
+        self._async_semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+            weakref.WeakKeyDictionary()
+        )
+
+        # * long-lived worker processes used when `executor_type` is "process", created lazily
+        self.executor_type = reward_config.executor_type
+        self.num_process_workers = reward_config.num_process_workers or os.cpu_count() or 1
+        self.process_start_method = reward_config.process_start_method
+        self._process_pool: Optional[TrackedExecutor] = None
+        self._process_pool_lock = threading.Lock()
+
+        # * verdicts of the judged items shared by all calls, keyed by `_get_judge_key`
+        self._verdict_cache: Optional[LRUCache[Hashable, float]] = None
+        if reward_config.verdict_cache_size > 0:
+            self._verdict_cache = LRUCache(reward_config.verdict_cache_size)
+        self.persist_verdict_cache = reward_config.persist_verdict_cache
+        self._verdict_cache_iteration: Optional[int] = None
+        self._verifier_instance_keys: dict[str, str] = {}
+
+        # * extracted ground truth shared by the rollouts of the same prompt, see `_extract_gt_answer`
+        self._gt_cache: Optional[LRUCache[Hashable, Any]] = None
+        if reward_config.gt_cache_size > 0:
+            self._gt_cache = LRUCache(reward_config.gt_cache_size)
+
+        # * the LLM judge requests of all verifiers share a pooled client per endpoint and API key, with the options
+        # * of the first reward system configured in the process
+        self._llm_client_options: Optional[LLMClientOptions] = LLMClientOptions(
+            pool_size=reward_config.llm_pool_size,
+            max_retries=reward_config.llm_max_retries,
+            max_throttled_retries=reward_config.llm_max_throttled_retries,
+            backoff_base=reward_config.llm_retry_backoff,
+            backoff_max=reward_config.llm_retry_max_backoff,
+            max_retry_after=reward_config.llm_max_retry_after,
+            connect_timeout=reward_config.llm_connect_timeout,
+            read_timeout=reward_config.llm_read_timeout,
+            rate_limit=reward_config.llm_rate_limit,
+            rate_limit_burst=reward_config.llm_rate_limit_burst,
+            max_concurrency=reward_config.llm_max_concurrency,
+            min_concurrency=reward_config.llm_min_concurrency,
+            latency_threshold=reward_config.llm_latency_threshold,
+        )
+        if not install_llm_client_options(self._llm_client_options):
+            _logger.warning("> The LLM client options of another reward system are in use")
+            self._llm_client_options = None
+
+        # * interchangeable replicas of the LLM judge endpoints, see `get_replica_stats`
+        replica_pool_options = ReplicaPoolOptions(
+            strategy=reward_config.llm_replica_strategy,
+            max_failures=reward_config.llm_replica_max_failures,
+            ejection_time=reward_config.llm_replica_ejection_time,
+            max_ejection_time=reward_config.llm_replica_max_ejection_time,
+            health_check_interval=reward_config.llm_replica_health_check_interval,
+            health_check_path=reward_config.llm_replica_health_check_path,
+        )
+        self._replica_pools = {
+            url: ReplicaPool(replica_urls, replica_pool_options)
+            for url, replica_urls in reward_config.llm_replica_pools.items()
+        }
+        # * a URL keeps the pool of the reward system which registered it first
+        for url in register_replica_pools(self._replica_pools):
+            _logger.warning("> The replica pool of another reward system is in use for %s", url)
+            self._replica_pools.pop(url).close()
+
+        # * opt-in duplicates of the slow LLM judge requests, see `utils.hedging.get_hedging_stats`, shared by the
+        # * reward systems of the process, the options of the first one configured are used
+        self._hedging_options: Optional[HedgingOptions] = None
+        if reward_config.enable_llm_hedging:
+            self._hedging_options = HedgingOptions(
+                percentile=reward_config.llm_hedge_percentile,
+                budget=reward_config.llm_hedge_budget,
+                min_delay=reward_config.llm_hedge_min_delay,
+                window=reward_config.llm_hedge_window,
+                min_samples=reward_config.llm_hedge_min_samples,
+            )
+            if not install_hedging(self._hedging_options):
+                _logger.warning("> The hedging options of another reward system are in use")
+                self._hedging_options = None
+
+        # * opt-in batches of the concurrent LLM judge requests, shared by the reward systems of the process, the
+        # * batcher of the first one configured is used
+        self._judge_batcher: Optional[JudgeBatcher] = None
+        if reward_config.enable_llm_batching:
+            self._judge_batcher = JudgeBatcher(
+                BatchingOptions(
+                    mode=reward_config.llm_batch_mode,
+                    batch_size=reward_config.llm_batch_size,
+                    flush_latency=reward_config.llm_batch_flush_latency,
+                )
+            )
+            if not install_judge_batcher(self._judge_batcher):
+                _logger.warning("> The LLM judge batcher of another reward system is in use")
+                self._judge_batcher = None
+
+        # * the LLM judge responses cached on disk across runs, shared by the worker processes on the same host
+        # * and by the reward systems of the process, the first one configured is used
+        self._judge_cache: Optional[JudgeCache] = None
+        if reward_config.llm_cache_path is not None:
+            self._judge_cache = JudgeCache(
+                reward_config.llm_cache_path,
+                ttl=reward_config.llm_cache_ttl,
+                max_entries=reward_config.llm_cache_max_entries,
+                read_only=reward_config.llm_cache_read_only,
+            )
+            if not install_judge_cache(self._judge_cache):
+                _logger.warning(
+                    "> The LLM judge cache of another reward system is in use, %s is ignored",
+                    reward_config.llm_cache_path,
+                )
+                self._judge_cache.close()
+                self._judge_cache = None
+
+        # * opt-in latency histograms and event counters, see `get_metrics`
+        self._metrics: Optional[PipelineMetrics] = None
+        if reward_config.enable_metrics:
+            self._metrics = PipelineMetrics()
+            if reward_config.metrics_dump_path is not None:
+                self._metrics.start_periodic_dump(reward_config.metrics_dump_path, reward_config.metrics_dump_interval)
+
+        # * background writer of the reward logs, created lazily
+        self._log_writer: Optional[JsonlLogWriter] = None
+        self._log_writer_lock = threading.Lock()
+
+    def __enter__(self) -> "RewardSystem":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Shut down the thread pools and the worker processes after the submitted items are judged.
+        """
+        with self._process_pool_lock:
+            self._closed = True
+            process_pool, self._process_pool = self._process_pool, None
+
+        self._cpu_pool.shutdown()
+        self._io_pool.shutdown()
+        if process_pool is not None:
+            process_pool.shutdown()
+
+        with self._log_writer_lock:
+            log_writer, self._log_writer = self._log_writer, None
+        if log_writer is not None:
+            log_writer.close()
+
+        if self._metrics is not None:
+            self._metrics.stop_periodic_dump()
+
+        if self._judge_cache is not None:
+            uninstall_judge_cache(self._judge_cache)
+            self._judge_cache.close()
+
+        if self._llm_client_options is not None:
+            uninstall_llm_client_options(self._llm_client_options)
+        if self._hedging_options is not None:
+            uninstall_hedging(self._hedging_options)
+        if self._judge_batcher is not None:
+            uninstall_judge_batcher(self._judge_batcher)
+
+        unregister_replica_pools(self._replica_pools)
+        for replica_pool in self._replica_pools.values():
+            replica_pool.close()
+
+    def get_metrics(self) -> Optional[dict[str, Any]]:
+        """
+        Get the latency of each stage of the pipeline and the counts of the events, or None if `enable_metrics` is
+        not set. See `PipelineMetrics.snapshot` for the layout.
+
+        The stages are "check_answer_format", "language_mix", "extract_gt", "extract_answer", "judge" (the rule-based
+        judge, in the CPU pool or the worker processes), "llm_judge" (the judge in the I/O pool),
+        "batch_judge", "sympy" and "llm_request", and the events are "min_reward_shortcuts", "exceptions",
+        "llm_fallbacks", "llm_retries", "llm_throttled" (the retries after a 429 response), "llm_throttled_failures"
+        (the requests still throttled after their retries, judged as exceptions), "llm_request_failures" (the other
+        failed requests, whose verdicts are not cached), "llm_cache_hits",
+        "llm_cache_misses", "llm_coalesced_requests" (the "llm_request"s which waited for an identical request in
+        flight instead of sending their own), "llm_replica_failovers", "llm_hedged_requests" and "llm_hedge_wins"
+        (the duplicated requests which answered first), "llm_batches" and "llm_batch_parse_failures".
+        """
+        if self._metrics is None:
+            return None
+        return self._metrics.snapshot()
+
+    def reset_metrics(self) -> None:
+        if self._metrics is not None:
+            self._metrics.reset()
+
+    def _metrics_scope(
+        self, datasource: Optional[str], verifier: Verifier
+    ) -> contextlib.AbstractContextManager[Optional[MetricsScope]]:
+        if self._metrics is None or datasource is None:
+            return _NULL_METRICS_SCOPE
+        return metrics_scope(self._metrics, datasource, type(verifier).__name__)
+
+    def _count_event(self, counter: str, datasource: Optional[str], verifier: Verifier) -> None:
+        if self._metrics is not None and datasource is not None:
+            self._metrics.increment(counter, datasource, type(verifier).__name__)
+
+    def flush_reward_logs(self) -> None:
+        """
+        Wait until the reward logs queued by `get_reward` are written to the files.
+        """
+        log_writer = self._log_writer
+        if log_writer is not None:
+            log_writer.flush()
+
+    def _get_log_writer(self) -> JsonlLogWriter:
+        with self._log_writer_lock:
+            if self._log_writer is None:
+                reward_config = self.reward_config
+                self._log_writer = JsonlLogWriter(
+                    max_queue_size=reward_config.reward_log_queue_size,
+                    overflow=reward_config.reward_log_overflow,
+                    max_bytes=reward_config.reward_log_max_bytes,
+                    compression=reward_config.reward_log_compression,
+                    flush_interval=reward_config.reward_log_flush_interval,
+                )
+            return self._log_writer
+
+    def get_executor_stats(self) -> dict[str, ExecutorStats]:
+        """
+        Get the queue depth and utilization of the "cpu" and "io" thread pools,
+        and of the "process" pool if it has been started.
+        """
+        executor_stats = {"cpu": self._cpu_pool.stats(), "io": self._io_pool.stats()}
+        process_pool = self._process_pool
+        if process_pool is not None:
+            executor_stats["process"] = process_pool.stats()
+        return executor_stats
+
+    def get_verdict_cache_stats(self) -> Optional[CacheStats]:
+        """
+        Get the hits, misses and size of the verdict cache, or None if the cache is disabled.
+        """
+        if self._verdict_cache is None:
+            return None
+        return self._verdict_cache.stats()
+
+    def get_replica_stats(self) -> dict[str, dict[str, dict[str, Any]]]:
+        """
+        Get the requests in flight, the requests, the failures, the latency and the ejections of each replica of
+        each pool in `llm_replica_pools` used by this reward system, as seen by this process.
+        """
+        return {url: replica_pool.stats() for url, replica_pool in self._replica_pools.items()}
+
+    def get_judge_cache_stats(self) -> Optional[CacheStats]:
+        """
+        Get the hits and misses of the LLM judge cache in this process and the number of cached responses, or None
+        if `llm_cache_path` is not set or the cache of another reward system is in use. The hits and misses of the
+        worker processes are counted in `get_metrics`.
+        """
+        if self._judge_cache is None:
+            return None
+        return self._judge_cache.stats()
+
+    def _sync_verdict_cache(self, current_iteration: int) -> None:
+        # * the cached verdicts only live for one iteration unless `persist_verdict_cache` is set
+        if self._verdict_cache is None or self.persist_verdict_cache:
+            return
+        if self._verdict_cache_iteration is not None and self._verdict_cache_iteration != current_iteration:
+            self._verdict_cache.clear()
+        self._verdict_cache_iteration = current_iteration
+
+    def _get_verifier_instance_key(self, datasource: str) -> str:
+        verifier_instance_key = self._verifier_instance_keys.get(datasource)
+        if verifier_instance_key is None:
+            verifier_instance_key = get_verifier_instance_key(
+                self.get_reward_config_from_datasource(datasource), datasource
+            )
+            self._verifier_instance_keys[datasource] = verifier_instance_key
+        return verifier_instance_key
+
+    def _get_judge_key(
+        self,
+        datasource: Optional[str],
+        prompt: Any,
+        extracted_ans: Any,
+        extracted_gt: Any,
+        image_file: Any,
+    ) -> Optional[Hashable]:
+        """
+        Get the key identifying the judge of an item, or None if the judge cannot be shared with other items.
+        Items with the same key get the same verdict, the key is used by the verdict cache and to judge the
+        identical items of a batch once.
+
+        The key consists of the verifier instance key, the extracted answer and ground truth stripped of the
+        surrounding whitespaces, the question and the image file.
+        """
+        if datasource is None:
+            return None
+
+        try:
+            return (
+                self._get_verifier_instance_key(datasource),
+                *(_normalize_judge_key_part(value) for value in (extracted_ans, extracted_gt, prompt, image_file)),
+            )
+        except (TypeError, msgspec.EncodeError):
+            return None
+
+    def _lookup_verdict(self, judge_key: Optional[Hashable]) -> Optional[float]:
+        if self._verdict_cache is None or judge_key is None:
+            return None
+        return self._verdict_cache.get(judge_key)
+
+    def _store_verdict(self, judge_key: Optional[Hashable], reward: float) -> None:
+        if self._verdict_cache is None or judge_key is None:
+            return
+        self._verdict_cache.put(judge_key, reward)
+
+    def _extract_gt_answer(
+        self, prompt: Any, gt_answer: Any, verifier: Verifier, datasource: Optional[str] = None
+    ) -> Any:
+        """
+        Extract the ground truth with `verifier.extract_answer`, memoized per verifier, ground truth and question.
+        """
+        if self._gt_cache is None or datasource is None:
+            return verifier.extract_answer(gt_answer, question=prompt)
+
+        try:
+            gt_key = (self._get_verifier_instance_key(datasource), _to_hashable(gt_answer), _to_hashable(prompt))
+        except (TypeError, msgspec.EncodeError):
+            return verifier.extract_answer(gt_answer, question=prompt)
+
+        extracted_gt = self._gt_cache.get(gt_key, _MISSING)
+        if extracted_gt is _MISSING:
+            extracted_gt = verifier.extract_answer(gt_answer, question=prompt)
+            self._gt_cache.put(gt_key, extracted_gt)
+        return extracted_gt
+
+    def _extract_single_item(
+        self,
+        prompt: str,
+        answer: Any,
+        gt_answer: Any,
+        verifier: Verifier,
+        datasource: Optional[str] = None,
+        extracted_gt: Any = _MISSING,
+    ) -> tuple[Optional[float], Any, Any]:
+        """
+        Check the format of a single item and extract its answer and ground truth.
+        The ground truth is neither checked nor extracted if `extracted_gt` is given.
+
+        Returns:
+            A tuple of the short-circuited reward, the extracted answer and the extracted ground truth.
+            The reward is None if the item still needs to be judged.
+        """
+        min_reward = getattr(verifier, "min_reward", float("-inf"))
+
+        with self._metrics_scope(datasource, verifier):
+            try:
+                # if it is not a correct answer format, return -inf
+                with timed_stage("check_answer_format"):
+                    if isinstance(answer, str) and not self.check_answer_format(answer):
+                        return min_reward, None, None
+
+                    # if it is not a correct gt_answer format, return -inf
+                    if (
+                        extracted_gt is _MISSING
+                        and isinstance(gt_answer, str)
+                        and not self.check_answer_format(gt_answer)
+                    ):
+                        _logger.warning("> Receive bad format gt_answer: %s, please check your data", gt_answer)
+                        return min_reward, None, None
+
+                if self.language_mix_verifier is not None:
+                    with timed_stage("language_mix"):
+                        if not self.language_mix_verifier.judge(answer, gt_answer):
+                            return min_reward, None, None
+
+                # Extract ground truth
+                if extracted_gt is _MISSING:
+                    with timed_stage("extract_gt"):
+                        extracted_gt = self._extract_gt_answer(prompt, gt_answer, verifier, datasource)
+                if extracted_gt is None:
+                    _logger.warning(f"> Receive bad gt_answer: {gt_answer}, please check your data")
+                    return min_reward, None, None
+
+                # Extract and judge answer
+                with timed_stage("extract_answer"):
+                    extracted_ans = verifier.extract_answer(answer, question=prompt)
+                if extracted_ans is None or not isinstance(extracted_ans, (str, list, dict)):
+                    return min_reward, extracted_ans, extracted_gt
+
+            except Exception as e:
+                count_event("exceptions")
+                _logger.warning("> Error in verifier extract_answer due to exception: %s", repr(e))
+                return min_reward, None, None
+
+        return None, extracted_ans, extracted_gt
+
+    @staticmethod
+    def _ensure_float_reward(reward: Any, min_reward: float) -> float:
+        try:
+            return float(reward)
+        except Exception:
+            _logger.warning("> reward from verifier judge should be able to convert to float, but got: %s.", reward)
+            return min_reward
+
+    def _judge_single_item(
+        self,
+        prompt: str,
+        extracted_ans: Any,
+        extracted_gt: Any,
+        image_file: Optional[str],
+        verifier: Verifier,
+        judge_key: Optional[Hashable] = None,
+        datasource: Optional[str] = None,
+        stage: str = "judge",
+    ) -> float:
+        min_reward = getattr(verifier, "min_reward", float("-inf"))
+
+        with self._metrics_scope(datasource, verifier) as scope, record_llm_failures() as llm_failures:
+            try:
+                # Get reward
+                with timed_stage(stage):
+                    reward = verifier.judge(extracted_ans, extracted_gt, question=prompt, image_file=image_file)
+            except Exception as e:
+                # * failed judges are not cached, they may succeed next time
+                count_event("exceptions")
+                _logger.warning("> Error in verifier judge: %s", repr(e))
+                return self._ensure_float_reward(min_reward, min_reward)
+
+            if scope is not None and "llm_request" in scope.entered_stages:
+                count_event("llm_fallbacks")
+
+        reward = self._ensure_float_reward(reward, min_reward)
+        # * neither are the judges whose LLM requests failed
+        if len(llm_failures) == 0:
+            self._store_verdict(judge_key, reward)
+        return reward
+
+    def _prejudge_single_item(
+        self,
+        prompt: str,
+        answer: Any,
+        gt_answer: Any,
+        image_file: Optional[str],
+        verifier: Verifier,
+        debug: bool = False,
+        datasource: Optional[str] = None,
+        extracted_gt: Any = _MISSING,
+    ) -> tuple[Optional[float], Any, Any]:
+        """
+        Check, extract and judge a single item without calling the LLM judge.
+
+        Returns:
+            A tuple of the reward, the extracted answer and the extracted ground truth.
+            The reward is None if the item needs the LLM judge, it is then judged again in the I/O pool.
+        """
+        if debug:
+            # * stops at `breakpoint` and judges the item in place
+            return self._process_single_item(
+                prompt,
+                answer,
+                gt_answer,
+                image_file,
+                verifier,
+                debug=True,
+                datasource=datasource,
+                extracted_gt=extracted_gt,
+            )
+
+        short_circuit_reward, extracted_ans, extracted_gt = self._extract_single_item(
+            prompt, answer, gt_answer, verifier, datasource=datasource, extracted_gt=extracted_gt
         )
+        if short_circuit_reward is not None:
+            self._count_event("min_reward_shortcuts", datasource, verifier)
+            return short_circuit_reward, extracted_ans, extracted_gt
+
+        judge_key = self._get_judge_key(datasource, prompt, extracted_ans, extracted_gt, image_file)
+        cached_reward = self._lookup_verdict(judge_key)
+        if cached_reward is not None:
+            return cached_reward, extracted_ans, extracted_gt
+
+        try:
+            with defer_llm_calls():
+                reward = self._judge_single_item(
+                    prompt,
+                    extracted_ans,
+                    extracted_gt,
+                    image_file,
+                    verifier,
+                    judge_key=judge_key,
+                    datasource=datasource,
+                )
+        except LLMCallDeferred:
+            return None, extracted_ans, extracted_gt
+        return reward, extracted_ans, extracted_gt
 
     def _process_single_item(
         self,
@@ -70,61 +695,168 @@ class RewardSystem(object):
         image_file: Optional[str],
         verifier: Verifier,
         debug: bool = False,
+        datasource: Optional[str] = None,
+        extracted_gt: Any = _MISSING,
     ) -> tuple[float, Any, Any]:
-        min_reward = getattr(verifier, "min_reward", float("-inf"))
+        short_circuit_reward, extracted_ans, extracted_gt = self._extract_single_item(
+            prompt, answer, gt_answer, verifier, datasource=datasource, extracted_gt=extracted_gt
+        )
+        if short_circuit_reward is not None:
+            self._count_event("min_reward_shortcuts", datasource, verifier)
+            return short_circuit_reward, extracted_ans, extracted_gt
 
-        try:
-            # if it is not a correct answer format, return -inf
-            if isinstance(answer, str) and not self.check_answer_format(answer):
-                return min_reward, None, None
+        if debug:
+            print("--- Verifier Debug ---")
+            print(f"Verifier class: {verifier.__class__.__name__}")
+            print(f"Raw Model Answer: {answer[:200]}...")
+            print(f"Extracted Model Answer: {extracted_ans}")
+            print(f"Raw GT Answer: {gt_answer[:200]}...")
+            print(f"Extracted GT Answer: {extracted_gt}")
+            print("----------------------")
+            breakpoint()
 
-            # if it is not a correct gt_answer format, return -inf
-            if isinstance(gt_answer, str) and not self.check_answer_format(gt_answer):
-                _logger.warning("> Receive bad format gt_answer: %s, please check your data", gt_answer)
-                return min_reward, None, None
+        judge_key = self._get_judge_key(datasource, prompt, extracted_ans, extracted_gt, image_file)
+        cached_reward = self._lookup_verdict(judge_key)
+        if cached_reward is not None:
+            return cached_reward, extracted_ans, extracted_gt
 
-            if self.language_mix_verifier is not None and not self.language_mix_verifier.judge(answer, gt_answer):
-                return min_reward, None, None
+        reward = self._judge_single_item(
+            prompt, extracted_ans, extracted_gt, image_file, verifier, judge_key=judge_key, datasource=datasource
+        )
+        return reward, extracted_ans, extracted_gt
 
-            # Extract ground truth
-            extracted_gt = verifier.extract_answer(gt_answer, question=prompt)
-            if extracted_gt is None:
-                _logger.warning(f"> Receive bad gt_answer: {gt_answer}, please check your data")
-                return min_reward, None, None
+    def _submit_llm_judges(
+        self,
+        batch: _RewardBatch,
+        indices: list[int],
+        verifiers: dict[str, Verifier],
+        all_extracted_ans: list[Any],
+        all_extracted_gt: list[Any],
+        llm_futures_by_key: dict[Hashable, Future[float]],
+    ) -> list[tuple[int, Future[float]]]:
+        """
+        Submit the LLM judges of the items to the I/O pool, the items with the same judge key as an item submitted
+        before share its judge.
 
-            # Extract and judge answer
-            extracted_ans = verifier.extract_answer(answer, question=prompt)
-            if extracted_ans is None or not isinstance(extracted_ans, (str, list, dict)):
-                return min_reward, extracted_ans, extracted_gt
+        Returns:
+            A list of the index of each item and the future of its reward.
+        """
+        llm_futures: list[tuple[int, Future[float]]] = []
+        for index in indices:
+            datasource = batch.datasources[index]
+            judge_key = self._get_judge_key(
+                datasource,
+                batch.prompts[index],
+                all_extracted_ans[index],
+                all_extracted_gt[index],
+                batch.image_files[index],
+            )
+            llm_future = llm_futures_by_key.get(judge_key) if judge_key is not None else None
+            if llm_future is None:
+                llm_future = self._io_pool.submit(
+                    self._judge_single_item,
+                    batch.prompts[index],
+                    all_extracted_ans[index],
+                    all_extracted_gt[index],
+                    batch.image_files[index],
+                    verifiers[datasource],
+                    judge_key=judge_key,
+                    datasource=datasource,
+                    stage="llm_judge",
+                )
+                if judge_key is not None:
+                    llm_futures_by_key[judge_key] = llm_future
+            llm_futures.append((index, llm_future))
+        return llm_futures
+
+    async def _aprocess_single_item(
+        self,
+        prompt: str,
+        answer: Any,
+        gt_answer: Any,
+        image_file: Optional[str],
+        verifier: Verifier,
+        semaphore: asyncio.Semaphore,
+        datasource: Optional[str] = None,
+        llm_judges: Optional[dict[Hashable, "asyncio.Task[float]"]] = None,
+        extracted_gt: Any = _MISSING,
+    ) -> tuple[float, Any, Any]:
+        """
+        Judge a single item without blocking the event loop.
+
+        The items of a batch which need the LLM judge and share the same judge key await the same judge
+        in `llm_judges`.
+        """
+        loop = asyncio.get_running_loop()
+        prejudge_fn = functools.partial(
+            self._prejudge_single_item,
+            prompt,
+            answer,
+            gt_answer,
+            image_file,
+            verifier,
+            datasource=datasource,
+            extracted_gt=extracted_gt,
+        )
+        prejudged_reward, extracted_ans, extracted_gt = await loop.run_in_executor(self._cpu_pool, prejudge_fn)
+        if prejudged_reward is not None:
+            return prejudged_reward, extracted_ans, extracted_gt
+
+        judge_key = self._get_judge_key(datasource, prompt, extracted_ans, extracted_gt, image_file)
+        judge_coro = self._ajudge_single_item(
+            prompt,
+            extracted_ans,
+            extracted_gt,
+            image_file,
+            verifier,
+            semaphore,
+            judge_key=judge_key,
+            datasource=datasource,
+        )
+        if judge_key is None or llm_judges is None:
+            return await judge_coro, extracted_ans, extracted_gt
 
-        except Exception as e:
-            _logger.warning("> Error in verifier extract_answer due to exception: %s", repr(e))
-            return min_reward, None, None
+        llm_judge = llm_judges.get(judge_key)
+        if llm_judge is None:
+            llm_judge = asyncio.ensure_future(judge_coro)
+            llm_judges[judge_key] = llm_judge
         else:
-            if debug:
-                print("--- Verifier Debug ---")
-                print(f"Verifier class: {verifier.__class__.__name__}")
-                print(f"Raw Model Answer: {answer[:200]}...")
-                print(f"Extracted Model Answer: {extracted_ans}")
-                print(f"Raw GT Answer: {gt_answer[:200]}...")
-                print(f"Extracted GT Answer: {extracted_gt}")
-                print("----------------------")
-                breakpoint()
+            judge_coro.close()
+        # * shielded, since cancelling one of the items must not cancel the judge shared with the others
+        return await asyncio.shield(llm_judge), extracted_ans, extracted_gt
+
+    async def _ajudge_single_item(
+        self,
+        prompt: str,
+        extracted_ans: Any,
+        extracted_gt: Any,
+        image_file: Optional[str],
+        verifier: Verifier,
+        semaphore: asyncio.Semaphore,
+        judge_key: Optional[Hashable] = None,
+        datasource: Optional[str] = None,
+    ) -> float:
+        min_reward = getattr(verifier, "min_reward", float("-inf"))
 
+        with self._metrics_scope(datasource, verifier) as scope, record_llm_failures() as llm_failures:
             try:
-                # Get reward
-                reward = verifier.judge(extracted_ans, extracted_gt, question=prompt, image_file=image_file)
+                async with semaphore:
+                    with timed_stage("llm_judge"):
+                        reward = await verifier.ajudge(
+                            extracted_ans, extracted_gt, question=prompt, image_file=image_file, executor=self._io_pool
+                        )
             except Exception as e:
+                count_event("exceptions")
                 _logger.warning("> Error in verifier judge: %s", repr(e))
-                reward = min_reward
+                return self._ensure_float_reward(min_reward, min_reward)
 
-            try:
-                reward = float(reward)
-            except Exception:
-                _logger.warning("> reward from verifier judge should be able to convert to float, but got: %s.", reward)
-                reward = min_reward
+            if scope is not None and "llm_request" in scope.entered_stages:
+                count_event("llm_fallbacks")
 
-            return reward, extracted_ans, extracted_gt
+        reward = self._ensure_float_reward(reward, min_reward)
+        if len(llm_failures) == 0:
+            self._store_verdict(judge_key, reward)
+        return reward
 
     @classmethod
     def from_yaml(cls, config_file: Union[Path, str]) -> "RewardSystem":
@@ -140,34 +872,8 @@ class RewardSystem(object):
         return cls(config_file)
 
     def check_answer_format(self, response: str) -> bool:
-        match = self.think_answer_pattern.search(response)
-        answer_part = None
-
-        if match:
-            think_part = match.group(1).strip()
-            answer_part = match.group(2).strip()
-
-            # Check for multiple box tags in answer part
-            begin_box_count = answer_part.lower().count("<|begin_of_box|>")
-            end_box_count = answer_part.lower().count("<|end_of_box|>")
-
-            # don't support legacy \\boxed{}
-            legacy_boxed_count = answer_part.lower().count("\\boxed{")
-
-            if begin_box_count > 1 or end_box_count > 1 or legacy_boxed_count > 0:
-                return False
-
-            # Basic validation against nested tags
-            avoid_tags = ["<think>", "</think>", "<answer>", "</answer>"]
-            if any(tag.lower() in think_part.lower() for tag in avoid_tags) or any(
-                tag.lower() in answer_part.lower() for tag in avoid_tags
-            ):
-                return False
-
-        if answer_part is None:
-            return False
-
-        return True
+        # * the parse is reused by the answer extraction of the verifiers
+        return parse_response(response).has_valid_format()
 
     def get_reward_config_from_datasource(self, datasource: str) -> VerifierConfig:
         """
@@ -200,11 +906,18 @@ class RewardSystem(object):
         current_iteration: int = 0,
         debug: bool = False,
         return_extracted_answers: bool = False,
+        extracted_gt_answers: Optional[Sequence[Any]] = None,
     ) -> Union[list[float], tuple[list[float], list, list]]:
         # TODO: revises the typing hints in the docstring
         """
         Get reward from reward model.
 
+        Identical items of a datasource, and the items which need the LLM judge with the same extracted answer and
+        ground truth, are judged once and share the reward.
+
+        The answers are extracted and rule-judged first, in the CPU pool or the worker processes, then the items
+        which need the LLM judge are judged in the I/O pool, see `llm_judge_scheduling`.
+
         Args:
             prompts (Union[Sequence[str], str]): List of prompts
             answers (Union[Sequence[str], str]): List of model answers
@@ -212,12 +925,16 @@ class RewardSystem(object):
             uuids (Optional[Union[Sequence[str], str]]): List of uuids
             image_files (Optional[Sequence[str]]): List of image paths
             answer_lengths (Optional[Sequence[int]]): List of answer lengths
-            datasources (Optional[Sequence[str]]): List of datasource identifiers
+            datasources (Optional[Sequence[str]]): List of datasource identifiers, which may differ between items.
+                Items are grouped by datasource and the -inf rewards are normalized within each group.
             log_reward_judge (bool): Whether to log reward judgments
             save_dir (Optional[str]): Path to save logs
             current_iteration (int): Current iteration number
             debug (bool): Whether to enable debug mode
             return_extracted_answers (bool): If True, returns tuple (rewards, extracted_ans_list, extracted_gt_list)
+            extracted_gt_answers (Optional[Sequence[Any]]): List of ground truth extracted offline, e.g. by
+                `extract_gt_answers`. If given, the ground truth is neither checked nor extracted again, and the
+                items with None get the minimum reward.
 
         Returns:
             A list of rewards or a tuple of consisting of a list of rewards, a list of extracted answers,
@@ -227,7 +944,353 @@ class RewardSystem(object):
             breakpoint()
 
         log_save_dir = save_dir if save_dir else self.reward_log_dir
+        self._sync_verdict_cache(current_iteration)
+
+        batch = self._prepare_batch(
+            prompts, answers, gt_answers, uuids, image_files, answer_lengths, datasources, extracted_gt_answers
+        )
+        groups = self._group_batch(batch)
+        verifiers = {datasource: self.get_verifier_from_datasource(datasource) for datasource in groups}
+
+        num_items = len(batch.prompts)
+        all_rewards: list[float] = [0.0] * num_items
+        all_extracted_ans: list[Any] = [None] * num_items
+        all_extracted_gt: list[Any] = [None] * num_items
+
+        # the process pool is bypassed in debug mode, since `breakpoint` needs the calling process
+        use_process_pool = self.executor_type == "process" and not debug
+
+        # Submit all tasks to the shared pools and remember the positions of their items,
+        # the duplicated items are judged once and mapped to the index of their first occurrence
+        duplicates: dict[int, int] = {}
+        item_futures: dict[Future[tuple[Optional[float], Any, Any]], int] = {}
+        chunk_futures: list[tuple[list[int], Future[bytes]]] = []
+        batch_futures: list[tuple[list[int], Future[tuple[list[float], list, list]]]] = []
+        for datasource, group_indices in groups.items():
+            verifier = verifiers[datasource]
+            indices = self._deduplicate_items(batch, group_indices, duplicates)
+            if verifier.is_batch_verifier:
+                future = self._cpu_pool.submit(self._judge_batch, self._subset_batch(batch, indices), verifier)
+                batch_futures.append((indices, future))
+                continue
+
+            if use_process_pool:
+                chunk_futures.extend(self._submit_to_process_pool(batch, indices, current_iteration))
+                continue
+
+            for index in indices:
+                item_future = self._cpu_pool.submit(
+                    self._prejudge_single_item,
+                    batch.prompts[index],
+                    batch.answers[index],
+                    batch.gt_answers[index],
+                    batch.image_files[index],
+                    verifier,
+                    debug=debug,
+                    datasource=datasource,
+                    extracted_gt=self._get_extracted_gt(batch, index),
+                )
+                item_futures[item_future] = index
+
+        # Phase 1: extract and rule-judge every item, the items which need the LLM judge are collected for phase 2,
+        # or handed over to the I/O pool right away if the scheduling is pipelined
+        llm_indices: list[int] = []
+        llm_futures: list[tuple[int, Future[float]]] = []
+        llm_futures_by_key: dict[Hashable, Future[float]] = {}
+        chunk_indices = {chunk_future: indices for indices, chunk_future in chunk_futures}
+        prejudge_futures: list[Future[Any]] = [*item_futures, *chunk_indices]
+        for prejudge_future in as_completed(prejudge_futures):
+            prejudged: list[tuple[int, Optional[float], Any, Any]] = []
+            if prejudge_future in item_futures:
+                prejudged.append((item_futures[prejudge_future], *prejudge_future.result()))
+            else:
+                results = self._decode_process_results(prejudge_future.result())
+                for index, result in zip(chunk_indices[prejudge_future], results, strict=True):
+                    reward = result.reward
+                    if reward is None:
+                        # * the verdicts of the LLM judge are only cached in the main process
+                        judge_key = self._get_judge_key(
+                            batch.datasources[index],
+                            batch.prompts[index],
+                            result.extracted_answer,
+                            result.extracted_gt,
+                            batch.image_files[index],
+                        )
+                        reward = self._lookup_verdict(judge_key)
+                    prejudged.append((index, reward, result.extracted_answer, result.extracted_gt))
+
+            for index, prejudged_reward, all_extracted_ans[index], all_extracted_gt[index] in prejudged:
+                if prejudged_reward is not None:
+                    all_rewards[index] = prejudged_reward
+                else:
+                    llm_indices.append(index)
+            if self.llm_judge_scheduling == "pipelined":
+                llm_futures.extend(
+                    self._submit_llm_judges(
+                        batch, llm_indices, verifiers, all_extracted_ans, all_extracted_gt, llm_futures_by_key
+                    )
+                )
+                llm_indices.clear()
+
+        # Phase 2: send the items which need the LLM judge in one concurrent wave, at most `num_io_workers` of them
+        # in flight, the items with the same judge key share one judge
+        llm_futures.extend(
+            self._submit_llm_judges(
+                batch, llm_indices, verifiers, all_extracted_ans, all_extracted_gt, llm_futures_by_key
+            )
+        )
+        for index, llm_future in llm_futures:
+            all_rewards[index] = llm_future.result()
+        for indices, future in batch_futures:
+            for index, reward, extracted_ans, extracted_gt in zip(indices, *future.result(), strict=True):
+                all_rewards[index] = reward
+                all_extracted_ans[index] = extracted_ans
+                all_extracted_gt[index] = extracted_gt
+        self._fill_duplicates(duplicates, all_rewards, all_extracted_ans, all_extracted_gt)
+
+        all_rewards = self._finalize_rewards(
+            batch, groups, all_rewards, log_reward_judge, log_save_dir, current_iteration
+        )
+
+        if return_extracted_answers:
+            return all_rewards, all_extracted_ans, all_extracted_gt
+
+        return all_rewards
+
+    async def aget_reward(
+        self,
+        prompts: Union[Sequence[str], str],
+        answers: Union[Sequence[str], str],
+        gt_answers: Union[Sequence[str], str],
+        uuids: Optional[Union[Sequence[str], str]] = None,
+        image_files: Optional[Union[Sequence[str], str]] = None,
+        answer_lengths: Optional[Union[Sequence[int], int]] = None,
+        datasources: Optional[Sequence[str] | str] = None,
+        log_reward_judge: bool = False,
+        save_dir: Optional[str] = None,
+        current_iteration: int = 0,
+        return_extracted_answers: bool = False,
+        extracted_gt_answers: Optional[Sequence[Any]] = None,
+    ) -> Union[list[float], tuple[list[float], list, list]]:
+        """
+        Awaitable version of `get_reward`, it returns the same values without blocking the event loop.
+
+        Answer extraction and rule-based judging run in the CPU pool, the items which need the LLM judge are
+        then judged by `Verifier.ajudge` in the I/O pool, with at most `max_concurrent_judges` of them in flight
+        per event loop.
+        If `executor_type` is "process", the answer extraction and rule-based judging run in the worker processes
+        instead.
+
+        Args:
+            See `get_reward`, except that `debug` is not supported.
+
+        Returns:
+            A list of rewards or a tuple of consisting of a list of rewards, a list of extracted answers,
+            and a list of extracted ground truth.
+        """
+        log_save_dir = save_dir if save_dir else self.reward_log_dir
+        self._sync_verdict_cache(current_iteration)
+
+        batch = self._prepare_batch(
+            prompts, answers, gt_answers, uuids, image_files, answer_lengths, datasources, extracted_gt_answers
+        )
+        groups = self._group_batch(batch)
+        verifiers = {datasource: self.get_verifier_from_datasource(datasource) for datasource in groups}
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_async_semaphore()
+
+        num_items = len(batch.prompts)
+        all_rewards: list[float] = [0.0] * num_items
+        all_extracted_ans: list[Any] = [None] * num_items
+        all_extracted_gt: list[Any] = [None] * num_items
+
+        # Schedule the items of all datasources concurrently and remember their positions,
+        # the duplicated items are judged once and mapped to the index of their first occurrence
+        duplicates: dict[int, int] = {}
+        llm_judges: dict[Hashable, asyncio.Task[float]] = {}
+        item_indices: list[int] = []
+        item_tasks = []
+        chunk_indices: list[list[int]] = []
+        chunk_tasks = []
+        batch_indices: list[list[int]] = []
+        batch_tasks = []
+        for datasource, group_indices in groups.items():
+            verifier = verifiers[datasource]
+            indices = self._deduplicate_items(batch, group_indices, duplicates)
+            if verifier.is_batch_verifier:
+                batch_indices.append(indices)
+                batch_tasks.append(
+                    loop.run_in_executor(
+                        self._cpu_pool, self._judge_batch, self._subset_batch(batch, indices), verifier
+                    )
+                )
+                continue
+
+            if self.executor_type == "process":
+                for indices_of_chunk, chunk_future in self._submit_to_process_pool(batch, indices, current_iteration):
+                    chunk_indices.append(indices_of_chunk)
+                    chunk_tasks.append(asyncio.wrap_future(chunk_future))
+                continue
+
+            for index in indices:
+                item_indices.append(index)
+                item_tasks.append(
+                    self._aprocess_single_item(
+                        batch.prompts[index],
+                        batch.answers[index],
+                        batch.gt_answers[index],
+                        batch.image_files[index],
+                        verifier,
+                        semaphore=semaphore,
+                        datasource=datasource,
+                        llm_judges=llm_judges,
+                        extracted_gt=self._get_extracted_gt(batch, index),
+                    )
+                )
+
+        item_results, chunk_results, batch_results = await asyncio.gather(
+            asyncio.gather(*item_tasks), asyncio.gather(*chunk_tasks), asyncio.gather(*batch_tasks)
+        )
+
+        for index, (reward, extracted_ans, extracted_gt) in zip(item_indices, item_results, strict=True):
+            all_rewards[index] = reward
+            all_extracted_ans[index] = extracted_ans
+            all_extracted_gt[index] = extracted_gt
+        # * the worker processes leave the LLM judge to the I/O pool of the main process
+        llm_indices: list[int] = []
+        llm_tasks = []
+        for indices, chunk_result in zip(chunk_indices, chunk_results, strict=True):
+            for index, result in zip(indices, self._decode_process_results(chunk_result), strict=True):
+                all_extracted_ans[index] = result.extracted_answer
+                all_extracted_gt[index] = result.extracted_gt
+                if result.reward is not None:
+                    all_rewards[index] = result.reward
+                    continue
+
+                datasource = batch.datasources[index]
+                judge_key = self._get_judge_key(
+                    datasource,
+                    batch.prompts[index],
+                    result.extracted_answer,
+                    result.extracted_gt,
+                    batch.image_files[index],
+                )
+                cached_reward = self._lookup_verdict(judge_key)
+                if cached_reward is not None:
+                    all_rewards[index] = cached_reward
+                    continue
+
+                llm_judge = llm_judges.get(judge_key) if judge_key is not None else None
+                if llm_judge is None:
+                    llm_judge = asyncio.ensure_future(
+                        self._ajudge_single_item(
+                            batch.prompts[index],
+                            result.extracted_answer,
+                            result.extracted_gt,
+                            batch.image_files[index],
+                            verifiers[datasource],
+                            semaphore,
+                            judge_key=judge_key,
+                            datasource=datasource,
+                        )
+                    )
+                    if judge_key is not None:
+                        llm_judges[judge_key] = llm_judge
+                llm_indices.append(index)
+                llm_tasks.append(llm_judge)
+        for index, reward in zip(llm_indices, await asyncio.gather(*llm_tasks), strict=True):
+            all_rewards[index] = reward
+        for indices, batch_result in zip(batch_indices, batch_results, strict=True):
+            for index, reward, extracted_ans, extracted_gt in zip(indices, *batch_result, strict=True):
+                all_rewards[index] = reward
+                all_extracted_ans[index] = extracted_ans
+                all_extracted_gt[index] = extracted_gt
+        self._fill_duplicates(duplicates, all_rewards, all_extracted_ans, all_extracted_gt)
+
+        finalize_fn = functools.partial(
+            self._finalize_rewards, batch, groups, all_rewards, log_reward_judge, log_save_dir, current_iteration
+        )
+        all_rewards = await loop.run_in_executor(self._io_pool, finalize_fn)
+
+        if return_extracted_answers:
+            return all_rewards, all_extracted_ans, all_extracted_gt
+
+        return all_rewards
+
+    def _get_process_pool(self) -> TrackedExecutor:
+        with self._process_pool_lock:
+            if self._closed:
+                err_msg = "The reward system has been closed."
+                raise RuntimeError(err_msg)
+            if self._process_pool is None:
+                process_pool = ProcessPoolExecutor(
+                    max_workers=self.num_process_workers,
+                    mp_context=multiprocessing.get_context(self.process_start_method),
+                    initializer=_init_process_worker,
+                    initargs=(msgspec.msgpack.encode(self.reward_config),),
+                )
+                self._process_pool = TrackedExecutor(process_pool, self.num_process_workers)
+            return self._process_pool
+
+    def _submit_to_process_pool(
+        self, batch: _RewardBatch, indices: list[int], current_iteration: int
+    ) -> list[tuple[list[int], Future[bytes]]]:
+        """
+        Split the items of a datasource group into chunks and submit them to the worker processes.
+
+        Returns:
+            A list of the item indices of each chunk and the future of its encoded results.
+        """
+        process_pool = self._get_process_pool()
+        chunk_size = math.ceil(len(indices) / (self.num_process_workers * _CHUNKS_PER_PROCESS_WORKER))
+
+        chunk_futures: list[tuple[list[int], Future[bytes]]] = []
+        for start in range(0, len(indices), chunk_size):
+            chunk = indices[start : start + chunk_size]
+            requests = [
+                _ItemRequest(
+                    datasource=batch.datasources[index],
+                    prompt=batch.prompts[index],
+                    answer=batch.answers[index],
+                    gt_answer=batch.gt_answers[index],
+                    image_file=batch.image_files[index],
+                    current_iteration=current_iteration,
+                    has_extracted_gt=batch.extracted_gt_answers is not None,
+                    extracted_gt=self._get_extracted_gt(batch, index, default=None),
+                )
+                for index in chunk
+            ]
+            future = process_pool.submit(_process_items_in_worker, msgspec.msgpack.encode(requests))
+            chunk_futures.append((chunk, future))
+        return chunk_futures
+
+    def _decode_process_results(self, payload: bytes) -> list[_ItemResult]:
+        chunk_result = msgspec.msgpack.decode(payload, type=_ChunkResult)
+        if chunk_result.metrics is not None and self._metrics is not None:
+            self._metrics.merge_state(chunk_result.metrics)
+        return chunk_result.results
+
+    def _get_async_semaphore(self) -> asyncio.Semaphore:
+        # * an `asyncio.Semaphore` is bound to the event loop it is first used in
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrent_judges)
+            self._async_semaphores[loop] = semaphore
+        return semaphore
 
+    @staticmethod
+    def _prepare_batch(
+        prompts: Union[Sequence[str], str],
+        answers: Union[Sequence[str], str],
+        gt_answers: Union[Sequence[str], str],
+        uuids: Optional[Union[Sequence[str], str]],
+        image_files: Optional[Union[Sequence[str], str]],
+        answer_lengths: Optional[Union[Sequence[int], int]],
+        datasources: Optional[Sequence[str] | str],
+        extracted_gt_answers: Optional[Sequence[Any]] = None,
+    ) -> _RewardBatch:
         # Ensure all inputs are lists
         prompt_lst: list[str] = ensure_list(prompts)
         answer_lst: list[str] = ensure_list(answers)
@@ -245,56 +1308,127 @@ class RewardSystem(object):
         answer_length_lst = [-1] * len(prompt_lst)
         if answer_lengths is not None:
             answer_length_lst = ensure_list(answer_lengths)
+        extracted_gt_answer_lst = None
+        if extracted_gt_answers is not None:
+            extracted_gt_answer_lst = list(extracted_gt_answers)
+            if len(extracted_gt_answer_lst) != len(prompt_lst):
+                err_msg = "The length of prompts and extracted_gt_answers should be the same."
+                raise ValueError(err_msg)
 
-        if len(set(datasource_lst)) != 1:
-            err_msg = "all datasources should be the same"
+        if not (
+            len(prompt_lst)
+            == len(answer_lst)
+            == len(gt_answer_lst)
+            == len(uuid_lst)
+            == len(image_file_lst)
+            == len(datasource_lst)
+            == len(answer_length_lst)
+        ):
+            err_msg = (
+                "The length of prompts, answers, gt_answers, uuids, image_files, datasources, "
+                "and answer_lengths should be the same."
+            )
             raise ValueError(err_msg)
-        datasource = datasource_lst[0]
 
-        # Process each prompt-answer-gt triplet using threads
-        all_rewards: list[float] = []
-        all_extracted_ans = []
-        all_extracted_gt = []
+        return _RewardBatch(
+            prompts=prompt_lst,
+            answers=answer_lst,
+            gt_answers=gt_answer_lst,
+            uuids=uuid_lst,
+            image_files=image_file_lst,
+            answer_lengths=answer_length_lst,
+            datasources=datasource_lst,
+            extracted_gt_answers=extracted_gt_answer_lst,
+        )
 
-        reward_config = self.get_reward_config_from_datasource(datasource)
-        verifier = get_verifier_from_config(reward_config, datasource)
+    @staticmethod
+    def _group_batch(batch: _RewardBatch) -> dict[str, list[int]]:
+        """
+        Group the item indices of a batch by datasource, in the order of first appearance.
+        """
+        groups: dict[str, list[int]] = {}
+        for index, datasource in enumerate(batch.datasources):
+            groups.setdefault(datasource, []).append(index)
+        return groups
+
+    @staticmethod
+    def _deduplicate_items(batch: _RewardBatch, indices: list[int], duplicates: dict[int, int]) -> list[int]:
+        """
+        Find the items with distinct prompts, answers, ground truth, image files and extracted ground truth.
+
+        Returns:
+            The indices of the first occurrences of the items, the indices of the other occurrences are mapped to
+            them in `duplicates`.
+        """
+        first_indices: dict[Hashable, int] = {}
+        unique_indices: list[int] = []
+        for index in indices:
+            try:
+                item_key = tuple(
+                    _to_hashable(values[index])
+                    for values in (
+                        batch.prompts,
+                        batch.answers,
+                        batch.gt_answers,
+                        batch.image_files,
+                        batch.extracted_gt_answers,
+                    )
+                    if values is not None
+                )
+            except (TypeError, msgspec.EncodeError):
+                unique_indices.append(index)
+                continue
+
+            first_index = first_indices.setdefault(item_key, index)
+            if first_index == index:
+                unique_indices.append(index)
+            else:
+                duplicates[index] = first_index
+        return unique_indices
+
+    @staticmethod
+    def _fill_duplicates(
+        duplicates: dict[int, int], all_rewards: list[float], all_extracted_ans: list[Any], all_extracted_gt: list[Any]
+    ) -> None:
+        for index, first_index in duplicates.items():
+            all_rewards[index] = all_rewards[first_index]
+            all_extracted_ans[index] = all_extracted_ans[first_index]
+            all_extracted_gt[index] = all_extracted_gt[first_index]
 
-        if verifier.is_batch_verifier:
+    @staticmethod
+    def _subset_batch(batch: _RewardBatch, indices: Sequence[int]) -> _RewardBatch:
+        return _RewardBatch._make(None if values is None else [values[index] for index in indices] for values in batch)
+
+    @staticmethod
+    def _get_extracted_gt(batch: _RewardBatch, index: int, default: Any = _MISSING) -> Any:
+        if batch.extracted_gt_answers is None:
+            return default
+        return batch.extracted_gt_answers[index]
+
+    def _judge_batch(self, batch: _RewardBatch, verifier: Verifier) -> tuple[list[float], list, list]:
+        datasource = batch.datasources[0] if batch.datasources else None
+        with self._metrics_scope(datasource, verifier), timed_stage("batch_judge"):
             # ! mypy issue, invalid signature and return type
-            batch_rewards = verifier.judge(
-                prompts=prompt_lst, answers=answer_lst, gt_answers=gt_answer_lst, image_files=image_file_lst
+            batch_rewards = verifier.judge(  # type: ignore[call-arg]
+                prompts=batch.prompts, answers=batch.answers, gt_answers=batch.gt_answers, image_files=batch.image_files
             )
 
-            all_rewards = batch_rewards
+        all_extracted_ans: list[Any] = []
+        all_extracted_gt: list[Any] = []
+        for index, (answer, gt_answer, prompt, datasource) in enumerate(
+            zip(batch.answers, batch.gt_answers, batch.prompts, batch.datasources)  # noqa: B905
+        ):
+            extracted_ans = verifier.extract_answer(answer, question=prompt)
+            extracted_gt = self._get_extracted_gt(batch, index)
+            if extracted_gt is _MISSING:
+                extracted_gt = self._extract_gt_answer(prompt, gt_answer, verifier, datasource)
+            all_extracted_ans.append(extracted_ans)
+            all_extracted_gt.append(extracted_gt)
 
-            for answer, gt_answer, prompt in zip(answer_lst, gt_answer_lst, prompt_lst):  # noqa: B905
-                extracted_ans = verifier.extract_answer(answer, question=prompt)
-                extracted_gt = verifier.extract_answer(gt_answer, question=prompt)
-                all_extracted_ans.append(extracted_ans)
-                all_extracted_gt.append(extracted_gt)
-
-        else:
-            # Create thread pool
-            with ThreadPoolExecutor(max_workers=min(128, len(prompts))) as executor:
-                # Submit all tasks and store futures in order
-                futures = []
-                for prompt, answer, gt_answer, image_file in zip(prompt_lst, answer_lst, gt_answer_lst, image_file_lst):  # noqa: B905
-                    future = executor.submit(
-                        self._process_single_item,
-                        prompt,
-                        answer,
-                        gt_answer,
-                        image_file,
-                        verifier,
-                        debug=debug,
-                    )
-                    futures.append(future)
-                for future in futures:
-                    reward, extracted_ans, extracted_gt = future.result()
-                    all_rewards.append(reward)
-                    all_extracted_ans.append(extracted_ans)
-                    all_extracted_gt.append(extracted_gt)
+        return batch_rewards, all_extracted_ans, all_extracted_gt  # type: ignore[return-value]
 
+    @staticmethod
+    def _normalize_rewards(all_rewards: list[float]) -> list[float]:
         # Check if there are any -inf rewards
         # make -inf rewards to min reward
         # if all -inf, make all rewards to 0
@@ -305,92 +1439,99 @@ class RewardSystem(object):
                 all_rewards = [min_non_inf if r == float("-inf") else r for r in all_rewards]
             else:
                 all_rewards = [0.0 if r == float("-inf") else r for r in all_rewards]
+        return all_rewards
 
-        if log_reward_judge:
-            if not (
-                len(prompt_lst)
-                == len(image_file_lst)
-                == len(answer_lst)
-                == len(gt_answer_lst)
-                == len(datasource_lst)
-                == len(all_rewards)
-                == len(answer_length_lst)
-                == len(uuid_lst)
-            ):
-                err_msg = (
-                    "The length of prompts, image_files, answers, gt_answers, datasources, all_rewards, "
-                    "answer_lengths, and uuids should be the same."
-                )
-                raise ValueError(err_msg)
+    def _finalize_rewards(
+        self,
+        batch: _RewardBatch,
+        groups: dict[str, list[int]],
+        all_rewards: list[float],
+        log_reward_judge: bool,
+        log_save_dir: str,
+        current_iteration: int,
+    ) -> list[float]:
+        """
+        Normalize the rewards of each datasource group separately and log them if required.
+        """
+        normalized_rewards = list(all_rewards)
+        for datasource, indices in groups.items():
+            group_rewards = self._normalize_rewards([all_rewards[index] for index in indices])
+            for index, reward in zip(indices, group_rewards, strict=True):
+                normalized_rewards[index] = reward
 
-            save_pobj = mkdir(log_save_dir)
-            datasource_dir = save_pobj / datasource
-            _ = mkdir(datasource_dir)
-
-            reward_status = "pass@k" if any(reward > 0.75 for reward in all_rewards) else "not_pass@k"
-            # Log each reward data pair
-            for prompt, image_file, answer, gt_answer, reward, answer_length, uuid in zip(
-                prompt_lst,
-                image_file_lst,
-                answer_lst,
-                gt_answer_lst,
-                all_rewards,
-                answer_length_lst,
-                uuid_lst,
-                strict=True,
-            ):
-                # Setup save directory and path
-                rollout_save_pobj = datasource_dir / f"rollout_reward_{reward_status}.jsonl"
-
-                # Write reward data to file
-                reward_data = {
-                    "current_iteration": current_iteration,
-                    "prompt": prompt,
-                    "image_file": image_file,
-                    "answer": answer,
-                    "gt_answer": gt_answer,
-                    "reward": reward,
-                    "answer_token_length": answer_length,
-                    "reward_sum_of_this_prompt": sum(all_rewards),
-                    "uuid": uuid,
-                }
-                with open(rollout_save_pobj, "a") as f:
-                    f.write(json.dumps(reward_data, ensure_ascii=False) + "\n")
-
-            for prompt, image_file, answer, gt_answer, reward, answer_length, uuid in zip(
-                prompt_lst,
-                image_file_lst,
-                answer_lst,
-                gt_answer_lst,
-                all_rewards,
-                answer_length_lst,
-                uuid_lst,
-                strict=True,
-            ):
-                reward_status = "correct" if reward > 0 else "incorrect"
-                rollout_save_pobj = datasource_dir / f"rollout_reward_{reward_status}.jsonl"
-                with open(rollout_save_pobj, "a") as f:
-                    f.write(
-                        json.dumps(
-                            {
-                                "current_iteration": current_iteration,
-                                "prompt": prompt,
-                                "image_file": image_file,
-                                "answer": answer,
-                                "answer_token_length": answer_length,
-                                "gt_answer": gt_answer,
-                                "reward": reward,
-                                "reward_sum_of_this_prompt": sum(all_rewards),
-                                "uuid": uuid,
-                            },
-                            ensure_ascii=False,
-                        )
-                        + "\n"
-                    )
-        if return_extracted_answers:
-            return all_rewards, all_extracted_ans, all_extracted_gt
+            if log_reward_judge:
+                group_batch = self._subset_batch(batch, indices)
+                self._log_reward_judge(group_batch, group_rewards, datasource, log_save_dir, current_iteration)
+        return normalized_rewards
 
-        return all_rewards
+    def _log_reward_judge(
+        self,
+        batch: _RewardBatch,
+        all_rewards: list[float],
+        datasource: str,
+        log_save_dir: str,
+        current_iteration: int,
+    ) -> None:
+        if not (
+            len(batch.prompts)
+            == len(batch.image_files)
+            == len(batch.answers)
+            == len(batch.gt_answers)
+            == len(batch.datasources)
+            == len(all_rewards)
+            == len(batch.answer_lengths)
+            == len(batch.uuids)
+        ):
+            err_msg = (
+                "The length of prompts, image_files, answers, gt_answers, datasources, all_rewards, "
+                "answer_lengths, and uuids should be the same."
+            )
+            raise ValueError(err_msg)
+
+        # * the records are encoded and appended to the files in the background
+        log_writer = self._get_log_writer()
+        datasource_dir = resolve_path(log_save_dir) / datasource
+
+        reward_status = "pass@k" if any(reward > 0.75 for reward in all_rewards) else "not_pass@k"
+        encoded_reward_sum = _encode_log_float(sum(all_rewards))
+        # Log each reward data pair
+        for prompt, image_file, answer, gt_answer, reward, answer_length, uuid in zip(
+            batch.prompts,
+            batch.image_files,
+            batch.answers,
+            batch.gt_answers,
+            all_rewards,
+            batch.answer_lengths,
+            batch.uuids,
+            strict=True,
+        ):
+            encoded_reward = _encode_log_float(reward)
+            reward_data = _RewardLogRecord(
+                current_iteration=current_iteration,
+                prompt=prompt,
+                image_file=image_file,
+                answer=answer,
+                gt_answer=gt_answer,
+                reward=encoded_reward,
+                answer_token_length=answer_length,
+                reward_sum_of_this_prompt=encoded_reward_sum,
+                uuid=uuid,
+            )
+            log_writer.write((datasource_dir / f"rollout_reward_{reward_status}.jsonl",), reward_data)
+
+            correctness_data = _CorrectnessLogRecord(
+                current_iteration=current_iteration,
+                prompt=prompt,
+                image_file=image_file,
+                answer=answer,
+                answer_token_length=answer_length,
+                gt_answer=gt_answer,
+                reward=encoded_reward,
+                reward_sum_of_this_prompt=encoded_reward_sum,
+                uuid=uuid,
+            )
+            correctness = "correct" if reward > 0 else "incorrect"
+            log_writer.write((datasource_dir / f"rollout_reward_{correctness}.jsonl",), correctness_data)
 
     def extract_answer_from_response(
         self, answers: Union[Sequence[str], str], datasources: Union[Sequence[str], str]
@@ -408,3 +1549,103 @@ class RewardSystem(object):
             all_extracted_ans.append(extracted_ans)
 
         return all_extracted_ans
+
+    def extract_gt_answers(
+        self,
+        gt_answers: Union[Sequence[str], str],
+        datasources: Union[Sequence[str], str],
+        prompts: Optional[Union[Sequence[str], str]] = None,
+    ) -> list:
+        """
+        Extract the ground truth offline, to be passed to `get_reward` as `extracted_gt_answers`.
+
+        Returns:
+            A list of the extracted ground truth, None for the ground truth with a bad format or which cannot be
+            extracted.
+        """
+        gt_answer_lst: list[str] = ensure_list(gt_answers)
+        datasource_lst: list[str] = ensure_list(datasources)
+        prompt_lst: list[Optional[str]] = [None] * len(gt_answer_lst)
+        if prompts is not None:
+            prompt_lst = ensure_list(prompts)
+
+        all_extracted_gt: list[Any] = []
+        for gt_answer, datasource, prompt in zip(gt_answer_lst, datasource_lst, prompt_lst, strict=True):
+            if isinstance(gt_answer, str) and not self.check_answer_format(gt_answer):
+                _logger.warning("> Receive bad format gt_answer: %s, please check your data", gt_answer)
+                all_extracted_gt.append(None)
+                continue
+
+            verifier = self.get_verifier_from_datasource(datasource)
+            all_extracted_gt.append(self._extract_gt_answer(prompt, gt_answer, verifier, datasource))
+
+        return all_extracted_gt
+
+
+def _to_hashable(value: Any) -> Hashable:
+    if isinstance(value, str):
+        return value
+    # * lists and dicts are not hashable, encode them with the sorted keys instead
+    return msgspec.json.encode(value, order="deterministic")
+
+
+def _normalize_judge_key_part(value: Any) -> Hashable:
+    if isinstance(value, str):
+        return value.strip()
+    return _to_hashable(value)
+
+
+# * the reward system of a worker process, see `RewardSystem._get_process_pool`
+_WORKER_REWARD_SYSTEM: Optional[RewardSystem] = None
+
+
+def _init_process_worker(config_payload: bytes) -> None:
+    global _WORKER_REWARD_SYSTEM
+
+    reward_config = msgspec.msgpack.decode(config_payload, type=RewardSystemConfig)
+    # * the worker judges its items in place, it must not start worker processes by itself,
+    # * and sends its metrics back with the results instead of dumping them
+    # * its LLM calls are deferred to the main process, so its thread pools stay idle and it sets up none of the LLM
+    # * judge cache, replicas, hedging and batching
+    _WORKER_REWARD_SYSTEM = RewardSystem(
+        msgspec.structs.replace(
+            reward_config,
+            executor_type="thread",
+            metrics_dump_path=None,
+            num_cpu_workers=1,
+            num_io_workers=1,
+            llm_cache_path=None,
+            llm_replica_pools={},
+            enable_llm_hedging=False,
+            enable_llm_batching=False,
+        )
+    )
+
+
+def _process_items_in_worker(payload: bytes) -> bytes:
+    if _WORKER_REWARD_SYSTEM is None:
+        err_msg = "The worker process is not initialized."
+        raise RuntimeError(err_msg)
+
+    results: list[_ItemResult] = []
+    for request in msgspec.msgpack.decode(payload, type=list[_ItemRequest]):
+        # * verifier instances are built once per worker process and cached in the verifier registry
+        verifier = _WORKER_REWARD_SYSTEM.get_verifier_from_datasource(request.datasource)
+        # * each worker process keeps its own verdict cache
+        _WORKER_REWARD_SYSTEM._sync_verdict_cache(request.current_iteration)
+        # * the LLM judge is left to the main process, so the worker processes never wait for the network
+        reward, extracted_ans, extracted_gt = _WORKER_REWARD_SYSTEM._prejudge_single_item(
+            request.prompt,
+            request.answer,
+            request.gt_answer,
+            request.image_file,
+            verifier,
+            datasource=request.datasource,
+            extracted_gt=request.extracted_gt if request.has_extracted_gt else _MISSING,
+        )
+        results.append(_ItemResult(reward=reward, extracted_answer=extracted_ans, extracted_gt=extracted_gt))
+
+    metrics = None
+    if _WORKER_REWARD_SYSTEM._metrics is not None:
+        metrics = _WORKER_REWARD_SYSTEM._metrics.drain_state()
+    return msgspec.msgpack.encode(_ChunkResult(results=results, metrics=metrics))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Generic, Optional, TypeVar, Union
+
+import msgspec
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+D = TypeVar("D")
+
+
+class CacheStats(msgspec.Struct, frozen=True):
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A thread-safe mapping which keeps at most `maxsize` of the most recently used entries.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        if maxsize <= 0:
+            err_msg = f"`maxsize` should be greater than 0, but got {maxsize}."
+            raise ValueError(err_msg)
+
+        self.maxsize = maxsize
+        self._data: OrderedDict[K, V] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K, default: Optional[D] = None) -> Union[V, Optional[D]]:
+        with self._lock:
+            if key not in self._data:
+                self._misses += 1
+                return default
+            self._hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: K, value: V) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(hits=self._hits, misses=self._misses, size=len(self._data), maxsize=self.maxsize)
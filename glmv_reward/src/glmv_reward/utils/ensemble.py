@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+
+import contextvars
+import functools
+import math
+import os
+import threading
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Literal, NamedTuple, Optional, Union
+
+import msgspec
+
+from .llm import LLMCallDeferred, is_llm_call_deferred, post_query_llm
+from .logging import get_logger
+from .metrics import HistogramState
+from .misc import ensure_list
+
+_logger = get_logger(__name__)
+
+_DEFAULT_MODEL = "glm-4-flash"
+# * the members of all the ensembles are queried in one pool, bounding the requests of the ensembles at once
+_MAX_ENSEMBLE_WORKERS = 256
+
+
+class EnsembleMember(NamedTuple):
+    api_key: str
+    url: str
+    model: str
+
+
+class EndpointStats(msgspec.Struct):
+    # requests sent to the endpoint
+    requests: int = 0
+    # requests which failed or got an empty, unparsable or non-finite response
+    failures: int = 0
+    # votes which agree or disagree with the majority verdict, including the votes received after the verdict
+    agreements: int = 0
+    disagreements: int = 0
+    # requests cancelled before being sent, since the verdict was reached without them
+    cancelled: int = 0
+    latency: HistogramState = msgspec.field(default_factory=HistogramState)
+
+
+_endpoint_stats: dict[tuple[str, str], EndpointStats] = {}
+_endpoint_stats_lock = threading.Lock()
+_ensemble_pool: Optional[ThreadPoolExecutor] = None
+_ensemble_pool_lock = threading.Lock()
+
+
+def get_ensemble_members(
+    api_keys: Union[str, Sequence[str]],
+    urls: Union[str, Sequence[str]],
+    models: Optional[Union[str, Sequence[str]]] = None,
+) -> list[EnsembleMember]:
+    """
+    Pair up the API keys, URLs and models of the LLM judges of a verifier, the models default to glm-4-flash.
+    """
+    api_key_lst: list[str] = ensure_list(api_keys)
+    url_lst: list[str] = ensure_list(urls)
+    model_lst: list[str] = [_DEFAULT_MODEL] * len(api_key_lst)
+    if models is not None:
+        model_lst = ensure_list(models)
+    return [
+        EnsembleMember(api_key, url, model) for api_key, url, model in zip(api_key_lst, url_lst, model_lst, strict=True)
+    ]
+
+
+def judge_with_ensemble(
+    prompt: str,
+    members: Sequence[EnsembleMember],
+    parse_score: Callable[[str], Optional[float]],
+    reduce: Literal["majority", "mean"] = "majority",
+    **query_kwargs: Any,
+) -> float:
+    """
+    Query the LLM judges of the ensemble concurrently and combine their scores.
+
+    Each score is clipped between 0 and 1, and a member which fails or gives an invalid response scores 0. With
+    "majority", the verdict is 1.0 if the sum of the scores is greater than half of the members, and it is returned
+    as soon as the remaining members cannot change it. The requests which are not sent yet are cancelled, and the
+    responses of the others are ignored. With "mean", the verdict is the mean of the scores of all the members.
+
+    Args:
+        prompt: The prompt sent to each member.
+        members: The LLM judges, see `get_ensemble_members`.
+        parse_score: Parses the response of a member into its score, or returns None if it is invalid.
+        reduce: How to combine the scores.
+        query_kwargs: Other arguments of `post_query_llm`.
+
+    Raises:
+        LLMCallDeferred: If called inside `defer_llm_calls`.
+    """
+    if is_llm_call_deferred():
+        raise LLMCallDeferred
+    if len(members) == 0:
+        err_msg = "The ensemble of LLM judges is empty."
+        raise ValueError(err_msg)
+
+    if len(members) == 1:
+        score = _query_member(prompt, members[0], parse_score, query_kwargs)
+        if reduce == "majority":
+            verdict = float(score > 0.5)
+            _record_vote(members[0], score, verdict)
+            return verdict
+        return score
+
+    # * each task runs in a copy of the current context, to record its latency in the metrics scope of the caller
+    pool = _get_ensemble_pool()
+    futures: dict[Future[float], EnsembleMember] = {
+        pool.submit(contextvars.copy_context().run, _query_member, prompt, member, parse_score, query_kwargs): member
+        for member in members
+    }
+
+    total_score = 0.0
+    majority_verdict: Optional[float] = None
+    pending = set(futures)
+    try:
+        while len(pending) > 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # * the failed members are counted in `_query_member`
+            total_score += sum(future.result() if future.exception() is None else 0.0 for future in done)
+            if reduce != "majority":
+                continue
+            if total_score > len(members) / 2 or total_score + len(pending) <= len(members) / 2:
+                break
+
+        if reduce == "mean":
+            return total_score / len(members)
+        majority_verdict = float(total_score > len(members) / 2)
+    finally:
+        # * the votes are recorded once the majority_verdict is known, the requests which are not needed are cancelled
+        for future, member in futures.items():
+            if future.cancel():
+                with _endpoint_stats_lock:
+                    _get_endpoint_stats(member).cancelled += 1
+            elif majority_verdict is not None:
+                future.add_done_callback(functools.partial(_record_vote_when_done, member, majority_verdict))
+    return majority_verdict
+
+
+def get_endpoint_stats() -> dict[str, dict[str, Any]]:
+    """
+    Get the stats of the LLM judge endpoints queried by the ensembles of this process.
+
+    Returns:
+        A dict of "url@model" to its request, failure, agreement, disagreement and cancellation counts, and its
+        latency summary in seconds.
+    """
+    with _endpoint_stats_lock:
+        return {
+            f"{url}@{model}": {
+                "requests": stats.requests,
+                "failures": stats.failures,
+                "agreements": stats.agreements,
+                "disagreements": stats.disagreements,
+                "cancelled": stats.cancelled,
+                "latency": stats.latency.summary(),
+            }
+            for (url, model), stats in _endpoint_stats.items()
+        }
+
+
+def reset_endpoint_stats() -> None:
+    with _endpoint_stats_lock:
+        _endpoint_stats.clear()
+
+
+def _get_ensemble_pool() -> ThreadPoolExecutor:
+    global _ensemble_pool
+
+    with _ensemble_pool_lock:
+        if _ensemble_pool is None:
+            _ensemble_pool = ThreadPoolExecutor(_MAX_ENSEMBLE_WORKERS, thread_name_prefix="glmv_reward_ensemble")
+        return _ensemble_pool
+
+
+def _reset_ensemble_pool_after_fork() -> None:
+    # * the threads of the pool do not survive a fork
+    global _ensemble_pool, _ensemble_pool_lock, _endpoint_stats_lock
+
+    _ensemble_pool = None
+    _ensemble_pool_lock = threading.Lock()
+    _endpoint_stats_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_ensemble_pool_after_fork)
+
+
+def _query_member(
+    prompt: str,
+    member: EnsembleMember,
+    parse_score: Callable[[str], Optional[float]],
+    query_kwargs: dict[str, Any],
+) -> float:
+    started_at = time.perf_counter()
+    score: Optional[float] = None
+    try:
+        response = post_query_llm(prompt, member.api_key, url=member.url, model=member.model, **query_kwargs)
+        score = parse_score(response)
+    finally:
+        latency = time.perf_counter() - started_at
+        with _endpoint_stats_lock:
+            stats = _get_endpoint_stats(member)
+            stats.requests += 1
+            stats.latency.add(latency)
+            if score is None or math.isnan(score):
+                stats.failures += 1
+    if score is None or math.isnan(score):
+        return 0.0
+    return min(max(score, 0.0), 1.0)
+
+
+def _get_endpoint_stats(member: EnsembleMember) -> EndpointStats:
+    # * the caller holds `_endpoint_stats_lock`
+    stats = _endpoint_stats.get((member.url, member.model))
+    if stats is None:
+        stats = _endpoint_stats[member.url, member.model] = EndpointStats()
+    return stats
+
+
+def _record_vote_when_done(member: EnsembleMember, verdict: float, future: Future[float]) -> None:
+    if future.exception() is None:
+        _record_vote(member, future.result(), verdict)
+
+
+def _record_vote(member: EnsembleMember, score: float, verdict: float) -> None:
+    with _endpoint_stats_lock:
+        stats = _get_endpoint_stats(member)
+        if float(score > 0.5) == verdict:
+            stats.agreements += 1
+        else:
+            stats.disagreements += 1
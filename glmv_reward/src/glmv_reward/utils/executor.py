@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, Future
+from typing import Any, ParamSpec, TypeVar
+
+import msgspec
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+class ExecutorStats(msgspec.Struct, frozen=True):
+    max_workers: int
+    # tasks submitted but not started yet
+    queued: int
+    # tasks being executed
+    running: int
+    completed: int
+    # fraction of the workers busy right now
+    utilization: float
+    # fraction of the worker time spent on tasks since the executor was created
+    average_utilization: float
+
+
+class TrackedExecutor(Executor):
+    """
+    Wrap an executor to keep track of its queue depth and utilization.
+
+    The executor is assumed to start a task as soon as one of its workers is idle, so the number of running tasks
+    is the number of unfinished tasks capped by `max_workers`. This holds for both thread and process pools and
+    does not require wrapping the submitted callables, which keeps them picklable.
+    """
+
+    def __init__(self, executor: Executor, max_workers: int) -> None:
+        self.max_workers = max_workers
+        self._executor = executor
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._created_at = time.perf_counter()
+        self._last_changed_at = self._created_at
+        self._busy_worker_seconds = 0.0
+
+    def _update_pending(self, delta: int) -> None:
+        # * integrates the number of busy workers over time, must be called with the lock held
+        now = time.perf_counter()
+        self._busy_worker_seconds += min(self._pending, self.max_workers) * (now - self._last_changed_at)
+        self._last_changed_at = now
+        self._pending += delta
+
+    def _on_done(self, future: Future[Any]) -> None:
+        del future
+        with self._lock:
+            self._update_pending(-1)
+            self._completed += 1
+
+    def submit(self, fn: Callable[P, T], /, *args: P.args, **kwargs: P.kwargs) -> Future[T]:
+        with self._lock:
+            future = self._executor.submit(fn, *args, **kwargs)
+            self._update_pending(1)
+        # * runs immediately if the task has already finished
+        future.add_done_callback(self._on_done)
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def stats(self) -> ExecutorStats:
+        with self._lock:
+            self._update_pending(0)
+            running = min(self._pending, self.max_workers)
+            elapsed_worker_seconds = (self._last_changed_at - self._created_at) * self.max_workers
+            average_utilization = 0.0
+            if elapsed_worker_seconds > 0:
+                average_utilization = self._busy_worker_seconds / elapsed_worker_seconds
+            return ExecutorStats(
+                max_workers=self.max_workers,
+                queued=self._pending - running,
+                running=running,
+                completed=self._completed,
+                utilization=running / self.max_workers,
+                average_utilization=average_utilization,
+            )
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Optional, TypeVar
+
+import msgspec
+
+from .metrics import count_event
+
+T = TypeVar("T")
+
+# * the hedging delay is recomputed from the recent latencies once every this number of requests
+_DELAY_UPDATE_INTERVAL = 32
+# * the attempts have their own pool, a caller waiting on them, e.g. an ensemble member, never holds their worker
+_MAX_HEDGING_WORKERS = 256
+
+
+class HedgingOptions(msgspec.Struct, frozen=True):
+    # a duplicate of a request is sent once it takes longer than this percentile of the recent latencies
+    percentile: float = 95.0
+    # maximum ratio of the duplicated requests to all the requests
+    budget: float = 0.05
+    # the duplicates are only sent after this number of seconds, whatever the recent latencies
+    min_delay: float = 0.0
+    # number of recent latencies kept, and the number needed before sending any duplicate
+    window: int = 1000
+    min_samples: int = 20
+
+
+class HedgingPolicy(object):
+    """
+    Hedge the requests to an endpoint: once a request takes longer than a percentile of the recent latencies, a
+    duplicate is sent and the first answer is taken, as long as the duplicates stay within the budget.
+    """
+
+    def __init__(self, options: Optional[HedgingOptions] = None) -> None:
+        self.options = options or HedgingOptions()
+        if not 0 < self.options.percentile < 100:
+            err_msg = f"`percentile` should be between 0 and 100, but got {self.options.percentile}."
+            raise ValueError(err_msg)
+
+        self._latencies: deque[float] = deque(maxlen=self.options.window)
+        self._delay: Optional[float] = None
+        self._num_recorded = 0
+        self._requests = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def run(self, attempt: Callable[[], T]) -> T:
+        """
+        Run `attempt`, and run it again concurrently if it takes longer than the hedging delay.
+
+        Returns:
+            The result of the first attempt which succeeds.
+
+        Raises:
+            Exception: The error of the last attempt, if all of them fail.
+        """
+        with self._lock:
+            self._requests += 1
+            delay = self._delay
+
+        started_at = time.perf_counter()
+        if delay is None:
+            result = attempt()
+            self._record(time.perf_counter() - started_at)
+            return result
+
+        # * each attempt runs in a copy of the current context, to record its events in the metrics scope of the caller
+        pool = _get_hedging_pool()
+        primary = pool.submit(contextvars.copy_context().run, attempt)
+        pending: set[Future[T]] = {primary}
+        done, _ = wait(pending, timeout=delay)
+        if len(done) == 0 and self._try_hedge():
+            count_event("llm_hedged_requests")
+            pending.add(pool.submit(contextvars.copy_context().run, attempt))
+
+        errors: list[BaseException] = []
+        while len(pending) > 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is not None:
+                    errors.append(error)
+                    continue
+                self._record(time.perf_counter() - started_at)
+                if future is not primary:
+                    count_event("llm_hedge_wins")
+                    with self._lock:
+                        self._hedge_wins += 1
+                return future.result()
+        raise errors[-1]
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get the requests, the duplicated requests, the duplicates which answered first and the current delay.
+        """
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "hedges": self._hedges,
+                "hedge_wins": self._hedge_wins,
+                "delay": self._delay,
+            }
+
+    def _try_hedge(self) -> bool:
+        with self._lock:
+            if self._hedges + 1 > self.options.budget * self._requests:
+                return False
+            self._hedges += 1
+            return True
+
+    def _record(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+            self._num_recorded += 1
+            if len(self._latencies) < self.options.min_samples:
+                return
+            if self._delay is not None and self._num_recorded % _DELAY_UPDATE_INTERVAL != 0:
+                return
+            latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, math.ceil(len(latencies) * self.options.percentile / 100) - 1)
+        delay = max(self.options.min_delay, latencies[index])
+        with self._lock:
+            self._delay = delay
+
+
+_hedging_options: Optional[HedgingOptions] = None
+_hedging_policies: dict[str, HedgingPolicy] = {}
+_hedging_lock = threading.Lock()
+_hedging_pool: Optional[ThreadPoolExecutor] = None
+
+
+def configure_hedging(options: Optional[HedgingOptions]) -> None:
+    """
+    Hedge the requests of `post_query_llm` with these options, None disables the hedging.
+    The latencies recorded before are dropped.
+    """
+    global _hedging_options
+
+    with _hedging_lock:
+        _hedging_options = options
+        _hedging_policies.clear()
+
+
+def install_hedging(options: HedgingOptions) -> bool:
+    """
+    Hedge the requests of `post_query_llm` with these options unless other options are set, and return whether
+    they are set.
+    """
+    global _hedging_options
+
+    with _hedging_lock:
+        if _hedging_options is not None and _hedging_options is not options:
+            return False
+        if _hedging_options is None:
+            _hedging_options = options
+            _hedging_policies.clear()
+        return True
+
+
+def uninstall_hedging(options: HedgingOptions) -> None:
+    """
+    Disable the hedging of the requests of `post_query_llm` if it uses these options.
+    """
+    global _hedging_options
+
+    with _hedging_lock:
+        if _hedging_options is options:
+            _hedging_options = None
+            _hedging_policies.clear()
+
+
+def get_hedging_policy(url: str) -> Optional[HedgingPolicy]:
+    """
+    Get the hedging policy of the requests to the URL, or None if the hedging is disabled.
+    """
+    if _hedging_options is None:
+        return None
+    policy = _hedging_policies.get(url)
+    if policy is not None:
+        return policy
+    with _hedging_lock:
+        if _hedging_options is None:
+            return None
+        policy = _hedging_policies.get(url)
+        if policy is None:
+            policy = _hedging_policies[url] = HedgingPolicy(_hedging_options)
+        return policy
+
+
+def get_hedging_stats() -> dict[str, dict[str, Any]]:
+    """
+    Get the stats of the hedged requests of this process for each URL, see `HedgingPolicy.stats`.
+    """
+    with _hedging_lock:
+        policies = list(_hedging_policies.items())
+    return {url: policy.stats() for url, policy in policies}
+
+
+def _get_hedging_pool() -> ThreadPoolExecutor:
+    global _hedging_pool
+
+    with _hedging_lock:
+        if _hedging_pool is None:
+            _hedging_pool = ThreadPoolExecutor(_MAX_HEDGING_WORKERS, thread_name_prefix="glmv_reward_hedging")
+        return _hedging_pool
+
+
+def _reset_hedging_after_fork() -> None:
+    # * the threads of the pool do not survive a fork
+    global _hedging_pool, _hedging_lock
+
+    _hedging_pool = None
+    _hedging_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_hedging_after_fork)
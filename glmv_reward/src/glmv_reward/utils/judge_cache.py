@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+import msgspec
+
+from .cache import CacheStats
+from .logging import get_logger
+
+_logger = get_logger(__name__)
+
+# * expired and excess entries are deleted once every this number of insertions of a process
+_PRUNE_INTERVAL = 1000
+# * seconds to wait for the lock of the database held by another process
+_BUSY_TIMEOUT = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS judge_responses (
+    key BLOB PRIMARY KEY,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS judge_responses_created_at ON judge_responses (created_at);
+"""
+
+
+def make_judge_cache_key(
+    prompt: str,
+    model: str,
+    max_tokens: Optional[int],
+    temperature: Optional[float],
+    top_p: Optional[float],
+) -> bytes:
+    """
+    Hash the formatted prompt, the model and the sampling parameters of an LLM judge request.
+    """
+    return hashlib.sha256(msgspec.msgpack.encode([prompt, model, max_tokens, temperature, top_p])).digest()
+
+
+class JudgeCache(object):
+    """
+    A cache of the LLM judge responses in a SQLite database, shared by the processes on the same host.
+
+    The database is opened in WAL mode, so the readers never wait for the writers. Each thread of each process
+    uses its own connection.
+
+    Args:
+        path: Path of the database file.
+        ttl: Seconds a response stays valid, 0 keeps the responses forever.
+        max_entries: Maximum number of responses kept, the oldest ones are deleted first, 0 keeps all of them.
+        read_only: Only look up the responses, e.g. for evaluation runs, without inserting or deleting any.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        ttl: float = 0.0,
+        max_entries: int = 0,
+        read_only: bool = False,
+    ) -> None:
+        if ttl < 0:
+            err_msg = f"`ttl` should not be negative, but got {ttl}."
+            raise ValueError(err_msg)
+        if max_entries < 0:
+            err_msg = f"`max_entries` should not be negative, but got {max_entries}."
+            raise ValueError(err_msg)
+
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.read_only = read_only
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+        self._hits = 0
+        self._misses = 0
+        self._num_puts = 0
+
+        if read_only:
+            if not self.path.exists():
+                _logger.warning("> The LLM judge cache %s does not exist, all lookups will miss", self.path)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = self._get_connection()
+            connection.executescript(_SCHEMA)
+            self.prune()
+
+    def get(self, key: bytes, count_miss: bool = True) -> Optional[str]:
+        """
+        Get the cached response, or None if it is missing or expired.
+
+        Args:
+            key: See `make_judge_cache_key`.
+            count_miss: Count a miss in `stats`, disabled when the same key will be looked up again.
+        """
+        response: Optional[str] = None
+        try:
+            row = (
+                self._get_connection()
+                .execute("SELECT response, created_at FROM judge_responses WHERE key = ?", (key,))
+                .fetchone()
+            )
+        except sqlite3.Error as e:
+            _logger.warning("> Failed to look up the LLM judge cache %s: %s", self.path, repr(e))
+        else:
+            if row is not None and (self.ttl == 0 or row[1] >= time.time() - self.ttl):
+                response = row[0]
+
+        with self._lock:
+            if response is not None:
+                self._hits += 1
+            elif count_miss:
+                self._misses += 1
+        return response
+
+    def put(self, key: bytes, response: str) -> None:
+        if self.read_only:
+            return
+
+        try:
+            self._get_connection().execute(
+                "INSERT OR REPLACE INTO judge_responses (key, response, created_at) VALUES (?, ?, ?)",
+                (key, response, time.time()),
+            )
+        except sqlite3.Error as e:
+            _logger.warning("> Failed to insert into the LLM judge cache %s: %s", self.path, repr(e))
+            return
+
+        with self._lock:
+            self._num_puts += 1
+            should_prune = self._num_puts % _PRUNE_INTERVAL == 0
+        if should_prune:
+            self.prune()
+
+    def prune(self) -> None:
+        """
+        Delete the expired responses, then the oldest ones beyond `max_entries`.
+        """
+        if self.read_only or (self.ttl == 0 and self.max_entries == 0):
+            return
+
+        try:
+            connection = self._get_connection()
+            if self.ttl > 0:
+                connection.execute("DELETE FROM judge_responses WHERE created_at < ?", (time.time() - self.ttl,))
+            if self.max_entries > 0:
+                (num_entries,) = connection.execute("SELECT COUNT(*) FROM judge_responses").fetchone()
+                if num_entries > self.max_entries:
+                    connection.execute(
+                        "DELETE FROM judge_responses WHERE key IN "
+                        "(SELECT key FROM judge_responses ORDER BY created_at LIMIT ?)",
+                        (num_entries - self.max_entries,),
+                    )
+        except sqlite3.Error as e:
+            _logger.warning("> Failed to prune the LLM judge cache %s: %s", self.path, repr(e))
+
+    def stats(self) -> CacheStats:
+        """
+        Get the hits and misses of this process, and the number of responses in the database.
+        """
+        size = 0
+        try:
+            (size,) = self._get_connection().execute("SELECT COUNT(*) FROM judge_responses").fetchone()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            return CacheStats(hits=self._hits, misses=self._misses, size=size, maxsize=self.max_entries)
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # * the connections of the parent process must not be used by a forked child
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) == pid:
+            connection: sqlite3.Connection = self._local.connection
+            return connection
+
+        if self.read_only:
+            connection = sqlite3.connect(
+                f"{self.path.resolve().as_uri()}?mode=ro", timeout=_BUSY_TIMEOUT, uri=True, check_same_thread=False
+            )
+        else:
+            # * autocommit, each statement is a transaction
+            connection = sqlite3.connect(
+                self.path, timeout=_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+        self._local.pid = pid
+        self._local.connection = connection
+        with self._lock:
+            self._connections.append(connection)
+        return connection
+
+
+_judge_cache: Optional[JudgeCache] = None
+_judge_cache_lock = threading.Lock()
+
+
+def configure_judge_cache(cache: Optional[JudgeCache]) -> None:
+    """
+    Set the cache of the responses of `post_query_llm`, None disables it.
+    """
+    global _judge_cache
+
+    with _judge_cache_lock:
+        _judge_cache = cache
+
+
+def install_judge_cache(cache: JudgeCache) -> bool:
+    """
+    Set the cache of the responses of `post_query_llm` unless another one is set, and return whether it is set.
+    """
+    global _judge_cache
+
+    with _judge_cache_lock:
+        if _judge_cache is not None and _judge_cache is not cache:
+            return False
+        _judge_cache = cache
+        return True
+
+
+def uninstall_judge_cache(cache: JudgeCache) -> None:
+    """
+    Unset the cache of the responses of `post_query_llm` if it is this one.
+    """
+    global _judge_cache
+
+    with _judge_cache_lock:
+        if _judge_cache is cache:
+            _judge_cache = None
+
+
+def get_judge_cache() -> Optional[JudgeCache]:
+    return _judge_cache
@@ -1,15 +1,331 @@
 # -*- coding: utf-8 -*-
 
 
-import json
-from typing import Optional, cast
+import contextlib
+import contextvars
+import email.utils
+import functools
+import os
+import random
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import Future
+from typing import Any, Literal, Optional, cast
 
+import msgspec
 import requests
+from requests.adapters import HTTPAdapter
 
+from .hedging import get_hedging_policy
+from .judge_cache import get_judge_cache, make_judge_cache_key
+from .llm_batch import get_completions_url, get_judge_batcher, pack_judge_prompts, unpack_judge_responses
 from .logging import get_logger
+from .metrics import count_event, timed_stage
+from .rate_limit import AdaptiveConcurrencyLimiter, TokenBucket
+from .replica_pool import get_replica_pool
 
 _logger = get_logger(__name__)
 
+_defer_llm_calls: contextvars.ContextVar[bool] = contextvars.ContextVar("defer_llm_calls", default=False)
+# * the failed requests of `post_query_llm`, see `record_llm_failures`
+_llm_failures: contextvars.ContextVar[Optional[list["LLMRequestError"]]] = contextvars.ContextVar(
+    "llm_failures", default=None
+)
+
+# * the status codes of the responses which are worth retrying: rate limited, or a transient server error
+_RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+# * tokens of the JSON syntax around each reply of a packed batch, added to `max_tokens`
+_PACKED_TOKENS_PER_REPLY = 16
+
+
+class LLMCallDeferred(BaseException):
+    """
+    Raised by `post_query_llm` inside `defer_llm_calls`.
+
+    It derives from `BaseException`, so that the `except Exception` clauses in the verifiers do not swallow it.
+    """
+
+
+class LLMRequestError(Exception):
+    """
+    A request of `post_query_llm` which fails after its retries or gets a malformed response, see
+    `record_llm_failures`.
+    """
+
+
+class LLMThrottledError(LLMRequestError):
+    """
+    Raised by `post_query_llm` when the endpoint still throttles the request after `max_throttled_retries` retries.
+
+    Unlike the other failed requests, which return an empty response, it tells an overloaded judge apart from a
+    wrong answer, so that its verdict is neither cached nor taken as a judgment.
+    """
+
+
+@contextlib.contextmanager
+def defer_llm_calls() -> Iterator[None]:
+    """
+    Make `post_query_llm` raise `LLMCallDeferred` instead of sending a request in the current context.
+
+    This lets a caller run the rule-based part of a judge on CPU workers and hand the items which need the
+    LLM judge over to I/O workers.
+    """
+    token = _defer_llm_calls.set(True)
+    try:
+        yield
+    finally:
+        _defer_llm_calls.reset(token)
+
+
+@contextlib.contextmanager
+def record_llm_failures() -> Iterator[list[LLMRequestError]]:
+    """
+    Collect the failed requests of `post_query_llm` in the current context and the copies made of it.
+
+    A failed request returns an empty response, which the verifiers take as a wrong answer. This lets a caller tell
+    such a verdict apart, e.g. not to cache it, since the request may succeed next time.
+    """
+    failures: list[LLMRequestError] = []
+    token = _llm_failures.set(failures)
+    try:
+        yield failures
+    finally:
+        _llm_failures.reset(token)
+
+
+class LLMClientOptions(msgspec.Struct, frozen=True):
+    # connections kept alive to each endpoint, more concurrent requests open short-lived connections
+    pool_size: int = 128
+    # retries of a request which fails to connect, times out or gets a 5xx response
+    max_retries: int = 3
+    # retries of a request which gets a 429 response, counted apart since the request is expected to succeed later
+    max_throttled_retries: int = 10
+    # the n-th retry waits a random time between 0 and min(backoff_max, backoff_base * 2**n) seconds
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    # the `Retry-After` header of a 429 or 503 response holds all the requests to the endpoint, up to this number
+    # of seconds
+    max_retry_after: float = 60.0
+    connect_timeout: float = 10.0
+    read_timeout: float = 120.0
+    # requests per second sent to each endpoint, in bursts of at most `rate_limit_burst`, 0 disables the limit
+    rate_limit: float = 0.0
+    rate_limit_burst: int = 1
+    # requests in flight to each endpoint, the limit is halved when the endpoint is overloaded and grows back by 1
+    # per round of successful requests
+    max_concurrency: int = 128
+    min_concurrency: int = 1
+    # a request slower than this number of seconds is taken as an overload, 0 only takes the throttled and failed
+    # requests as overloads
+    latency_threshold: float = 0.0
+
+
+class LLMClient(object):
+    """
+    A client of a chat completion endpoint, which keeps its connections alive and retries the failed requests.
+
+    The requests are throttled by a token bucket and an AIMD concurrency limit, which adapts to the 429 and 5xx
+    responses, the timeouts and the latency of the endpoint.
+
+    Clients are shared by all verifiers through `get_llm_client`, one for each endpoint and API key.
+    """
+
+    def __init__(self, url: str, api_key: str, options: Optional[LLMClientOptions] = None) -> None:
+        self.url = url
+        self.options = options or LLMClientOptions()
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.options.pool_size)
+        self._session = requests.Session()
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update({"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"})
+        self._encoder = msgspec.json.Encoder()
+
+        self._token_bucket: Optional[TokenBucket] = None
+        if self.options.rate_limit > 0:
+            self._token_bucket = TokenBucket(self.options.rate_limit, self.options.rate_limit_burst)
+        self.concurrency_limiter = AdaptiveConcurrencyLimiter(
+            self.options.max_concurrency,
+            min_limit=self.options.min_concurrency,
+            latency_threshold=self.options.latency_threshold,
+        )
+
+    def post(self, payload: Any, read_timeout: Optional[float] = None) -> Any:
+        """
+        Post the JSON payload, retrying on connection errors, timeouts and 429 or 5xx responses.
+
+        Returns:
+            The decoded JSON response.
+
+        Raises:
+            requests.exceptions.RequestException: If the last attempt fails.
+        """
+        data = self._encoder.encode(payload)
+        timeout = (self.options.connect_timeout, read_timeout or self.options.read_timeout)
+        num_failures = 0
+        num_throttled = 0
+        while True:
+            self.concurrency_limiter.acquire()
+            if self._token_bucket is not None:
+                self._token_bucket.acquire()
+
+            started_at = time.perf_counter()
+            response: Optional[requests.Response] = None
+            try:
+                response = self._session.post(self.url, data=data, timeout=timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if num_failures >= self.options.max_retries:
+                    raise
+                _logger.debug("> Retrying the request to %s after %s", self.url, repr(e))
+            finally:
+                overloaded = response is None or response.status_code in _RETRY_STATUS_CODES
+                self.concurrency_limiter.release(time.perf_counter() - started_at, overloaded)
+
+            throttled = response is not None and response.status_code == 429
+            if response is not None:
+                if throttled:
+                    can_retry = num_throttled < self.options.max_throttled_retries
+                else:
+                    can_retry = response.status_code in _RETRY_STATUS_CODES and num_failures < self.options.max_retries
+                if not can_retry:
+                    response.raise_for_status()
+                    return response.json()
+
+                retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after is not None:
+                    self.concurrency_limiter.pause(min(retry_after, self.options.max_retry_after))
+                _logger.debug("> Retrying the request to %s after status %d", self.url, response.status_code)
+
+            count_event("llm_retries")
+            if throttled:
+                count_event("llm_throttled")
+            time.sleep(self._get_backoff(num_failures + num_throttled))
+            if throttled:
+                num_throttled += 1
+            else:
+                num_failures += 1
+
+    def close(self) -> None:
+        self._session.close()
+
+    def _get_backoff(self, attempt: int) -> float:
+        # * "full jitter", which spreads the retries of the concurrent requests rejected at the same time
+        return random.uniform(0, min(self.options.backoff_max, self.options.backoff_base * 2**attempt))  # noqa: S311
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse the `Retry-After` header, either a number of seconds or an HTTP date.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+_llm_client_options = LLMClientOptions()
+# * the options set by `install_llm_client_options`, None if the clients have no owner
+_installed_llm_client_options: Optional[LLMClientOptions] = None
+_llm_clients: dict[tuple[str, str], LLMClient] = {}
+_llm_clients_lock = threading.Lock()
+# * the requests being sent by `post_query_llm`, keyed by the URL, the API key, the timeout and `make_judge_cache_key`
+_inflight_requests: dict[tuple[str, str, Optional[float], bytes], "Future[str]"] = {}
+_inflight_requests_lock = threading.Lock()
+
+
+def configure_llm_clients(options: LLMClientOptions) -> None:
+    """
+    Set the options of the clients returned by `get_llm_client`, the clients created before are closed.
+    """
+    with _llm_clients_lock:
+        clients = _replace_llm_client_options(options)
+    for client in clients:
+        client.close()
+
+
+def install_llm_client_options(options: LLMClientOptions) -> bool:
+    """
+    Set the options of the clients returned by `get_llm_client` unless other options are set, and return whether
+    these options are used. Equal options share the clients set before, which are never closed while in use.
+    """
+    global _installed_llm_client_options
+
+    with _llm_clients_lock:
+        if _installed_llm_client_options is not None:
+            return options == _installed_llm_client_options
+        _installed_llm_client_options = options
+        clients = _replace_llm_client_options(options)
+    for client in clients:
+        client.close()
+    return True
+
+
+def uninstall_llm_client_options(options: LLMClientOptions) -> None:
+    """
+    Let other options be set by `install_llm_client_options` if these ones are set, the clients are kept until then.
+    """
+    global _installed_llm_client_options
+
+    with _llm_clients_lock:
+        if _installed_llm_client_options is options:
+            _installed_llm_client_options = None
+
+
+def _replace_llm_client_options(options: LLMClientOptions) -> list[LLMClient]:
+    # * the caller holds `_llm_clients_lock`, and closes the returned clients created with other options
+    global _llm_client_options
+
+    if options == _llm_client_options:
+        return []
+    _llm_client_options = options
+    clients = list(_llm_clients.values())
+    _llm_clients.clear()
+    return clients
+
+
+def get_llm_client(url: str, api_key: str) -> LLMClient:
+    """
+    Get the client shared by all requests to the endpoint with the API key.
+    """
+    key = (url, api_key)
+    client = _llm_clients.get(key)
+    if client is not None:
+        return client
+    with _llm_clients_lock:
+        client = _llm_clients.get(key)
+        if client is None:
+            client = _llm_clients[key] = LLMClient(url, api_key, _llm_client_options)
+        return client
+
+
+def _reset_llm_clients_after_fork() -> None:
+    # * the connections of the parent process must not be shared with a forked child,
+    # * nor its in-flight requests, whose responses are never delivered to the child
+    global _llm_clients_lock, _inflight_requests_lock
+
+    _llm_clients.clear()
+    _llm_clients_lock = threading.Lock()
+    _inflight_requests.clear()
+    _inflight_requests_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_llm_clients_after_fork)
+
+
+def is_llm_call_deferred() -> bool:
+    """
+    Whether `post_query_llm` raises `LLMCallDeferred` in the current context, see `defer_llm_calls`.
+    """
+    return _defer_llm_calls.get()
+
 
 def post_query_llm(
     prompt: str,
@@ -20,7 +336,7 @@ def post_query_llm(
     max_tokens: Optional[int] = 10,
     temperature: Optional[float] = 0.1,
     top_p: Optional[float] = 1.0,
-    timeout: Optional[int] = 120,
+    timeout: Optional[float] = None,
 ) -> str:
     """
     Sends a query to Zhipu AI API endpoint.
@@ -35,16 +351,126 @@ def post_query_llm(
         temperature: The sampling temperature used for the generation.
         top_p: The parameter for nucleus sampling, where the model considers the
           results of the tokens with top_p probability mass.
-        timeout: The timeout value for the LLM request.
+        timeout: The read timeout of the LLM request, defaults to the read timeout of the client.
+
+    Concurrent calls with the same prompt, model and sampling parameters to the same URL share a single request.
+    If the URL has a replica pool, see `configure_replica_pools`, the request is sent to one of its replicas, and
+    it is duplicated if it is slow and the hedging is configured, see `configure_hedging`. With the batching
+    configured, see `configure_judge_batcher`, concurrent calls to the same endpoint are sent in batches.
 
     Returns:
-        The response content from the API.
+        The response content from the API, or the cached response if the judge cache is configured, see
+        `configure_judge_cache`. An empty response if the request fails, see `record_llm_failures`.
+
+    Raises:
+        LLMCallDeferred: If called inside `defer_llm_calls` and the response is not cached.
+        LLMThrottledError: If the endpoint throttles the request beyond the retries of its client, see
+            `LLMClientOptions.max_throttled_retries`.
 
     """
     del image_file  # Not currently supported
 
-    # Get API key from environment
+    # * the cache is looked up before deferring, a cached response does not need to be handed over to the I/O workers,
+    # * and the misses are counted once the request is sent
+    deferred = is_llm_call_deferred()
+    judge_cache = get_judge_cache()
+    cache_key = b""
+    if judge_cache is not None:
+        cache_key = make_judge_cache_key(prompt, model, max_tokens, temperature, top_p)
+        cached_content = judge_cache.get(cache_key, count_miss=not deferred)
+        if cached_content is not None:
+            count_event("llm_cache_hits")
+            return cached_content
+        if not deferred:
+            count_event("llm_cache_misses")
+
+    if deferred:
+        raise LLMCallDeferred
+
+    # * concurrent identical requests to the same endpoint, e.g. from rollouts with the same answer, share the request
+    # * of the first caller, the others wait for its response; the API key and the timeout are part of the request,
+    # * a caller never gets a response sent with the key of another, nor waits past its own timeout
+    request_key = cache_key or make_judge_cache_key(prompt, model, max_tokens, temperature, top_p)
+    flight_key = (url, api_key, timeout, request_key)
+    with _inflight_requests_lock:
+        inflight_request = _inflight_requests.get(flight_key)
+        is_leader = inflight_request is None
+        if inflight_request is None:
+            inflight_request = _inflight_requests[flight_key] = Future()
+    if not is_leader:
+        count_event("llm_coalesced_requests")
+        # * timed as a request, the caller has used the LLM judge all the same
+        with timed_stage("llm_request"):
+            try:
+                return inflight_request.result()
+            except LLMThrottledError as e:
+                _record_llm_failure(e)
+                raise
+            except LLMRequestError as e:
+                return _record_llm_failure(e)
+
+    content = ""
+    error: Optional[BaseException] = None
+    try:
+        # * with the batching configured, the prompt is sent along with the concurrent prompts to the same endpoint,
+        # * and by itself if the batch fails to answer it
+        batched_content: Optional[str] = None
+        judge_batcher = get_judge_batcher()
+        if judge_batcher is not None:
+            batch_key = (url, api_key, model, max_tokens, temperature, top_p, timeout)
+            send_batch = functools.partial(
+                _send_batch, url, api_key, model, max_tokens, temperature, top_p, timeout, judge_batcher.options.mode
+            )
+            with timed_stage("llm_request"):
+                batched_content = judge_batcher.submit(batch_key, prompt, send_batch)
+        if batched_content is not None:
+            content = batched_content
+        else:
+            content = _send_query(prompt, api_key, url, model, max_tokens, temperature, top_p, timeout)
+        # * the failed requests return an empty response, which is not cached
+        if judge_cache is not None and len(content) > 0:
+            judge_cache.put(cache_key, content)
+    except LLMThrottledError as e:
+        # * recorded as well, for the callers which catch it, e.g. the ensembles
+        error = e
+        _record_llm_failure(e)
+        raise
+    except LLMRequestError as e:
+        error = e
+        count_event("llm_request_failures")
+        _logger.warning("%s", e)
+        content = _record_llm_failure(e)
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        with _inflight_requests_lock:
+            del _inflight_requests[flight_key]
+        # * the coalesced callers fail along with the shared request
+        if error is None:
+            inflight_request.set_result(content)
+        else:
+            inflight_request.set_exception(error)
+    return content
+
+
+def _record_llm_failure(error: LLMRequestError) -> str:
+    failures = _llm_failures.get()
+    if failures is not None:
+        failures.append(error)
+    return ""
+
 
+def _send_query(
+    prompt: str,
+    api_key: str,
+    url: str,
+    model: str,
+    max_tokens: Optional[int],
+    temperature: Optional[float],
+    top_p: Optional[float],
+    timeout: Optional[float],
+) -> str:
     messages: list[dict[str, object]] = [{"role": "user", "content": prompt}]
 
     payload = {
@@ -56,28 +482,148 @@ def post_query_llm(
         "stream": False,
     }
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}",
-    }
-
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload), timeout=timeout)
-        response.raise_for_status()
-        response_data = response.json()
+        with timed_stage("llm_request"):
+            response_data = _post_payload(url, api_key, payload, timeout)
     except requests.exceptions.RequestException as e:
-        _logger.warning("HTTP request error in `post_query_llm`: %s", e)
-        return ""
+        if e.response is not None and e.response.status_code == 429:
+            count_event("llm_throttled_failures")
+            err_msg = f"The LLM judge {url} still throttles the request after the retries."
+            raise LLMThrottledError(err_msg) from e
+        err_msg = f"HTTP request error in `post_query_llm`: {e}"
+        raise LLMRequestError(err_msg) from e
     except KeyError as e:
-        _logger.warning("Response parsing error in `post_query_llm`: %s", e)
-        return ""
+        err_msg = f"Response parsing error in `post_query_llm`: {e}"
+        raise LLMRequestError(err_msg) from e
     except Exception as e:
-        _logger.warning("Unexpected error in `post_query_llm` due to exception: %s", repr(e))
-        return ""
+        err_msg = f"Unexpected error in `post_query_llm` due to exception: {e!r}"
+        raise LLMRequestError(err_msg) from e
     else:
         # Extract content from Zhipu AI response format
         if "choices" in response_data and len(response_data["choices"]) > 0:
             content = response_data["choices"][0]["message"]["content"]
             return cast(str, content)
-        _logger.error("Unexpected response format from Zhipu AI API: %s", response_data)
-        return ""
+        err_msg = f"Unexpected response format from Zhipu AI API: {response_data}"
+        raise LLMRequestError(err_msg)
+
+
+def _send_batch(
+    url: str,
+    api_key: str,
+    model: str,
+    max_tokens: Optional[int],
+    temperature: Optional[float],
+    top_p: Optional[float],
+    timeout: Optional[float],
+    mode: Literal["packed", "multi_prompt"],
+    prompts: list[str],
+) -> list[Optional[str]]:
+    """
+    Send the prompts of a batch in one request, see `JudgeBatcher`.
+
+    Returns:
+        The response to each prompt, None for the prompts the batch failed to answer.
+    """
+    count_event("llm_batches")
+    responses: list[Optional[str]] = [None] * len(prompts)
+    if mode == "packed":
+        payload: dict[str, Any] = {
+            "model": model,
+            "messages": [{"role": "user", "content": pack_judge_prompts(prompts)}],
+            # * room for the JSON array around the replies
+            "max_tokens": None if max_tokens is None else len(prompts) * (max_tokens + _PACKED_TOKENS_PER_REPLY),
+            "temperature": temperature,
+            "top_p": top_p,
+            "stream": False,
+        }
+        response_data = _post_payload(url, api_key, payload, timeout, hedge=False)
+        content = response_data["choices"][0]["message"]["content"]
+        unpacked_responses = unpack_judge_responses(content, len(prompts))
+        if unpacked_responses is None:
+            count_event("llm_batch_parse_failures")
+            _logger.warning("> Failed to parse the replies of a batch of %d LLM judge prompts", len(prompts))
+            return responses
+        return unpacked_responses
+
+    payload = {
+        "model": model,
+        "prompt": prompts,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "top_p": top_p,
+        "stream": False,
+    }
+    response_data = _post_payload(url, api_key, payload, timeout, to_completions=True, hedge=False)
+    for choice in response_data.get("choices", []):
+        index = choice.get("index")
+        text = choice.get("text")
+        if isinstance(index, int) and 0 <= index < len(prompts) and isinstance(text, str) and len(text) > 0:
+            responses[index] = text
+    return responses
+
+
+def _post_payload(
+    url: str,
+    api_key: str,
+    payload: Any,
+    read_timeout: Optional[float],
+    to_completions: bool = False,
+    hedge: bool = True,
+) -> Any:
+    """
+    Post the payload to the URL, or to one of its replicas, see `_post_to_replicas`.
+
+    Args:
+        to_completions: Post to the `/completions` endpoint next to the `/chat/completions` endpoint of the URL.
+        hedge: Duplicate the request if it is slow, see `configure_hedging`. The batches are never hedged, their
+            latency is unlike the latency of the single requests.
+    """
+    # * the replicas tried by the request, shared with its hedged duplicate, which is sent to another replica
+    tried_urls: set[str] = set()
+    attempt = functools.partial(_post_to_replicas, url, api_key, payload, read_timeout, to_completions, tried_urls)
+    hedging_policy = get_hedging_policy(url) if hedge else None
+    if hedging_policy is None:
+        return attempt()
+    return hedging_policy.run(attempt)
+
+
+def _post_to_replicas(
+    url: str,
+    api_key: str,
+    payload: Any,
+    read_timeout: Optional[float],
+    to_completions: bool,
+    tried_urls: set[str],
+) -> Any:
+    replica_pool = get_replica_pool(url)
+    if replica_pool is None:
+        if to_completions:
+            url = get_completions_url(url)
+        return get_llm_client(url, api_key).post(payload, read_timeout=read_timeout)
+
+    # * a request which fails on a replica is sent to another one, until it has failed on as many replicas as the pool
+    num_failures = 0
+    while True:
+        replica_url = replica_pool.acquire(exclude=tried_urls)
+        tried_urls.add(replica_url)
+        started_at = time.perf_counter()
+        succeeded = False
+        try:
+            target_url = get_completions_url(replica_url) if to_completions else replica_url
+            response_data = get_llm_client(target_url, api_key).post(payload, read_timeout=read_timeout)
+        except requests.exceptions.RequestException as e:
+            # * a client error, e.g. a bad API key, is not the fault of the replica
+            response = e.response
+            if response is not None and 400 <= response.status_code < 500 and response.status_code != 429:
+                succeeded = True
+                raise
+            num_failures += 1
+            if num_failures >= len(replica_pool.urls):
+                raise
+            _logger.debug("> Sending the request to another replica after %s failed: %s", replica_url, repr(e))
+            count_event("llm_replica_failovers")
+        else:
+            succeeded = True
+            return response_data
+        finally:
+            replica_pool.release(replica_url, time.perf_counter() - started_at, succeeded)
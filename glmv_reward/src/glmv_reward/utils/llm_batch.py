@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+
+import re
+import threading
+from collections.abc import Callable, Hashable
+from typing import Literal, Optional, Union
+
+import msgspec
+
+from .logging import get_logger
+
+_logger = get_logger(__name__)
+
+_PACKED_PROMPT_HEADER = (
+    "You are given {num_tasks} independent tasks. Complete each task on its own, exactly as instructed in it, "
+    "without letting the other tasks influence it.\n"
+    "Reply with only a JSON array of {num_tasks} strings, where the i-th string is your complete reply to task i, "
+    "with its backslashes escaped."
+)
+# * a backslash starting a LaTeX command, e.g. "\boxed", which the judges often leave unescaped in JSON strings
+_LATEX_COMMAND_PATTERN = re.compile(r"(?<!\\)\\(?=[a-zA-Z]{2,})")
+
+
+class BatchingOptions(msgspec.Struct, frozen=True):
+    # "packed" packs the prompts into one chat completion and parses the replies out of a JSON array,
+    # "multi_prompt" sends them as the prompt list of one `/completions` request, e.g. to vLLM
+    mode: Literal["packed", "multi_prompt"] = "packed"
+    # maximum number of prompts sent in one request
+    batch_size: int = 16
+    # seconds the first prompt of a batch waits for the others before the batch is sent
+    flush_latency: float = 0.05
+
+
+class _Batch(object):
+    def __init__(self) -> None:
+        self.prompts: list[str] = []
+        self.responses: list[Optional[str]] = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class JudgeBatcher(object):
+    """
+    Gather the concurrent LLM judge requests with the same batch key into batches.
+
+    The first caller of a batch waits up to `flush_latency` seconds for `batch_size` prompts, then sends the batch
+    with `send_batch` on behalf of all the callers, while the others wait for their response.
+    """
+
+    def __init__(self, options: Optional[BatchingOptions] = None) -> None:
+        self.options = options or BatchingOptions()
+        if self.options.batch_size <= 0:
+            err_msg = f"`batch_size` should be greater than 0, but got {self.options.batch_size}."
+            raise ValueError(err_msg)
+
+        self._pending: dict[Hashable, _Batch] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        batch_key: Hashable,
+        prompt: str,
+        send_batch: Callable[[list[str]], list[Optional[str]]],
+    ) -> Optional[str]:
+        """
+        Add the prompt to the batch of `batch_key` and wait for its response.
+
+        Args:
+            batch_key: The prompts with the same key can be sent together, e.g. the same endpoint and model.
+            prompt: The prompt of the request.
+            send_batch: Sends the prompts of a batch of at least 2 and returns their responses, in order.
+
+        Returns:
+            The response, or None if the batch failed to answer it, e.g. the batch had a single prompt or its reply
+            could not be parsed, in which case the caller should send the prompt by itself.
+        """
+        with self._lock:
+            batch = self._pending.get(batch_key)
+            is_leader = batch is None
+            if batch is None:
+                batch = self._pending[batch_key] = _Batch()
+            index = len(batch.prompts)
+            batch.prompts.append(prompt)
+            if len(batch.prompts) >= self.options.batch_size:
+                del self._pending[batch_key]
+                batch.full.set()
+
+        if not is_leader:
+            batch.done.wait()
+            return batch.responses[index]
+
+        batch.full.wait(self.options.flush_latency)
+        with self._lock:
+            if self._pending.get(batch_key) is batch:
+                del self._pending[batch_key]
+
+        responses: list[Optional[str]] = [None] * len(batch.prompts)
+        try:
+            if len(batch.prompts) > 1:
+                responses = send_batch(batch.prompts)
+        except Exception as e:
+            _logger.warning("> Failed to send a batch of %d LLM judge prompts: %s", len(batch.prompts), repr(e))
+        finally:
+            # * the other callers must never be left waiting
+            if len(responses) != len(batch.prompts):
+                responses = [None] * len(batch.prompts)
+            batch.responses = responses
+            batch.done.set()
+        return responses[index]
+
+
+def pack_judge_prompts(prompts: list[str]) -> str:
+    """
+    Pack the prompts into one prompt, whose reply is parsed by `unpack_judge_responses`.
+    """
+    sections = [_PACKED_PROMPT_HEADER.format(num_tasks=len(prompts))]
+    for index, prompt in enumerate(prompts, start=1):
+        sections.append(f"### Task {index}\n{prompt}")
+    return "\n\n".join(sections)
+
+
+def unpack_judge_responses(content: str, num_prompts: int) -> Optional[list[Optional[str]]]:
+    """
+    Parse the replies of a packed prompt out of its JSON array, ignoring any text or code fence around it.
+
+    Returns:
+        The reply to each prompt, None for an empty one, or None if the array is missing or has another length.
+    """
+    start = content.find("[")
+    end = content.rfind("]")
+    if start < 0 or end < start:
+        return None
+
+    array = _LATEX_COMMAND_PATTERN.sub(r"\\\\", content[start : end + 1])
+    try:
+        replies = msgspec.json.decode(array, type=list[Union[str, float, None]])
+    except msgspec.DecodeError:
+        return None
+    if len(replies) != num_prompts:
+        return None
+    return [str(reply) if reply is not None and str(reply) != "" else None for reply in replies]
+
+
+def get_completions_url(chat_completions_url: str) -> str:
+    """
+    Get the URL of the `/completions` endpoint next to a `/chat/completions` endpoint.
+    """
+    return re.sub(r"/chat/completions/?$", "/completions", chat_completions_url)
+
+
+_judge_batcher: Optional[JudgeBatcher] = None
+_judge_batcher_lock = threading.Lock()
+
+
+def configure_judge_batcher(batcher: Optional[JudgeBatcher]) -> None:
+    """
+    Batch the requests of `post_query_llm` with this batcher, None disables the batching.
+    """
+    global _judge_batcher
+
+    with _judge_batcher_lock:
+        _judge_batcher = batcher
+
+
+def install_judge_batcher(batcher: JudgeBatcher) -> bool:
+    """
+    Batch the requests of `post_query_llm` with this batcher unless another one is set, and return whether it is set.
+    """
+    global _judge_batcher
+
+    with _judge_batcher_lock:
+        if _judge_batcher is not None and _judge_batcher is not batcher:
+            return False
+        _judge_batcher = batcher
+        return True
+
+
+def uninstall_judge_batcher(batcher: JudgeBatcher) -> None:
+    """
+    Disable the batching of the requests of `post_query_llm` if it uses this batcher.
+    """
+    global _judge_batcher
+
+    with _judge_batcher_lock:
+        if _judge_batcher is batcher:
+            _judge_batcher = None
+
+
+def get_judge_batcher() -> Optional[JudgeBatcher]:
+    return _judge_batcher
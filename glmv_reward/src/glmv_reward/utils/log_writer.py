@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+
+
+import atexit
+import gzip
+import importlib
+import os
+import queue
+import threading
+import time
+from collections.abc import Sequence
+from pathlib import Path
+from typing import IO, Any, Literal, Union
+
+import msgspec
+
+from .logging import get_logger
+
+_logger = get_logger(__name__)
+
+_COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+# * at most this number of records is taken from the queue and written at once
+_MAX_BATCH_SIZE = 4096
+# * seconds between the checks that the background thread is alive while waiting for it
+_THREAD_CHECK_INTERVAL = 1.0
+
+
+class _Control(object):
+    def __init__(self, close: bool = False) -> None:
+        self.close = close
+        self.done = threading.Event()
+
+
+class _LogFile(object):
+    def __init__(self, stream: Union[IO[bytes], gzip.GzipFile], num_bytes: int) -> None:
+        self.stream = stream
+        self.num_bytes = num_bytes
+
+
+class JsonlLogWriter(object):
+    """
+    Append records to JSONL files in a background thread.
+
+    Records are encoded with msgspec and appended in batches to files which are kept open between batches.
+    A file is rotated once it exceeds `max_bytes`, the size of a compressed file is approximated by the size of its
+    data before compression. When the queue is full, `write` either waits for the writer ("block") or drops the
+    record ("drop").
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = 65_536,
+        overflow: Literal["block", "drop"] = "block",
+        max_bytes: int = 0,
+        compression: Literal["none", "gzip", "zstd"] = "none",
+        flush_interval: float = 1.0,
+    ) -> None:
+        if compression not in _COMPRESSION_SUFFIXES:
+            err_msg = f"Unsupported compression: {compression}."
+            raise ValueError(err_msg)
+
+        self._zstd: Any = None
+        if compression == "zstd":
+            try:
+                self._zstd = importlib.import_module("zstandard")
+            except ImportError as e:
+                err_msg = "The `zstandard` package is required to compress the logs with zstd."
+                raise ImportError(err_msg) from e
+
+        self.overflow = overflow
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.flush_interval = flush_interval
+
+        self._queue: queue.Queue[Union[tuple[tuple[Path, ...], Any], _Control]] = queue.Queue(max_queue_size)
+        self._encoder = msgspec.json.Encoder()
+        self._files: dict[Path, _LogFile] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._num_dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name="glmv_reward_log_writer", daemon=True)
+        self._thread.start()
+        # * the thread is a daemon, the queued records are written when the interpreter exits
+        atexit.register(self.close)
+
+    @property
+    def num_dropped(self) -> int:
+        return self._num_dropped
+
+    def write(self, paths: Sequence[Path], record: Any) -> bool:
+        """
+        Queue a record to be appended to each of the files in `paths`.
+        The compression suffix is appended to the file names.
+
+        Returns:
+            False if the record is dropped because the queue is full, True otherwise.
+        """
+        if self._closed:
+            err_msg = "The log writer has been closed."
+            raise RuntimeError(err_msg)
+
+        item = (tuple(paths), record)
+        if self.overflow == "block":
+            self._put(item)
+            return True
+
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self._num_dropped += 1
+                num_dropped = self._num_dropped
+            if num_dropped == 1:
+                _logger.warning("> The reward log queue is full, records will be dropped until it drains")
+            return False
+        return True
+
+    def flush(self) -> None:
+        """
+        Wait until the queued records are written and flushed to the files.
+        """
+        if self._closed:
+            return
+        control = _Control()
+        try:
+            self._put(control)
+        except RuntimeError:
+            return
+        while not control.done.wait(_THREAD_CHECK_INTERVAL):
+            if not self._thread.is_alive():
+                return
+
+    def close(self) -> None:
+        """
+        Write the queued records, close the files and stop the background thread.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        atexit.unregister(self.close)
+
+        control = _Control(close=True)
+        try:
+            self._put(control)
+        except RuntimeError:
+            return
+        self._thread.join()
+
+    def _put(self, item: Union[tuple[tuple[Path, ...], Any], _Control]) -> None:
+        # * a full queue is never drained if the background thread has stopped
+        while True:
+            try:
+                self._queue.put(item, timeout=_THREAD_CHECK_INTERVAL)
+            except queue.Full:
+                if not self._thread.is_alive():
+                    err_msg = "The background thread of the log writer has stopped."
+                    raise RuntimeError(err_msg) from None
+            else:
+                return
+
+    def _run(self) -> None:
+        try:
+            self._write_until_closed()
+        except Exception:
+            _logger.exception("> The reward log writer stopped, the queued records are dropped")
+            with self._lock:
+                self._closed = True
+        finally:
+            # * nobody waits forever for the items queued after the writer stopped, e.g. a `flush` racing `close`
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, _Control):
+                    item.done.set()
+
+    def _write_until_closed(self) -> None:
+        last_flushed_at = time.monotonic()
+        while True:
+            try:
+                items = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                self._flush_files()
+                last_flushed_at = time.monotonic()
+                continue
+
+            while len(items) < _MAX_BATCH_SIZE:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if self._write_items(items):
+                return
+            if time.monotonic() - last_flushed_at >= self.flush_interval:
+                self._flush_files()
+                last_flushed_at = time.monotonic()
+
+    def _write_items(self, items: list[Union[tuple[tuple[Path, ...], Any], _Control]]) -> bool:
+        """
+        Write a batch of items in order.
+
+        Returns:
+            True if the writer is closed by one of the items.
+        """
+        chunks: dict[Path, list[bytes]] = {}
+        for item in items:
+            if isinstance(item, _Control):
+                self._write_chunks(chunks)
+                chunks = {}
+                self._flush_files()
+                if item.close:
+                    self._close_files()
+                item.done.set()
+                if item.close:
+                    return True
+                continue
+
+            paths, record = item
+            try:
+                line = self._encoder.encode(record) + b"\n"
+            except Exception as e:
+                _logger.warning("> Failed to encode the reward log record: %s", repr(e))
+                continue
+            for path in paths:
+                chunks.setdefault(path, []).append(line)
+
+        self._write_chunks(chunks)
+        return False
+
+    def _write_chunks(self, chunks: dict[Path, list[bytes]]) -> None:
+        for path, lines in chunks.items():
+            data = b"".join(lines)
+            try:
+                log_file = self._open(path)
+                log_file.stream.write(data)
+                log_file.num_bytes += len(data)
+                if self.max_bytes > 0 and log_file.num_bytes >= self.max_bytes:
+                    self._rotate(path)
+            except Exception as e:
+                _logger.warning("> Failed to write the reward log %s: %s", path, repr(e))
+                # * the file is opened again by the next write, e.g. after its stream is broken
+                broken_file = self._files.pop(path, None)
+                if broken_file is not None:
+                    self._close_stream(path, broken_file)
+
+    def _get_file_path(self, path: Path) -> Path:
+        return path.with_name(path.name + _COMPRESSION_SUFFIXES[self.compression])
+
+    def _open(self, path: Path) -> _LogFile:
+        log_file = self._files.get(path)
+        if log_file is not None:
+            return log_file
+
+        file_path = self._get_file_path(path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        num_bytes = file_path.stat().st_size if file_path.exists() else 0
+
+        stream: Union[IO[bytes], gzip.GzipFile]
+        if self.compression == "gzip":
+            stream = gzip.open(file_path, "ab")
+        elif self.compression == "zstd":
+            stream = self._zstd.ZstdCompressor().stream_writer(open(file_path, "ab"))
+        else:
+            stream = open(file_path, "ab")
+
+        log_file = _LogFile(stream, num_bytes)
+        self._files[path] = log_file
+        return log_file
+
+    def _rotate(self, path: Path) -> None:
+        # * `rollout.jsonl.gz` is renamed to the first free name of `rollout.1.jsonl.gz`, `rollout.2.jsonl.gz`, ...
+        self._close_stream(path, self._files.pop(path))
+        file_path = self._get_file_path(path)
+        base_name, _, extension = file_path.name.partition(".")
+        index = 1
+        while True:
+            rotated_path = file_path.with_name(
+                f"{base_name}.{index}.{extension}" if extension else f"{base_name}.{index}"
+            )
+            if not rotated_path.exists():
+                break
+            index += 1
+        os.replace(file_path, rotated_path)
+
+    def _flush_files(self) -> None:
+        for path, log_file in self._files.items():
+            try:
+                log_file.stream.flush()
+            except Exception as e:
+                _logger.warning("> Failed to flush the reward log %s: %s", path, repr(e))
+
+    def _close_files(self) -> None:
+        files, self._files = self._files, {}
+        for path, log_file in files.items():
+            self._close_stream(path, log_file)
+
+    @staticmethod
+    def _close_stream(path: Path, log_file: _LogFile) -> None:
+        try:
+            log_file.stream.close()
+        except Exception as e:
+            _logger.warning("> Failed to close the reward log %s: %s", path, repr(e))
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+
+import contextlib
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Optional, Union
+
+import msgspec
+
+from .logging import get_logger
+
+_logger = get_logger(__name__)
+
+# * the upper bounds of the histogram buckets grow from 1us by a factor of 2, the last bucket is unbounded
+_MIN_BUCKET_SECONDS = 1e-6
+_NUM_BUCKETS = 32
+_PERCENTILES = (50, 90, 99)
+
+
+class HistogramState(msgspec.Struct, array_like=True):
+    count: int = 0
+    total: float = 0.0
+    min: float = math.inf
+    max: float = 0.0
+    buckets: list[int] = msgspec.field(default_factory=lambda: [0] * _NUM_BUCKETS)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        index = 0
+        if seconds > _MIN_BUCKET_SECONDS:
+            index = min(math.ceil(math.log2(seconds / _MIN_BUCKET_SECONDS)), _NUM_BUCKETS - 1)
+        self.buckets[index] += 1
+
+    def merge(self, other: "HistogramState") -> None:
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for index, count in enumerate(other.buckets):
+            self.buckets[index] += count
+
+    def percentile(self, percent: float) -> float:
+        """
+        Estimate a percentile by the upper bound of its bucket, capped by the maximum.
+        """
+        rank = self.count * percent / 100
+        cumulative_count = 0
+        for index, count in enumerate(self.buckets):
+            cumulative_count += count
+            if cumulative_count >= rank and count > 0:
+                return min(_MIN_BUCKET_SECONDS * 2**index, self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        summary = {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count > 0 else 0.0,
+            "min": self.min if self.count > 0 else 0.0,
+            "max": self.max,
+        }
+        for percent in _PERCENTILES:
+            summary[f"p{percent}"] = self.percentile(percent)
+        return summary
+
+
+class MetricsState(msgspec.Struct, array_like=True):
+    """The recorded metrics, in a form which can be sent between processes."""
+
+    # (stage, datasource, verifier) and the latencies of the stage
+    histograms: list[tuple[str, str, str, HistogramState]] = msgspec.field(default_factory=list)
+    # (counter, datasource, verifier) and the value of the counter
+    counters: list[tuple[str, str, str, int]] = msgspec.field(default_factory=list)
+
+
+class PipelineMetrics(object):
+    """
+    Latency histograms of the stages of the reward pipeline and event counters,
+    tagged by datasource and verifier class.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, str, str], HistogramState] = {}
+        self._counters: dict[tuple[str, str, str], int] = {}
+        self._dump_thread: Optional[threading.Thread] = None
+        self._dump_stopped = threading.Event()
+
+    def record(self, stage: str, seconds: float, datasource: str, verifier: str) -> None:
+        key = (stage, datasource, verifier)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = HistogramState()
+            histogram.add(seconds)
+
+    def increment(self, counter: str, datasource: str, verifier: str, value: int = 1) -> None:
+        key = (counter, datasource, verifier)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def drain_state(self) -> MetricsState:
+        """
+        Take the recorded metrics out, to be merged into the metrics of another process.
+        """
+        with self._lock:
+            histograms, self._histograms = self._histograms, {}
+            counters, self._counters = self._counters, {}
+        return MetricsState(
+            histograms=[(*key, histogram) for key, histogram in histograms.items()],
+            counters=[(*key, value) for key, value in counters.items()],
+        )
+
+    def merge_state(self, state: MetricsState) -> None:
+        with self._lock:
+            for stage, datasource, verifier, other in state.histograms:
+                key = (stage, datasource, verifier)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = HistogramState()
+                histogram.merge(other)
+            for counter, datasource, verifier, value in state.counters:
+                key = (counter, datasource, verifier)
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Get the metrics recorded so far.
+
+        Returns:
+            A dict of "stages", which maps stage -> datasource -> verifier class -> latency summary in seconds
+            (count, total, mean, min, max, p50, p90, p99), and "counters", which maps
+            counter -> datasource -> verifier class -> value.
+        """
+        with self._lock:
+            histograms = [(key, histogram.summary()) for key, histogram in self._histograms.items()]
+            counters = list(self._counters.items())
+
+        snapshot: dict[str, Any] = {"stages": {}, "counters": {}}
+        for (stage, datasource, verifier), summary in histograms:
+            snapshot["stages"].setdefault(stage, {}).setdefault(datasource, {})[verifier] = summary
+        for (counter, datasource, verifier), value in counters:
+            snapshot["counters"].setdefault(counter, {}).setdefault(datasource, {})[verifier] = value
+        return snapshot
+
+    def dump(self, path: Union[str, Path]) -> None:
+        """
+        Write the snapshot to a JSON file, replacing it atomically.
+        """
+        pobj = Path(path)
+        pobj.parent.mkdir(parents=True, exist_ok=True)
+        tmp_pobj = pobj.with_name(f".{pobj.name}.tmp")
+        with open(tmp_pobj, "w") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_pobj, pobj)
+
+    def start_periodic_dump(self, path: Union[str, Path], interval: float) -> None:
+        if self._dump_thread is not None:
+            return
+
+        def _dump_periodically() -> None:
+            while not self._dump_stopped.wait(interval):
+                self._dump_quietly(path)
+            self._dump_quietly(path)
+
+        self._dump_thread = threading.Thread(target=_dump_periodically, name="glmv_reward_metrics", daemon=True)
+        self._dump_thread.start()
+
+    def stop_periodic_dump(self) -> None:
+        """
+        Stop dumping the snapshot periodically, after dumping it for the last time.
+        """
+        if self._dump_thread is None:
+            return
+        self._dump_stopped.set()
+        self._dump_thread.join()
+        self._dump_thread = None
+
+    def _dump_quietly(self, path: Union[str, Path]) -> None:
+        try:
+            self.dump(path)
+        except OSError as e:
+            _logger.warning("> Failed to dump the metrics to %s: %s", path, repr(e))
+
+
+class MetricsScope(object):
+    """The metrics and the tags of the item being judged in the current context."""
+
+    def __init__(self, metrics: PipelineMetrics, datasource: str, verifier: str) -> None:
+        self.metrics = metrics
+        self.datasource = datasource
+        self.verifier = verifier
+        # * stages entered in the scope, e.g. to tell whether the judge has called the LLM judge
+        self.entered_stages: set[str] = set()
+
+
+class _StageTimer(object):
+    def __init__(self, scope: MetricsScope, stage: str) -> None:
+        self._scope = scope
+        self._stage = stage
+        self._started_at = 0.0
+
+    def __enter__(self) -> None:
+        self._scope.entered_stages.add(self._stage)
+        self._started_at = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        scope = self._scope
+        scope.metrics.record(self._stage, time.perf_counter() - self._started_at, scope.datasource, scope.verifier)
+
+
+_current_scope: contextvars.ContextVar[Optional[MetricsScope]] = contextvars.ContextVar("metrics_scope", default=None)
+# * shared by all disabled stages, `nullcontext` keeps no state
+_NULL_CONTEXT: contextlib.nullcontext[None] = contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def metrics_scope(metrics: PipelineMetrics, datasource: str, verifier: str) -> Iterator[MetricsScope]:
+    """
+    Record the stages and the events in the current context into `metrics`, tagged by datasource and verifier.
+    """
+    scope = MetricsScope(metrics, datasource, verifier)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def timed_stage(stage: str) -> Union[_StageTimer, contextlib.nullcontext[None]]:
+    """
+    Time a stage of the pipeline, it does nothing outside `metrics_scope`.
+    """
+    scope = _current_scope.get()
+    if scope is None:
+        return _NULL_CONTEXT
+    return _StageTimer(scope, stage)
+
+
+def count_event(counter: str, value: int = 1) -> None:
+    """
+    Count an event of the pipeline, it does nothing outside `metrics_scope`.
+    """
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.metrics.increment(counter, scope.datasource, scope.verifier, value)
@@ -8,7 +8,8 @@ T = TypeVar("T")
 
 
 def ensure_list(obj: Union[Sequence[T], T]) -> list[T]:
-    if isinstance(obj, Sequence):
+    # * a string is a single item, not a sequence of characters
+    if isinstance(obj, Sequence) and not isinstance(obj, (str, bytes)):
         return list(obj)
     return [obj]
 
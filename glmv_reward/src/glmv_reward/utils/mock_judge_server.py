@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A local stand-in for the OpenAI-compatible LLM judge endpoint, to load-test and profile the reward system offline.
+
+The verdict of each request is decided by the first rule whose pattern is found in the prompt, or by the default
+verdict. The replies are understood by all the verifiers: the JSON score is parsed by `GeoQuestVerifier`, the boxed
+"Correct" or "Incorrect" by `GeneralVerifier` and the "1.0" or "0.0" by the others. The latency, the server errors
+and the throttled (429) responses can be injected, drawn from a seeded generator so that the runs are reproducible.
+
+Both `/chat/completions` and the `/completions` requests with a list of prompts are answered, and `/health` replies
+200 for the health checks of the replica pools.
+
+Usage:
+    python -m glmv_reward.utils.mock_judge_server --port 8000 --latency 0.05 --throttle-rate 0.01 \
+        --rule "Prediction: wrong=incorrect"
+
+`configs/offline_config.yaml` points all the verifiers at `http://127.0.0.1:8000/v1/chat/completions`.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections.abc import Sequence
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import TracebackType
+from typing import Any, Optional
+
+import msgspec
+
+CORRECT_REPLY = '{"score": 1.0}\n\\boxed{Correct}'
+INCORRECT_REPLY = '{"score": 0.0}\n\\boxed{Incorrect}'
+
+
+class JudgeRule(msgspec.Struct, frozen=True):
+    # regular expression searched in the prompt of a request
+    pattern: str
+    # verdict of the requests whose prompt matches the pattern
+    correct: bool
+
+
+class MockJudgeServer(object):
+    """
+    Serve the mock judge in a background thread, on `url`.
+
+    Args:
+        latency: Seconds to wait before replying to each request.
+        latency_jitter: Seconds of uniform jitter added to `latency`.
+        rules: The verdict of a request is decided by the first rule which matches its prompt.
+        default_correct: Verdict of the requests which match no rule.
+        correct_reply: Content of the reply of a correct verdict.
+        incorrect_reply: Content of the reply of an incorrect verdict.
+        error_rate: Fraction of the requests answered with a 500 error.
+        throttle_rate: Fraction of the requests answered with a 429 error.
+        retry_after: `Retry-After` seconds of the 429 errors, None sends no header.
+        seed: Seed of the generator of the latency jitter and the injected errors.
+        host: Host to bind.
+        port: Port to bind, 0 picks a free port.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        rules: Sequence[JudgeRule] = (),
+        default_correct: bool = True,
+        correct_reply: str = CORRECT_REPLY,
+        incorrect_reply: str = INCORRECT_REPLY,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: Optional[float] = None,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        if not 0 <= error_rate + throttle_rate <= 1:
+            err_msg = f"Expected 0 <= `error_rate` + `throttle_rate` <= 1, but got {error_rate} and {throttle_rate}."
+            raise ValueError(err_msg)
+
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rules = [(re.compile(rule.pattern), rule.correct) for rule in rules]
+        self.default_correct = default_correct
+        self.correct_reply = correct_reply
+        self.incorrect_reply = incorrect_reply
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)  # noqa: S311
+        self._lock = threading.Lock()
+        self._num_requests = 0
+        self._num_errors = 0
+        self._num_throttled = 0
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}/v1/chat/completions"
+
+    @property
+    def num_requests(self) -> int:
+        return self._num_requests
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get the requests received, and those answered with a 500 and a 429 error.
+        """
+        with self._lock:
+            return {"requests": self._num_requests, "errors": self._num_errors, "throttled": self._num_throttled}
+
+    def judge(self, prompt: str) -> str:
+        """
+        Get the reply to a prompt, by the verdict rules.
+        """
+        correct = self.default_correct
+        for pattern, rule_correct in self.rules:
+            if pattern.search(prompt) is not None:
+                correct = rule_correct
+                break
+        return self.correct_reply if correct else self.incorrect_reply
+
+    def start(self) -> "MockJudgeServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock_judge_server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self) -> "MockJudgeServer":
+        return self.start()
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.stop()
+
+    def _draw_outcome(self) -> tuple[float, Optional[int]]:
+        # * the delay and the injected error of a request are drawn together, in the order the requests arrive
+        with self._lock:
+            self._num_requests += 1
+            delay = self.latency + self._rng.uniform(0.0, self.latency_jitter)
+            draw = self._rng.random()
+            status = None
+            if draw < self.error_rate:
+                self._num_errors += 1
+                status = 500
+            elif draw < self.error_rate + self.throttle_rate:
+                self._num_throttled += 1
+                status = 429
+        return delay, status
+
+    def _reply(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        model = payload.get("model") or "mock"
+        if path.rstrip("/").endswith("/completions") and not path.rstrip("/").endswith("/chat/completions"):
+            prompts = payload.get("prompt", [])
+            if isinstance(prompts, str):
+                prompts = [prompts]
+            return {
+                "id": "mock",
+                "object": "text_completion",
+                "model": model,
+                "choices": [
+                    {"index": index, "text": self.judge(str(prompt)), "finish_reason": "stop"}
+                    for index, prompt in enumerate(prompts)
+                ],
+            }
+
+        messages = payload.get("messages") or [{}]
+        content = messages[-1].get("content", "")
+        if isinstance(content, list):
+            # * multimodal messages, only their text parts are matched
+            content = "\n".join(str(part.get("text", "")) for part in content if isinstance(part, dict))
+        reply = self.judge(str(content))
+        return {
+            "id": "mock",
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        }
+
+    def _make_handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                if self.path.rstrip("/").endswith("/health"):
+                    self._send_json(200, {"status": "ok"})
+                else:
+                    self._send_json(404, {"error": "Not found"})
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    self._send_json(400, {"error": "Invalid JSON body"})
+                    return
+
+                delay, status = server._draw_outcome()
+                if delay > 0:
+                    time.sleep(delay)
+                if status == 429:
+                    headers = {} if server.retry_after is None else {"Retry-After": f"{server.retry_after:g}"}
+                    self._send_json(429, {"error": "Too many requests"}, headers)
+                elif status is not None:
+                    self._send_json(status, {"error": "Injected server error"})
+                else:
+                    self._send_json(200, server._reply(self.path, payload))
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                del format, args
+
+            def _send_json(self, status: int, data: dict[str, Any], headers: Optional[dict[str, str]] = None) -> None:
+                encoded = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(encoded)
+
+        return _Handler
+
+
+def _parse_rule(rule: str) -> JudgeRule:
+    pattern, separator, verdict = rule.rpartition("=")
+    if separator == "" or verdict not in ("correct", "incorrect"):
+        err_msg = f"Expected a rule of the form PATTERN=correct or PATTERN=incorrect, but got {rule!r}."
+        raise argparse.ArgumentTypeError(err_msg)
+    return JudgeRule(pattern=pattern, correct=verdict == "correct")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each reply.")
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument(
+        "--rule",
+        dest="rules",
+        type=_parse_rule,
+        action="append",
+        default=[],
+        help="PATTERN=correct or PATTERN=incorrect, the first rule whose pattern is found in a prompt decides it.",
+    )
+    parser.add_argument("--default-verdict", choices=["correct", "incorrect"], default="correct")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of the requests failed with 500.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of the requests failed with 429.")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds of the 429 errors.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with MockJudgeServer(
+        args.latency,
+        args.latency_jitter,
+        rules=args.rules,
+        default_correct=args.default_verdict == "correct",
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+        host=args.host,
+        port=args.port,
+    ) as server:
+        print(f"Serving the mock judge on {server.url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    A thread-safe token bucket, which lets `rate` requests per second through on average and bursts of `burst`.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        if rate <= 0:
+            err_msg = f"`rate` should be greater than 0, but got {rate}."
+            raise ValueError(err_msg)
+        if burst <= 0:
+            err_msg = f"`burst` should be greater than 0, but got {burst}."
+            raise ValueError(err_msg)
+
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Take a token, waiting for it if the bucket is empty.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            # * the token is reserved even if it is not available yet, so the waiting callers are served in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class AdaptiveConcurrencyLimiter(object):
+    """
+    Limit the requests in flight to an endpoint, adapting the limit AIMD-style: it grows by 1 for each limit of
+    successful requests, and is multiplied by `decrease_ratio` when the endpoint is overloaded, at most once per
+    smoothed round trip, since the requests in flight were sent under the previous limit.
+
+    Args:
+        max_limit: Initial and maximum number of requests in flight.
+        min_limit: Minimum number of requests in flight.
+        decrease_ratio: Factor applied to the limit when the endpoint is overloaded.
+        latency_threshold: A successful request slower than this number of seconds is taken as an overload,
+            0 only takes the throttled and failed requests as overloads.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        decrease_ratio: float = 0.5,
+        latency_threshold: float = 0.0,
+    ) -> None:
+        if not 0 < min_limit <= max_limit:
+            err_msg = f"Expected 0 < `min_limit` <= `max_limit`, but got {min_limit} and {max_limit}."
+            raise ValueError(err_msg)
+        if not 0 < decrease_ratio < 1:
+            err_msg = f"`decrease_ratio` should be between 0 and 1, but got {decrease_ratio}."
+            raise ValueError(err_msg)
+
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease_ratio = decrease_ratio
+        self.latency_threshold = latency_threshold
+
+        self._limit = float(max_limit)
+        self._inflight = 0
+        self._paused_until = 0.0
+        self._last_decrease_at = 0.0
+        self._latency_ewma = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def acquire(self) -> None:
+        """
+        Wait until a request can be sent, i.e. the limiter is not paused and fewer than `limit` are in flight.
+        """
+        with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self._inflight >= int(self._limit):
+                    self._condition.wait()
+                else:
+                    break
+            self._inflight += 1
+
+    def release(self, latency: float, overloaded: bool) -> None:
+        """
+        Release a request sent after `acquire`, and adapt the limit to its outcome.
+
+        Args:
+            latency: Seconds the request took.
+            overloaded: Whether the endpoint throttled the request or failed to answer it.
+        """
+        with self._condition:
+            self._inflight -= 1
+            if not overloaded:
+                self._latency_ewma = latency if self._latency_ewma == 0 else 0.9 * self._latency_ewma + 0.1 * latency
+                overloaded = self.latency_threshold > 0 and latency > self.latency_threshold
+
+            now = time.monotonic()
+            if not overloaded:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            elif now - self._last_decrease_at >= self._latency_ewma:
+                self._limit = max(self.min_limit, self._limit * self.decrease_ratio)
+                self._last_decrease_at = now
+            self._condition.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hold the new requests for `seconds`, e.g. as asked by the `Retry-After` header of a throttled response.
+        """
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+
+import random
+import threading
+import time
+import urllib.parse
+from collections.abc import Container, Mapping, Sequence
+from typing import Any, Literal, Optional
+
+import msgspec
+import requests
+
+from .logging import get_logger
+
+_logger = get_logger(__name__)
+
+# * weight of the latest latency in the moving average of the latency of a replica
+_EWMA_ALPHA = 0.2
+
+
+class ReplicaPoolOptions(msgspec.Struct, frozen=True):
+    # "least_outstanding" picks the replica with the fewest requests in flight, "ewma" the replica with the lowest
+    # moving average of the latency, scaled by its requests in flight
+    strategy: Literal["least_outstanding", "ewma"] = "least_outstanding"
+    # consecutive failed requests after which a replica is ejected
+    max_failures: int = 3
+    # seconds a replica stays ejected, doubled for each consecutive ejection up to `max_ejection_time`
+    ejection_time: float = 30.0
+    max_ejection_time: float = 300.0
+    # seconds between two health checks of the replicas, 0 disables the health checks
+    health_check_interval: float = 0.0
+    # path of the health check endpoint of the replicas, a 2xx response means healthy
+    health_check_path: str = "/health"
+    health_check_timeout: float = 5.0
+
+
+class _Replica(object):
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency_ewma = 0.0
+        self.ejections = 0
+        self.consecutive_ejections = 0
+        self.ejected_until = 0.0
+
+
+class ReplicaPool(object):
+    """
+    Interchangeable replicas of an LLM judge endpoint, each request is sent to one of them.
+
+    A replica is ejected for a while after `max_failures` consecutive failed requests or a failed health check,
+    and the requests go to the other replicas meanwhile. If all the replicas are ejected, they are all used.
+
+    Args:
+        urls: URLs of the chat completion endpoints of the replicas.
+        options: How to pick the replicas and eject them.
+    """
+
+    def __init__(self, urls: Sequence[str], options: Optional[ReplicaPoolOptions] = None) -> None:
+        if len(urls) == 0:
+            err_msg = "A replica pool needs at least one replica."
+            raise ValueError(err_msg)
+
+        self.options = options or ReplicaPoolOptions()
+        self._replicas = {url: _Replica(url) for url in urls}
+        self._lock = threading.Lock()
+        self._health_check_thread: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+        if self.options.health_check_interval > 0:
+            self._health_check_thread = threading.Thread(
+                target=self._check_health_periodically, name="glmv_reward_replica_health", daemon=True
+            )
+            self._health_check_thread.start()
+
+    @property
+    def urls(self) -> list[str]:
+        return list(self._replicas)
+
+    def acquire(self, exclude: Container[str] = ()) -> str:
+        """
+        Pick a replica for a request, which must be released by `release`.
+
+        Args:
+            exclude: URLs of the replicas not to pick, e.g. those which already failed the request, ignored if it
+                excludes all the replicas.
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [replica for replica in self._replicas.values() if replica.url not in exclude]
+            if len(candidates) == 0:
+                candidates = list(self._replicas.values())
+            healthy_candidates = [replica for replica in candidates if replica.ejected_until <= now]
+            if len(healthy_candidates) > 0:
+                candidates = healthy_candidates
+
+            # * ties are broken randomly, so that idle replicas share the load
+            random.shuffle(candidates)
+            if self.options.strategy == "ewma":
+                replica = min(candidates, key=lambda r: r.latency_ewma * (r.outstanding + 1))
+            else:
+                replica = min(candidates, key=lambda r: r.outstanding)
+            replica.outstanding += 1
+            replica.requests += 1
+            return replica.url
+
+    def release(self, url: str, latency: float, succeeded: bool) -> None:
+        """
+        Release a replica picked by `acquire`, with the outcome of its request.
+        """
+        with self._lock:
+            replica = self._replicas[url]
+            replica.outstanding -= 1
+            if succeeded:
+                replica.consecutive_failures = 0
+                replica.consecutive_ejections = 0
+                if replica.latency_ewma == 0:
+                    replica.latency_ewma = latency
+                else:
+                    replica.latency_ewma = (1 - _EWMA_ALPHA) * replica.latency_ewma + _EWMA_ALPHA * latency
+                return
+
+            replica.failures += 1
+            replica.consecutive_failures += 1
+            if replica.consecutive_failures >= self.options.max_failures:
+                self._eject(replica)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Get the requests in flight, the requests, the failures, the moving average of the latency in seconds and
+        the ejections of each replica, and whether it is ejected.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                replica.url: {
+                    "outstanding": replica.outstanding,
+                    "requests": replica.requests,
+                    "failures": replica.failures,
+                    "latency_ewma": replica.latency_ewma,
+                    "ejections": replica.ejections,
+                    "ejected": replica.ejected_until > now,
+                }
+                for replica in self._replicas.values()
+            }
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._health_check_thread is not None:
+            self._health_check_thread.join()
+            self._health_check_thread = None
+
+    def _eject(self, replica: _Replica) -> None:
+        # * the caller holds `_lock`
+        ejection_time = min(
+            self.options.max_ejection_time, self.options.ejection_time * 2**replica.consecutive_ejections
+        )
+        replica.ejected_until = time.monotonic() + ejection_time
+        replica.ejections += 1
+        replica.consecutive_ejections += 1
+        replica.consecutive_failures = 0
+        _logger.warning("> Ejected the LLM judge replica %s for %.1f seconds", replica.url, ejection_time)
+
+    def _check_health_periodically(self) -> None:
+        session = requests.Session()
+        try:
+            while not self._closed.wait(self.options.health_check_interval):
+                for url in self.urls:
+                    self._check_health(session, url)
+        finally:
+            session.close()
+
+    def _check_health(self, session: requests.Session, url: str) -> None:
+        health_url = urllib.parse.urljoin(url, self.options.health_check_path)
+        try:
+            response = session.get(health_url, timeout=self.options.health_check_timeout)
+            healthy = response.ok
+        except requests.exceptions.RequestException:
+            healthy = False
+
+        with self._lock:
+            replica = self._replicas[url]
+            is_ejected = replica.ejected_until > time.monotonic()
+            if healthy and is_ejected:
+                replica.ejected_until = 0.0
+                _logger.info("> The LLM judge replica %s is healthy again", url)
+            elif not healthy and not is_ejected:
+                self._eject(replica)
+
+
+_replica_pools: dict[str, ReplicaPool] = {}
+_replica_pools_lock = threading.Lock()
+
+
+def configure_replica_pools(replica_pools: Mapping[str, ReplicaPool]) -> None:
+    """
+    Set the replica pools used by `post_query_llm`, keyed by the URL configured in the verifiers.
+    The pools configured before and not kept are closed.
+    """
+    global _replica_pools
+
+    new_replica_pools = dict(replica_pools)
+    with _replica_pools_lock:
+        old_replica_pools, _replica_pools = _replica_pools, new_replica_pools
+    kept_pool_ids = {id(replica_pool) for replica_pool in new_replica_pools.values()}
+    for replica_pool in old_replica_pools.values():
+        if id(replica_pool) not in kept_pool_ids:
+            replica_pool.close()
+
+
+def register_replica_pools(replica_pools: Mapping[str, ReplicaPool]) -> list[str]:
+    """
+    Add the replica pools used by `post_query_llm` to the ones configured before, and return the URLs which
+    already have another pool, those are kept.
+    """
+    global _replica_pools
+
+    with _replica_pools_lock:
+        new_replica_pools = dict(_replica_pools)
+        taken_urls = []
+        for url, replica_pool in replica_pools.items():
+            if new_replica_pools.setdefault(url, replica_pool) is not replica_pool:
+                taken_urls.append(url)
+        _replica_pools = new_replica_pools
+    return taken_urls
+
+
+def unregister_replica_pools(replica_pools: Mapping[str, ReplicaPool]) -> None:
+    """
+    Remove the replica pools used by `post_query_llm` which are still these ones, without closing them.
+    """
+    global _replica_pools
+
+    with _replica_pools_lock:
+        _replica_pools = {
+            url: replica_pool
+            for url, replica_pool in _replica_pools.items()
+            if replica_pools.get(url) is not replica_pool
+        }
+
+
+def get_replica_pool(url: str) -> Optional[ReplicaPool]:
+    return _replica_pools.get(url)
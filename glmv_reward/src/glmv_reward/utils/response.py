@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+
+
+import re
+import threading
+from typing import Literal, Optional
+
+from .text import StreamingRepeatDetector
+
+_THINK_ANSWER_PATTERN = re.compile(r"^<think>(.*?)</think>\s*<answer>(.*?)</answer>$", re.DOTALL | re.IGNORECASE)
+_THINK_PATTERN = re.compile(r"^<think>(.*?)</think>(.*)$", re.DOTALL | re.IGNORECASE)
+# * the tags and box tokens, matched like the patterns above match them
+_TOKEN_PATTERN = re.compile(
+    r"<think>|</think>|<answer>|</answer>|<\|begin_of_box\|>|<\|end_of_box\|>|\\boxed\{", re.IGNORECASE
+)
+_ANSWER_START_PATTERN = re.compile(r"\s*<answer>", re.IGNORECASE)
+# * the non-ASCII characters which match an ASCII letter of the tokens case-insensitively, or lower-case to one,
+# * e.g. the Kelvin sign, with which the token positions may disagree with `str.lower`, so the regex path is taken
+_CASE_FOLDING_PATTERN = re.compile("[İıſK]")
+
+_THINK_TAGS = ("<think>", "</think>")
+_ANSWER_TAGS = ("<answer>", "</answer>")
+_BEGIN_OF_BOX = "<|begin_of_box|>"
+_END_OF_BOX = "<|end_of_box|>"
+_LEGACY_BOXED = "\\boxed{"
+# * a chunk may end inside a token, whose start is kept to be matched with the next chunk
+_MAX_TOKEN_LENGTH = len(_BEGIN_OF_BOX)
+
+
+class ParsedResponse(object):
+    """
+    The think and answer parts of a response "<think>...</think><answer>...</answer>", found in one pass.
+
+    Attributes:
+        answer: The stripped answer part, or None if the response does not match
+            "<think>...</think>\\s*<answer>...</answer>" or any think or answer tag is nested in its parts.
+        text_after_think: The stripped text after the first "</think>" of a response starting with "<think>", or
+            None if not found or a think tag is nested in the think part.
+        think_has_answer_tags: Whether an answer tag is nested in the think part.
+        text_after_think_has_tags: Whether any think or answer tag is in the text after the think part.
+        num_begin_boxes, num_end_boxes, num_legacy_boxes: Numbers of "<|begin_of_box|>", "<|end_of_box|>" and
+            "\\boxed{" in the answer part, case-insensitively, 0 if there is no answer part.
+    """
+
+    __slots__ = (
+        "answer",
+        "num_begin_boxes",
+        "num_end_boxes",
+        "num_legacy_boxes",
+        "text",
+        "text_after_think",
+        "text_after_think_has_tags",
+        "think_has_answer_tags",
+    )
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.answer: Optional[str] = None
+        self.text_after_think: Optional[str] = None
+        self.think_has_answer_tags = False
+        self.text_after_think_has_tags = False
+        self.num_begin_boxes = 0
+        self.num_end_boxes = 0
+        self.num_legacy_boxes = 0
+
+        if _CASE_FOLDING_PATTERN.search(text) is None:
+            self._parse_tokens()
+        else:
+            self._parse_with_patterns()
+
+    def has_valid_format(self) -> bool:
+        """
+        Whether the response passes `RewardSystem.check_answer_format`: it has an answer part, with at most one box
+        and no `\\boxed{`.
+        """
+        return (
+            self.answer is not None
+            and self.num_begin_boxes <= 1
+            and self.num_end_boxes <= 1
+            and self.num_legacy_boxes == 0
+        )
+
+    def _parse_tokens(self) -> None:
+        text = self.text
+        tokens = [(match.start(), match.group().lower()) for match in _TOKEN_PATTERN.finditer(text)]
+        if len(tokens) == 0 or tokens[0] != (0, "<think>"):
+            return
+
+        # * the think part ends at the first "</think>"
+        think_end_index = next((index for index, (_, tag) in enumerate(tokens) if tag == "</think>"), None)
+        if think_end_index is None:
+            return
+        think_end = tokens[think_end_index][0]
+        think_tokens = {tag for _, tag in tokens[1:think_end_index]}
+        rest_tokens = tokens[think_end_index + 1 :]
+        think_has_think_tags = "<think>" in think_tokens
+        self.think_has_answer_tags = any(tag in think_tokens for tag in _ANSWER_TAGS)
+        self.text_after_think_has_tags = any(tag in _THINK_TAGS or tag in _ANSWER_TAGS for _, tag in rest_tokens)
+        if not think_has_think_tags:
+            self.text_after_think = text[think_end + len("</think>") :].strip()
+
+        # * the answer part starts right after the think part and ends at a "</answer>" at the end of the text,
+        # * optionally followed by a newline, like "$" matches
+        answer_start = _ANSWER_START_PATTERN.match(text, think_end + len("</think>"))
+        if answer_start is None or len(rest_tokens) < 2:
+            return
+        answer_end = len(text) - len("</answer>")
+        if text.endswith("\n"):
+            answer_end -= 1
+        if rest_tokens[-1] != (answer_end, "</answer>") or think_has_think_tags or self.think_has_answer_tags:
+            return
+        answer_tokens = [tag for _, tag in rest_tokens[1:-1]]
+        if any(tag in _THINK_TAGS or tag in _ANSWER_TAGS for tag in answer_tokens):
+            return
+
+        self.answer = text[answer_start.end() : answer_end].strip()
+        self.num_begin_boxes = answer_tokens.count(_BEGIN_OF_BOX)
+        self.num_end_boxes = answer_tokens.count(_END_OF_BOX)
+        self.num_legacy_boxes = answer_tokens.count(_LEGACY_BOXED)
+
+    def _parse_with_patterns(self) -> None:
+        text = self.text
+        match = _THINK_PATTERN.search(text)
+        if match is not None:
+            think_part = match.group(1).strip().lower()
+            rest = match.group(2).strip()
+            rest_lower = rest.lower()
+            self.think_has_answer_tags = any(tag in think_part for tag in _ANSWER_TAGS)
+            self.text_after_think_has_tags = any(tag in rest_lower for tag in _THINK_TAGS + _ANSWER_TAGS)
+            if not any(tag in think_part for tag in _THINK_TAGS):
+                self.text_after_think = rest
+
+        match = _THINK_ANSWER_PATTERN.search(text)
+        if match is None:
+            return
+        think_part = match.group(1).strip().lower()
+        answer_part = match.group(2).strip()
+        answer_lower = answer_part.lower()
+        if any(tag in think_part or tag in answer_lower for tag in _THINK_TAGS + _ANSWER_TAGS):
+            return
+
+        self.answer = answer_part
+        self.num_begin_boxes = answer_lower.count(_BEGIN_OF_BOX)
+        self.num_end_boxes = answer_lower.count(_END_OF_BOX)
+        self.num_legacy_boxes = answer_lower.count(_LEGACY_BOXED)
+
+
+# * the format check and the extraction of the ground truth run between those of the answer of an item
+_NUM_CACHED_PARSES = 4
+
+_local = threading.local()
+
+
+def parse_response(text: str) -> ParsedResponse:
+    """
+    Parse a response, reusing the result of one of the last calls of this thread which parsed the same string object,
+    so the format check and the answer extraction of an item parse it once.
+    """
+    recent: Optional[list[ParsedResponse]] = getattr(_local, "recent", None)
+    if recent is None:
+        recent = _local.recent = []
+    for parsed in recent:
+        if parsed.text is text:
+            return parsed
+
+    parsed = ParsedResponse(text)
+    if len(recent) >= _NUM_CACHED_PARSES:
+        recent.pop(0)
+    recent.append(parsed)
+    return parsed
+
+
+class StreamingValidator(object):
+    """
+    Validate a response while it is generated, to stop a rollout as soon as it is certain to fail its checks.
+
+    A response is rejected only if no continuation of the text fed so far can pass the offline checks, so the
+    validator never disagrees with them: `RewardSystem.check_answer_format`, whose failures get the min reward, with
+    `check_format`, and `detect_repeat` with `check_repetition`. It can be called as a stop criterion, with each new
+    chunk of the generated text.
+
+    Args:
+        check_format: Reject the responses which cannot have a valid format, e.g. with a nested "<think>", two
+            boxes or a "\\boxed{" in the answer, or text after "</answer>".
+        check_repetition: Reject the repetitive responses.
+        min_chars, min_repetition, exclude_length: The arguments of `detect_repeat`.
+        check_interval: A repetition is detected up to this many characters late, see `StreamingRepeatDetector`.
+
+    Attributes:
+        failure: "format" or "repetition" once the response is rejected, None otherwise.
+    """
+
+    def __init__(
+        self,
+        check_format: bool = True,
+        check_repetition: bool = True,
+        min_chars: int = 50,
+        min_repetition: int = 10,
+        exclude_length: int = 3,
+        check_interval: int = 256,
+    ) -> None:
+        self.check_format = check_format
+        self.failure: Optional[Literal["format", "repetition"]] = None
+        self._repeat_detector = (
+            StreamingRepeatDetector(min_chars, min_repetition, exclude_length, check_interval)
+            if check_repetition
+            else None
+        )
+        self._length = 0
+        self._token_tail = ""
+        # * the part of the response being read: "start", "think", "after_think", "answer", "closed",
+        # * or "unknown" if the response is matched by the regex path of `ParsedResponse`
+        self._state = "start"
+        # * the tokens which start before this position were read in an earlier state
+        self._position = 0
+        self._head = ""
+        self._answer_tag = ""
+        self._text_after_answer = ""
+        self._num_begin_boxes = 0
+        self._num_end_boxes = 0
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Add the next chunk of the response.
+
+        Returns:
+            Whether the response is certain to get the min reward, and its generation can be stopped.
+        """
+        if self.failure is not None:
+            return True
+
+        if self.check_format and not self._feed_format(chunk):
+            self.failure = "format"
+        elif self._repeat_detector is not None and self._repeat_detector.feed(chunk):
+            self.failure = "repetition"
+        self._length += len(chunk)
+        return self.failure is not None
+
+    def __call__(self, chunk: str) -> bool:
+        return self.feed(chunk)
+
+    def _feed_format(self, chunk: str) -> bool:
+        """
+        Read the chunk with the rules of `ParsedResponse.has_valid_format`, False if no continuation can pass them.
+        """
+        if self._state == "unknown" or _CASE_FOLDING_PATTERN.search(chunk) is not None:
+            self._state = "unknown"
+            return True
+
+        chunk_start = self._length
+        text = self._token_tail + chunk
+        text_start = chunk_start - len(self._token_tail)
+        self._token_tail = text[-(_MAX_TOKEN_LENGTH - 1) :]
+        # * the tokens which end in the chunk, the others were read with the earlier chunks
+        tokens = [
+            (text_start + match.start(), text_start + match.end(), match.group().lower())
+            for match in _TOKEN_PATTERN.finditer(text)
+            if text_start + match.end() > chunk_start
+        ]
+        token_index = 0
+
+        while True:
+            if self._state in ("think", "answer"):
+                while token_index < len(tokens) and tokens[token_index][0] < self._position:
+                    token_index += 1
+                if token_index == len(tokens):
+                    return True
+                _, token_end, tag = tokens[token_index]
+                token_index += 1
+
+            if self._state == "start":
+                self._head += chunk[: len("<think>") - len(self._head)]
+                if not "<think>".startswith(self._head.lower()):
+                    return False
+                if len(self._head) < len("<think>"):
+                    return True
+                self._state, self._position = "think", len("<think>")
+            elif self._state == "think":
+                if tag == "</think>":
+                    self._state, self._position = "after_think", token_end
+                elif tag in _THINK_TAGS or tag in _ANSWER_TAGS:
+                    return False
+            elif self._state == "after_think":
+                # * only whitespace may separate "</think>" and "<answer>"
+                offset = max(self._position - chunk_start, 0)
+                rest = chunk[offset:]
+                if self._answer_tag == "":
+                    stripped = rest.lstrip()
+                    offset += len(rest) - len(stripped)
+                    rest = stripped
+                num_chars = min(len("<answer>") - len(self._answer_tag), len(rest))
+                self._answer_tag += rest[:num_chars]
+                if not "<answer>".startswith(self._answer_tag.lower()):
+                    return False
+                if len(self._answer_tag) < len("<answer>"):
+                    return True
+                self._state, self._position = "answer", chunk_start + offset + num_chars
+            elif self._state == "answer":
+                if tag == "</answer>":
+                    self._state, self._position = "closed", token_end
+                elif tag in _THINK_TAGS or tag == "<answer>" or tag == _LEGACY_BOXED:
+                    return False
+                elif tag == _BEGIN_OF_BOX:
+                    self._num_begin_boxes += 1
+                elif tag == _END_OF_BOX:
+                    self._num_end_boxes += 1
+                if self._num_begin_boxes > 1 or self._num_end_boxes > 1:
+                    return False
+            else:
+                # * the first "</answer>" ends the response, but for a newline
+                offset = max(self._position - chunk_start, 0)
+                self._text_after_answer += chunk[offset : offset + 2]
+                return self._text_after_answer in ("", "\n")
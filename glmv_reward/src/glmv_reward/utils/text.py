@@ -2,11 +2,31 @@
 
 
 import re
+from collections import Counter
 from collections.abc import Sequence
 from typing import Optional
 
+import numpy as np
+
 _BEGIN_OF_BOX = "<|begin_of_box|>"
 _END_OF_BOX = "<|end_of_box|>"
+_LEGACY_BOXED = "\\boxed{"
+# * the formatting whose runs are removed before the repetitions are detected, e.g. table rules and separators
+_TABLE_RULE_PATTERN = re.compile(r"\|[-]+\|")
+_FORMATTING_CHARS = ("=", "|", "-", "~", "_", "#", "*", ".", "%", "－", "█", " ", "─")
+_FORMATTING_CHARS_STR = "".join(_FORMATTING_CHARS)
+# * an odd base of the rolling hash, invertible modulo 2 ** 64
+_HASH_BASE = 0x9E3779B97F4A7C15
+_HASH_BASE_INVERSE = pow(_HASH_BASE, -1, 1 << 64)
+# * the CJK characters and the ASCII words counted by the language mixing detection
+_CJK_FIRST = 0x4E00
+_CJK_LAST = 0x9FFF
+_MIXING_BLOCK_LENGTH = 4096
+_CJK_CHAR_PATTERN = re.compile(r"[\u4e00-\u9fff]")
+_ASCII_LETTER_PAIR_PATTERN = re.compile(r"[a-zA-Z]{2}")
+# * the last entries stand for the codepoints after them, all non-ASCII and no whitespace from U+3001 on
+_ASCII_WORD_CHAR_TABLE = np.array([chr(code).isalnum() or chr(code) == "_" for code in range(0x81)], dtype=bool)
+_WHITESPACE_TABLE = np.array([chr(code).isspace() for code in range(0x3002)], dtype=bool)
 
 
 def find_boxed_content_with_boxed(text: str) -> list[str]:
@@ -28,25 +48,25 @@ def find_boxed_content_with_boxed(text: str) -> list[str]:
         A list of strings extracted from each top-level \boxed{...} block.
     """
     results = []
-    i = 0
-    while i < len(text):
-        if text[i : i + 7] == "\\boxed{":
-            i += 7  # Move past "\boxed{"
-            content = ""
-            brace_count = 1
-            while i < len(text) and brace_count > 0:
-                if text[i] == "{":
-                    brace_count += 1
-                elif text[i] == "}":
-                    brace_count -= 1
-
-                if brace_count > 0:
-                    content += text[i]
-                i += 1
-
-            results.append(content)
-        else:
-            i += 1
+    start = text.find(_LEGACY_BOXED)
+    while start != -1:
+        content_start = start + len(_LEGACY_BOXED)
+        # * jump from "}" to "}", the depth can only reach 0 at one, an unclosed box takes the rest of the text
+        content_end = len(text)
+        brace_count = 1
+        i = content_start
+        while True:
+            close = text.find("}", i)
+            if close == -1:
+                break
+            brace_count += text.count("{", i, close) - 1
+            i = close + 1
+            if brace_count == 0:
+                content_end = close
+                break
+
+        results.append(text[content_start:content_end])
+        start = text.find(_LEGACY_BOXED, content_end + 1)
     return results
 
 
@@ -128,33 +148,115 @@ def detect_long_paragraph_mixing(text: str, min_chinese_chars: int = 50, min_eng
     Returns:
         bool: True if long paragraph mixing is detected
     """
-    paragraphs = [p.strip() for p in re.split(r"\n{2,}", text) if p.strip()]
+    return detect_long_paragraph_mixings(
+        [text], min_chinese_chars=min_chinese_chars, min_english_words=min_english_words
+    )[0]
 
-    has_long_chinese = False
-    has_long_english = False
 
-    for para in paragraphs:
-        if len(para) == 0:
-            continue
-
-        chinese_chars = re.findall(r"[\u4e00-\u9fff]", para)
-        chinese_count = len(chinese_chars)
-
-        english_words = re.findall(r"\b[a-zA-Z]{2,}\b", para)
-        english_count = len(english_words)
+def detect_long_paragraph_mixings(
+    texts: Sequence[str], min_chinese_chars: int = 50, min_english_words: int = 200
+) -> list[bool]:
+    """
+    Detect long paragraph mixing in each of the texts, like `detect_long_paragraph_mixing`, e.g. in all the
+    rollouts of a batch.
 
-        total_chars = len(para)
+    The paragraphs are separated by two or more newlines and stripped. A paragraph is long Chinese if it has at
+    least `min_chinese_chars` CJK characters, more than 80% of its characters, and long English if it has at least
+    `min_english_words` ASCII words of two or more letters, more than 70% of its whitespace-separated tokens.
 
-        if chinese_count >= min_chinese_chars and chinese_count / total_chars > 0.8:
-            has_long_chinese = True
+    The texts too short or without a CJK character or an ASCII word are skipped at once. The others are read in
+    blocks of whole paragraphs, twice as long each time, and the codepoints of the blocks of all the texts are
+    counted by paragraph together, until a text has both paragraphs or ends.
 
-        if english_count >= min_english_words and english_count / (len(para.split()) + 1e-5) > 0.7:
-            has_long_english = True
+    Returns:
+        Whether each text has both a long Chinese and a long English paragraph.
+    """
+    results = [False] * len(texts)
+    # * a long Chinese paragraph has a CJK character at least, and a long English paragraph a word at least
+    min_length = max(min_chinese_chars, 1) + 2 * max(min_english_words, 1)
+    block_starts = {
+        index: 0
+        for index, text in enumerate(texts)
+        if len(text) >= min_length
+        and _CJK_CHAR_PATTERN.search(text) is not None
+        and _ASCII_LETTER_PAIR_PATTERN.search(text) is not None
+    }
+    has_long_chinese = dict.fromkeys(block_starts, False)
+    has_long_english = dict.fromkeys(block_starts, False)
+
+    block_length = _MIXING_BLOCK_LENGTH
+    while len(block_starts) > 0:
+        indices = list(block_starts)
+        blocks = []
+        for index in indices:
+            # * a block ends before a blank line, the rest of its newlines start the next block as an empty paragraph
+            block_end = texts[index].find("\n\n", block_starts[index] + block_length)
+            block_end = len(texts[index]) if block_end == -1 else block_end
+            blocks.append(texts[index][block_starts[index] : block_end])
+            block_starts[index] = block_end
+
+        blocks_have_long_chinese, blocks_have_long_english = _find_long_paragraphs(
+            blocks, min_chinese_chars, min_english_words
+        )
+        for index, block_has_long_chinese, block_has_long_english in zip(
+            indices, blocks_have_long_chinese.tolist(), blocks_have_long_english.tolist(), strict=True
+        ):
+            has_long_chinese[index] |= block_has_long_chinese
+            has_long_english[index] |= block_has_long_english
+            if has_long_chinese[index] and has_long_english[index]:
+                results[index] = True
+                del block_starts[index]
+            elif block_starts[index] == len(texts[index]):
+                del block_starts[index]
+        block_length *= 2
+    return results
 
-        if has_long_chinese and has_long_english:
-            return True
 
-    return has_long_chinese and has_long_english
+def _find_long_paragraphs(
+    texts: Sequence[str], min_chinese_chars: int, min_english_words: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Get whether each text has a long Chinese paragraph and whether it has a long English paragraph, see
+    `detect_long_paragraph_mixings`.
+    """
+    # * the texts are joined by blank lines, so none of their paragraphs are joined
+    joined_text = "\n\n".join(texts)
+    lengths = np.array([len(text) + 2 for text in texts])
+    offsets = np.cumsum(lengths) - lengths
+    codes = np.frombuffer(joined_text.encode("utf-32-le", "surrogatepass"), dtype="<u4")
+
+    is_newline = codes == ord("\n")
+    is_separator = is_newline & (_shift_right(is_newline) | _shift_left(is_newline))
+    paragraph_ids = np.cumsum(~is_separator & _shift_right(is_separator, fill=True)) - 1
+    num_paragraphs = int(paragraph_ids.max()) + 1
+
+    # * `str.strip` and `str.split` take the same whitespace, the paragraphs of whitespace only are left out
+    is_token = ~_WHITESPACE_TABLE.take(codes, mode="clip")
+    token_positions = np.flatnonzero(is_token)
+    if len(token_positions) == 0:
+        return np.zeros(len(texts), dtype=bool), np.zeros(len(texts), dtype=bool)
+
+    token_paragraph_ids = paragraph_ids[token_positions]
+    changes = np.flatnonzero(token_paragraph_ids[1:] != token_paragraph_ids[:-1]) + 1
+    firsts = np.concatenate(([0], changes))
+    lasts = np.concatenate((changes, [len(token_positions)])) - 1
+    stripped_ids = token_paragraph_ids[firsts]
+    stripped_starts = token_positions[firsts]
+    stripped_lengths = token_positions[lasts] + 1 - stripped_starts
+
+    def count_by_paragraph(positions: np.ndarray) -> np.ndarray:
+        return np.bincount(paragraph_ids[positions], minlength=num_paragraphs)[stripped_ids]
+
+    num_tokens = count_by_paragraph(np.flatnonzero(is_token & ~_shift_right(is_token)))
+    num_chinese = count_by_paragraph(np.flatnonzero((codes >= _CJK_FIRST) & (codes <= _CJK_LAST)))
+    num_english = count_by_paragraph(_find_ascii_words(codes))
+
+    is_long_chinese = (num_chinese >= min_chinese_chars) & (num_chinese / stripped_lengths > 0.8)
+    is_long_english = (num_english >= min_english_words) & (num_english / (num_tokens + 1e-5) > 0.7)
+    text_ids = np.searchsorted(offsets, stripped_starts, side="right") - 1
+    has_long_chinese = np.bincount(text_ids[is_long_chinese], minlength=len(texts)) > 0
+    has_long_english = np.bincount(text_ids[is_long_english], minlength=len(texts)) > 0
+    return has_long_chinese, has_long_english
 
 
 def detect_repeat(text: str, min_chars: int = 50, min_repetition: int = 10, exclude_length: int = 3) -> bool:
@@ -170,6 +272,178 @@ def detect_repeat(text: str, min_chars: int = 50, min_repetition: int = 10, excl
     Returns:
         bool: True if repetitive content is detected, False otherwise
     """
+    return detect_repeats([text], min_chars=min_chars, min_repetition=min_repetition, exclude_length=exclude_length)[0]
+
+
+def detect_repeats(
+    texts: Sequence[str], min_chars: int = 50, min_repetition: int = 10, exclude_length: int = 3
+) -> list[bool]:
+    """
+    Detect repetitive content in each of the texts, like `detect_repeat`, e.g. in all the rollouts of a batch.
+
+    A text is repetitive if any substring of `min_chars` characters occurs at least `min_repetition` times, after
+    the formatting runs are removed. The windows of all the texts are hashed together with a rolling hash, and only
+    the windows whose hash occurs often enough are compared.
+
+    Returns:
+        Whether each text is repetitive.
+    """
+    _check_repeat_args(min_chars, min_repetition)
+
+    results = [False] * len(texts)
+    cleaned_texts = [remove_formatting_runs(text, exclude_length) for text in texts]
+    # * a text with fewer windows than `min_repetition` cannot repeat one enough
+    indices = [index for index, text in enumerate(cleaned_texts) if len(text) - min_chars + 1 >= min_repetition]
+    if len(indices) == 0:
+        return results
+
+    lengths = np.array([len(cleaned_texts[index]) for index in indices])
+    offsets = np.cumsum(lengths) - lengths
+    window_hashes = _hash_windows("".join(cleaned_texts[index] for index in indices), min_chars)
+    # * the windows across two texts are dropped
+    text_ids = np.repeat(np.arange(len(indices)), lengths)
+    is_valid = text_ids[: len(window_hashes)] == text_ids[min_chars - 1 :]
+    window_starts = np.flatnonzero(is_valid)
+    window_text_ids = text_ids[window_starts]
+    # * the hashes are mixed with the texts, so the windows of a substring of a text all fall in one group
+    keys = window_hashes[is_valid] ^ (window_text_ids.astype(np.uint64) * np.uint64(_HASH_BASE))
+
+    # * only the windows whose bucket of keys is large enough can repeat, which is usually none of them
+    bucket_bits = len(keys).bit_length() + 1
+    buckets = (keys >> np.uint64(64 - bucket_bits)).astype(np.intp)
+    candidates = np.flatnonzero(np.bincount(buckets, minlength=1 << bucket_bits)[buckets] >= min_repetition)
+    order = candidates[np.argsort(keys[candidates])]
+    sorted_keys = keys[order]
+    boundaries = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+    group_starts = np.concatenate(([0], boundaries))
+    group_ends = np.concatenate((boundaries, [len(order)]))
+
+    is_repetitive = np.zeros(len(indices), dtype=bool)
+    for group in np.flatnonzero(group_ends - group_starts >= min_repetition).tolist():
+        windows = order[group_starts[group] : group_ends[group]]
+        group_text_ids = window_text_ids[windows]
+        if is_repetitive[group_text_ids].all():
+            continue
+        # * the hashes may collide, so the substrings are counted, the first of a group usually repeats at once
+        substring_counts: Counter[tuple[int, str]] = Counter()
+        group_starts_in_texts = window_starts[windows] - offsets[group_text_ids]
+        for text_id, start in zip(group_text_ids.tolist(), group_starts_in_texts.tolist(), strict=True):
+            key = (text_id, cleaned_texts[indices[text_id]][start : start + min_chars])
+            substring_counts[key] += 1
+            if substring_counts[key] >= min_repetition:
+                is_repetitive[text_id] = True
+                if is_repetitive[group_text_ids].all():
+                    break
+
+    for text_id in np.flatnonzero(is_repetitive).tolist():
+        results[indices[text_id]] = True
+    return results
+
+
+class StreamingRepeatDetector(object):
+    """
+    Detect repetitive content like `detect_repeat`, while the text is generated.
+
+    The formatting runs never span a character outside the formatting characters, so the text up to the last such
+    character is cleaned for good, and its windows are counted as it grows. A text is reported repetitive only once
+    its cleaned part repeats a window `min_repetition` times, in which case `detect_repeat` of any text starting
+    with it is True too.
+
+    Args:
+        min_chars, min_repetition, exclude_length: The arguments of `detect_repeat`.
+        check_interval: The windows are counted once this many cleaned characters are gathered, so a repetition is
+            detected up to this many characters late.
+    """
+
+    def __init__(
+        self, min_chars: int = 50, min_repetition: int = 10, exclude_length: int = 3, check_interval: int = 256
+    ) -> None:
+        _check_repeat_args(min_chars, min_repetition)
+        if exclude_length < 0:
+            err_msg = f"`exclude_length` should be greater than or equal to 0, but got {exclude_length}."
+            raise ValueError(err_msg)
+
+        self.min_chars = min_chars
+        self.min_repetition = min_repetition
+        self.exclude_length = exclude_length
+        self.check_interval = check_interval
+        self.is_repetitive = False
+        # * the text after the last character outside the formatting characters is cleaned with the next chunks
+        self._pending: list[str] = []
+        self._num_pending = 0
+        self._next_check = check_interval
+        self._cleaned_parts: list[str] = []
+        self._window_tail = ""
+        self._window_counts: Counter[int] = Counter()
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Add the next chunk of the text.
+
+        Returns:
+            Whether the text is repetitive, whatever follows.
+        """
+        if self.is_repetitive:
+            return True
+
+        self._pending.append(chunk)
+        self._num_pending += len(chunk)
+        if self._num_pending < self._next_check:
+            return False
+
+        pending = "".join(self._pending)
+        num_settled = len(pending.rstrip(_FORMATTING_CHARS_STR))
+        self._pending = [pending[num_settled:]]
+        self._num_pending -= num_settled
+        self._next_check = self._num_pending + self.check_interval
+        if num_settled == 0:
+            return False
+
+        text = self._window_tail + remove_formatting_runs(pending[:num_settled], self.exclude_length)
+        self._cleaned_parts.append(text[len(self._window_tail) :])
+        self._window_tail = text[max(len(text) - self.min_chars + 1, 0) :]
+        hashes = _hash_windows(text, self.min_chars).tolist()
+        self._window_counts.update(hashes)
+        if len(hashes) == 0 or max(map(self._window_counts.__getitem__, hashes)) < self.min_repetition:
+            return False
+
+        # * the hashes may collide, the occurrences of the windows are counted to be sure
+        for start, hash_val in enumerate(hashes):
+            if (
+                self._window_counts[hash_val] >= self.min_repetition
+                and self._count_occurrences(text[start : start + self.min_chars]) >= self.min_repetition
+            ):
+                self.is_repetitive = True
+                return True
+        return False
+
+    def _count_occurrences(self, window: str) -> int:
+        text = "".join(self._cleaned_parts)
+        self._cleaned_parts = [text]
+        count = 0
+        start = text.find(window)
+        while start != -1 and count < self.min_repetition:
+            count += 1
+            start = text.find(window, start + 1)
+        return count
+
+
+def remove_formatting_runs(text: str, exclude_length: int = 3) -> str:
+    """
+    Remove the table rules and the runs of `exclude_length` or more formatting characters, e.g. "====" or "    ",
+    which `detect_repeat` does not count as repetitions.
+    """
+    # * the passes are applied in order, as removing the runs of a character may join those of a later one, and
+    # * those which would change nothing are skipped by a substring search
+    if "|-" in text:
+        text = _TABLE_RULE_PATTERN.sub("|", text)
+    for char in _FORMATTING_CHARS:
+        if char * exclude_length in text:
+            text = re.sub(rf"{re.escape(char)}{{{exclude_length},}}", "", text)
+    return text
+
+
+def _check_repeat_args(min_chars: int, min_repetition: int) -> None:
     if min_chars <= 0:
         err_msg = f"`min_chars` should be greater than 0, but got {min_chars}."
         raise ValueError(err_msg)
@@ -178,28 +452,74 @@ def detect_repeat(text: str, min_chars: int = 50, min_repetition: int = 10, excl
         err_msg = f"`min_repetition` should be greater than 1, but got {min_repetition}."
         raise ValueError(err_msg)
 
-    def conditional_replace(content: str, char: str, max_length: int = 80) -> str:
-        pattern = rf"{re.escape(char)}{{{max_length},}}"
-        return re.sub(pattern, "", content)
-
-    # Clean up the text by removing formatting patterns
-    text = re.sub(r"\|[-]+\|", "|", text)
-    for ch in ["=", "|", "-", "~", "_", "#", "*", ".", "%", "－", "█", " ", "─"]:
-        text = conditional_replace(text, ch, max_length=exclude_length)
-
-    # Use character-based sliding window instead of tokens
-    times: dict[int, int] = {}
-    for i in range(min_chars, len(text) + 1):
-        sub = text[i - min_chars : i]
-        hash_val = hash(sub)
-        if hash_val in times:
-            times[hash_val] += 1
-            if times[hash_val] >= min_repetition:
-                return True
-        else:
-            times[hash_val] = 1
 
-    return False
+def _hash_windows(text: str, window: int) -> np.ndarray:
+    """
+    Get the polynomial hash of each window of `window` characters, modulo 2 ** 64.
+    """
+    codes = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype="<u4").astype(np.uint64)
+    powers = np.full(len(codes), _HASH_BASE, dtype=np.uint64)
+    powers[0] = 1
+    np.cumprod(powers, out=powers)
+    inverse_powers = np.full(len(codes), _HASH_BASE_INVERSE, dtype=np.uint64)
+    inverse_powers[0] = 1
+    np.cumprod(inverse_powers, out=inverse_powers)
+
+    # * the hash of the window at i is sum(codes[j] * base ** (i + window - 1 - j)) over the window, which is
+    # * the difference of two prefix sums of codes[j] * base ** -j, scaled back by base ** (i + window - 1)
+    prefix_sums = np.zeros(len(codes) + 1, dtype=np.uint64)
+    np.cumsum(codes * inverse_powers, out=prefix_sums[1:])
+    return (prefix_sums[window:] - prefix_sums[:-window]) * powers[window - 1 :]
+
+
+def _shift_right(mask: np.ndarray, fill: bool = False) -> np.ndarray:
+    """
+    Get whether the element before each is set, `fill` for the first one.
+    """
+    return np.concatenate(([fill], mask[:-1]))
+
+
+def _shift_left(mask: np.ndarray, fill: bool = False) -> np.ndarray:
+    """
+    Get whether the element after each is set, `fill` for the last one.
+    """
+    return np.concatenate((mask[1:], [fill]))
+
+
+def _find_ascii_words(codes: np.ndarray) -> np.ndarray:
+    """
+    Get the start of each match of `\\b[a-zA-Z]{2,}\\b` in the text of the codepoints `codes`.
+
+    A match is a run of two or more ASCII letters between two characters which are not word characters like `\\w`,
+    e.g. "abc" is no word in "abc1" or "abc中文".
+    """
+    lowered_codes = codes | 0x20
+    is_letter = (lowered_codes >= ord("a")) & (lowered_codes <= ord("z"))
+    starts = np.flatnonzero(is_letter & ~_shift_right(is_letter))
+    ends = np.flatnonzero(is_letter & ~_shift_left(is_letter)) + 1
+    is_long = ends - starts >= 2
+    starts = starts[is_long]
+    ends = ends[is_long]
+
+    # * the bounds of the text are no word characters
+    is_word = np.ones(len(starts), dtype=bool)
+    is_word[starts > 0] &= ~_is_word_char(codes, starts[starts > 0] - 1)
+    is_word[ends < len(codes)] &= ~_is_word_char(codes, ends[ends < len(codes)])
+    return starts[is_word]
+
+
+def _is_word_char(codes: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """
+    Get whether each codepoint at `positions` is a word character like `\\w`, alphanumeric or "_".
+    """
+    position_codes = codes[positions]
+    results = _ASCII_WORD_CHAR_TABLE.take(position_codes, mode="clip")
+    non_ascii = np.flatnonzero(position_codes >= len(_ASCII_WORD_CHAR_TABLE) - 1)
+    if len(non_ascii) > 0:
+        # * e.g. the CJK characters around the words, usually a few distinct ones
+        non_ascii_codes, inverse = np.unique(position_codes[non_ascii], return_inverse=True)
+        results[non_ascii] = np.array([chr(code).isalnum() for code in non_ascii_codes.tolist()], dtype=bool)[inverse]
+    return results
 
 
 def protect_template(template: str, allowed: Optional[Sequence[str]] = ("question", "predict", "label")) -> str:
@@ -51,16 +51,15 @@ _VERIFIER_REGISTRY: dict[str, type[Verifier]] = {
     "osworld": FileBasedVerifier,
     "webvoyager": FileBasedVerifier,
 }
-_VERIFIER_INSTANCE_REGISTRY: dict[str, Verifier] = {}
+# * keyed on the datasource, the verifier type and the identity of the config, the config is kept alongside the verifier
+# * so that its identity is not reused, and the reward systems with different configs do not share verifiers
+_VERIFIER_INSTANCE_REGISTRY: dict[tuple[str, str, int], tuple[VerifierConfig, Verifier]] = {}
 
 
 _logger = get_logger(__name__)
 
 
-def get_verifier_from_config(config: VerifierConfig, datasource: str) -> Verifier:
-    """
-    Factory function to get an instance of a verifier.
-    """
+def _get_verifier_type(config: VerifierConfig) -> str:
     verifier_type = get_struct_tag(config)
     if verifier_type is None:
         err_msg = f"Failed to guess the verifier type from the config: {ensure_text(msgspec.json.encode(config))}."
@@ -70,9 +69,23 @@ def get_verifier_from_config(config: VerifierConfig, datasource: str) -> Verifie
     if verifier_type not in _VERIFIER_REGISTRY:
         err_msg = f"Verifier '{verifier_type}' is not supported."
         raise ValueError(err_msg)
+    return verifier_type
 
+
+def get_verifier_instance_key(config: VerifierConfig, datasource: str) -> str:
+    """
+    Get the key of the verifier instance shared by the datasource, in the form of `datasource@verifier_type`.
+    """
+    return f"{datasource}@{_get_verifier_type(config)}"
+
+
+def get_verifier_from_config(config: VerifierConfig, datasource: str) -> Verifier:
+    """
+    Factory function to get an instance of a verifier.
+    """
+    verifier_type = _get_verifier_type(config)
     verifier_cls = _VERIFIER_REGISTRY[verifier_type]
-    verifier_instance_key = f"{datasource}@{verifier_type}"
+    verifier_instance_key = (datasource, verifier_type, id(config))
 
     if verifier_instance_key not in _VERIFIER_INSTANCE_REGISTRY:
         if verifier_cls == FileBasedVerifier:
@@ -90,7 +103,7 @@ def get_verifier_from_config(config: VerifierConfig, datasource: str) -> Verifie
                     config_dict[key] = value
                 except Exception:
                     _logger.debug("Configuration field `%s` is missing, will use the default value.", key)
-            _VERIFIER_INSTANCE_REGISTRY[verifier_instance_key] = verifier_cls(config_dict)
+            _VERIFIER_INSTANCE_REGISTRY[verifier_instance_key] = (config, verifier_cls(config_dict))
         else:
             kwargs: dict[str, Any] = {}
             for key in inspect.signature(verifier_cls.__init__).parameters:
@@ -102,5 +115,5 @@ def get_verifier_from_config(config: VerifierConfig, datasource: str) -> Verifie
                     _logger.debug("Configuration field `%s` is missing, will use the default value.", key)
                 else:
                     kwargs[key] = value
-            _VERIFIER_INSTANCE_REGISTRY[verifier_instance_key] = verifier_cls(**kwargs)
-    return _VERIFIER_INSTANCE_REGISTRY[verifier_instance_key]
+            _VERIFIER_INSTANCE_REGISTRY[verifier_instance_key] = (config, verifier_cls(**kwargs))
+    return _VERIFIER_INSTANCE_REGISTRY[verifier_instance_key][1]
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 
 
+import asyncio
+import contextvars
+import functools
 from abc import ABC, abstractmethod
+from concurrent.futures import Executor
 from typing import Any, Optional
 
 
@@ -50,6 +54,37 @@ class Verifier(ABC):
         """
         pass
 
+    async def ajudge(
+        self,
+        extracted_answer: Any,
+        ground_truth: Any,
+        question: Optional[str] = None,
+        image_file: Optional[str] = None,
+        executor: Optional[Executor] = None,
+    ) -> float:
+        """
+        Awaitable version of `judge`.
+
+        The default implementation runs the blocking `judge` (rule matching and the LLM-judge HTTP calls)
+        in `executor`, so the event loop is never blocked. Verifiers with a native coroutine judge can override it.
+
+        Args:
+            extracted_answer (Any): The answer extracted from the model's response.
+            ground_truth (Any): The answer extracted from the ground truth response.
+            question (Optional[str]): The question/prompt, for context.
+            image_file (Optional[str]): Path to the image, if relevant for judging.
+            executor (Optional[Executor]): The executor to run `judge` in, the loop's default executor if None.
+
+        Returns:
+            float: The same score as `judge`.
+        """
+        loop = asyncio.get_running_loop()
+        judge_fn = functools.partial(
+            self.judge, extracted_answer, ground_truth, question=question, image_file=image_file
+        )
+        # * runs in a copy of the current context like `asyncio.to_thread`, e.g. to keep the metrics scope
+        return await loop.run_in_executor(executor, contextvars.copy_context().run, judge_fn)
+
     @property
     def min_reward(self) -> float:
         return 0.0
@@ -6,6 +6,7 @@ from typing import Any, Optional, cast
 
 from glmv_reward.utils.llm import post_query_llm
 from glmv_reward.utils.logging import get_logger
+from glmv_reward.utils.metrics import timed_stage
 from glmv_reward.utils.text import find_boxed_content, protect_template
 
 from ._base_verifier import Verifier
@@ -118,8 +119,9 @@ class ChartVerifier(Verifier):
         try:
             from sympy import Basic, sympify
 
-            extract_answer_number = cast(Basic, sympify(extracted_answer, strict=True))
-            extract_gt_answer_number = cast(Basic, sympify(ground_truth, strict=True))
+            with timed_stage("sympy"):
+                extract_answer_number = cast(Basic, sympify(extracted_answer, strict=True))
+                extract_gt_answer_number = cast(Basic, sympify(ground_truth, strict=True))
         except Exception:
             _logger.debug("Failed to convert the answer to a numeric value. Skip number match.")
         else:
@@ -2,10 +2,11 @@
 
 
 import re
-from typing import Any, Optional, cast
+from typing import Any, Optional
 
 from glmv_reward.utils.llm import post_query_llm
 from glmv_reward.utils.logging import get_logger
+from glmv_reward.utils.response import parse_response
 from glmv_reward.utils.text import find_boxed_content, protect_template
 
 from ._base_verifier import Verifier
@@ -36,25 +37,14 @@ class CountingVerifier(Verifier):
         self.llm_temperature = llm_temperature
         self.llm_top_p = llm_top_p
 
-        self.think_answer_pattern = re.compile(r"^<think>(.*?)</think>(.*)$", re.DOTALL | re.IGNORECASE)
-
     def extract_answer(self, response: str, question: Optional[str] = None) -> Any:
         del question
-        match = self.think_answer_pattern.search(response)
-        answer_content_to_check = None
-
-        if match:
-            think_part = cast(str, match.group(1)).strip()
-            answer_part = cast(str, match.group(2)).strip()
+        parsed = parse_response(response)
+        answer_content_to_check = parsed.text_after_think
 
-            # Basic validation against nested tags
-            avoid_tags = ["<think>", "</think>", "<answer>", "</answer>"]
-            if any(tag.lower() in think_part.lower() for tag in avoid_tags) or any(
-                tag.lower() in answer_part.lower() for tag in avoid_tags
-            ):
-                return None
-
-            answer_content_to_check = answer_part
+        # Basic validation against nested tags
+        if parsed.think_has_answer_tags or parsed.text_after_think_has_tags:
+            return None
 
         if answer_content_to_check is None or len(answer_content_to_check) == 0:
             return None
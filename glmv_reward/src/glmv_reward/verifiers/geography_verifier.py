@@ -4,9 +4,9 @@
 import re
 from typing import Any, Optional, cast
 
-from glmv_reward.utils.llm import post_query_llm
+from glmv_reward.utils.ensemble import get_ensemble_members, judge_with_ensemble
 from glmv_reward.utils.logging import get_logger
-from glmv_reward.utils.misc import ensure_list
+from glmv_reward.utils.metrics import timed_stage
 from glmv_reward.utils.text import protect_template
 
 from .math_verifier import MathVerifier
@@ -81,8 +81,9 @@ class GeographyVerifier(MathVerifier):
         try:
             from sympy import Basic, sympify
 
-            extract_answer_number = cast(Basic, sympify(extracted_answer, strict=True))
-            extract_gt_answer_number = cast(Basic, sympify(ground_truth, strict=True))
+            with timed_stage("sympy"):
+                extract_answer_number = cast(Basic, sympify(extracted_answer, strict=True))
+                extract_gt_answer_number = cast(Basic, sympify(ground_truth, strict=True))
         except Exception:
             _logger.debug("Failed to convert the answer to a numeric value. Skip number match.")
         else:
@@ -128,36 +129,16 @@ class GeographyVerifier(MathVerifier):
             _logger.warning("[LLM Verifier] Prompt formatting failed: %s. Template: '%s'.", repr(e), verifier_template)
             return self.min_reward
 
-        api_key_lst: list[str] = ensure_list(self.llm_api_key)
-        reward_url_lst: list[str] = ensure_list(self.llm_judge_url)
-        model_lst = ["glm-4-flash"] * len(api_key_lst)
-        if self.llm_model is not None:
-            model_lst = ensure_list(self.llm_model)
-
-        reward_score = 0.0
-        for api_key, reward_url, model in zip(api_key_lst, reward_url_lst, model_lst, strict=True):
-            response_json = post_query_llm(
-                prompt,
-                api_key,
-                url=reward_url,
-                model=model,
-                image_file=image_file,
-                max_tokens=self.llm_max_tokens,
-                temperature=self.llm_temperature,
-                top_p=self.llm_top_p,
-            )
-
+        def parse_score(response_json: str) -> Optional[float]:
             content = None
             if response_json:
                 content = response_json.strip()
                 if "1.0" in content:
-                    reward_score += 1.0
-                    continue
+                    return 1.0
                 if "0.0" in content:
-                    continue
+                    return 0.0
                 try:
-                    reward_score += float(content)
-                    continue
+                    return float(content)
                 except ValueError:
                     pass
 
@@ -168,6 +149,15 @@ class GeographyVerifier(MathVerifier):
                 ground_truth,
                 response_json,
             )
-
-        # at least > half of the reward_url_list return 1.0
-        return float(reward_score > len(reward_url_lst) / 2)
+            return None
+
+        # at least > half of the judges return 1.0, the judges are queried concurrently
+        return judge_with_ensemble(
+            prompt,
+            get_ensemble_members(self.llm_api_key, self.llm_judge_url, self.llm_model),
+            parse_score,
+            image_file=image_file,
+            max_tokens=self.llm_max_tokens,
+            temperature=self.llm_temperature,
+            top_p=self.llm_top_p,
+        )
@@ -4,11 +4,11 @@
 import json
 import re
 from collections.abc import Sequence
-from typing import Any, Optional, Union, cast
+from typing import Any, Optional, Union
 
-from glmv_reward.utils.llm import post_query_llm
+from glmv_reward.utils.ensemble import get_ensemble_members, judge_with_ensemble
 from glmv_reward.utils.logging import get_logger
-from glmv_reward.utils.misc import ensure_list
+from glmv_reward.utils.response import parse_response
 from glmv_reward.utils.text import find_boxed_content, protect_template
 
 from ._base_verifier import Verifier
@@ -36,23 +36,11 @@ class GeoQuestVerifier(Verifier):
         self.llm_temperature = llm_temperature
         self.llm_top_p = llm_top_p
         self.strict_boxed = strict_boxed_extraction
-        self.think_answer_pattern = re.compile(r"^<think>(.*?)</think>(.*)$", re.DOTALL | re.IGNORECASE)
 
     def extract_answer(self, response: str, question: Optional[str] = None) -> Any:
         del question
-        match = self.think_answer_pattern.search(response)
-        answer_content_to_check = None
-
-        if match:
-            think_part = cast(str, match.group(1)).strip()
-            answer_part = cast(str, match.group(2)).strip()
-
-            # Basic validation against nested tags
-            avoid_tags = ["<think>", "</think>"]
-            if any(tag.lower() in think_part.lower() for tag in avoid_tags):
-                return None
-
-            answer_content_to_check = answer_part
+        # * None if a think tag is nested in the think part
+        answer_content_to_check = parse_response(response).text_after_think
 
         if answer_content_to_check is None or len(answer_content_to_check) == 0:
             return None
@@ -123,27 +111,7 @@ class GeoQuestVerifier(Verifier):
             )
             return 0.0
 
-        api_key_lst: list[str] = ensure_list(self.llm_api_key)
-        reward_url_lst: list[str] = ensure_list(self.llm_judge_url)
-        model_lst = ["glm-4-flash"] * len(api_key_lst)
-        if self.llm_model is not None:
-            model_lst = ensure_list(self.llm_model)
-
-        if len(reward_url_lst) == 0:
-            err_msg = "Empty llm_judge_url"
-            raise ValueError(err_msg)
-        reward_score = 0.0
-        for api_key, reward_url, model in zip(api_key_lst, reward_url_lst, model_lst, strict=True):
-            response_text = post_query_llm(
-                prompt,
-                api_key,
-                url=reward_url,
-                model=model,
-                image_file=image_file,
-                max_tokens=self.llm_max_tokens,
-                temperature=self.llm_temperature,
-                top_p=self.llm_top_p,
-            )
+        def parse_score(response_text: str) -> Optional[float]:
             # Initialize content with a default value to avoid referencing it later
             if response_text and type(response_text) is str:
                 verifier_think_pattern = re.compile(r"<think>.*?</think>\s*", re.DOTALL | re.IGNORECASE)
@@ -161,11 +129,7 @@ class GeoQuestVerifier(Verifier):
                     except Exception:
                         _logger.exception("Error: Could not parse response as JSON: %s", response_text)
                         judge_score = 0.0
-                try:
-                    reward_score += judge_score
-                    continue
-                except ValueError:
-                    pass
+                return judge_score
 
             _logger.warning(
                 "%s: LLM fallback judge failed or gave unexpected response for ('%s', '%s'). Raw response: %s",
@@ -174,6 +138,16 @@ class GeoQuestVerifier(Verifier):
                 ground_truth,
                 response_text,
             )
+            return None
 
         # average reward score
-        return reward_score / len(reward_url_lst)
+        return judge_with_ensemble(
+            prompt,
+            get_ensemble_members(self.llm_api_key, self.llm_judge_url, self.llm_model),
+            parse_score,
+            reduce="mean",
+            image_file=image_file,
+            max_tokens=self.llm_max_tokens,
+            temperature=self.llm_temperature,
+            top_p=self.llm_top_p,
+        )
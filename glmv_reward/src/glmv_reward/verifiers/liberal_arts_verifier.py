@@ -3,9 +3,8 @@
 
 from typing import Any, Optional
 
-from glmv_reward.utils.llm import post_query_llm
+from glmv_reward.utils.ensemble import get_ensemble_members, judge_with_ensemble
 from glmv_reward.utils.logging import get_logger
-from glmv_reward.utils.misc import ensure_list
 from glmv_reward.utils.text import protect_template
 
 from .math_verifier import MathVerifier
@@ -106,36 +105,16 @@ class LiberalArtsVerifier(MathVerifier):
             _logger.warning("[LLM Verifier] Prompt formatting failed: %s. Template: '%s'.", repr(e), verifier_template)
             return self.min_reward
 
-        api_key_lst: list[str] = ensure_list(self.llm_api_key)
-        reward_url_lst: list[str] = ensure_list(self.llm_judge_url)
-        model_lst = ["glm-4-flash"] * len(api_key_lst)
-        if self.llm_model is not None:
-            model_lst = ensure_list(self.llm_model)
-
-        reward_score = 0.0
-        for api_key, reward_url, model in zip(api_key_lst, reward_url_lst, model_lst, strict=True):
-            response_json = post_query_llm(
-                prompt,
-                api_key,
-                url=reward_url,
-                model=model,
-                image_file=image_file,
-                max_tokens=self.llm_max_tokens,
-                temperature=self.llm_temperature,
-                top_p=self.llm_top_p,
-            )
-
+        def parse_score(response_json: str) -> Optional[float]:
             content = None
             if response_json:
                 content = response_json.strip()
                 if "1.0" in content:
-                    reward_score += 1.0
-                    continue
+                    return 1.0
                 if "0.0" in content:
-                    continue
+                    return 0.0
                 try:
-                    reward_score += float(content)
-                    continue
+                    return float(content)
                 except ValueError:
                     pass
 
@@ -146,6 +125,15 @@ class LiberalArtsVerifier(MathVerifier):
                 ground_truth,
                 response_json,
             )
-
-        # at least > half of the reward_url_list return 1.0
-        return float(reward_score > len(reward_url_lst) / 2)
+            return None
+
+        # at least > half of the judges return 1.0, the judges are queried concurrently
+        return judge_with_ensemble(
+            prompt,
+            get_ensemble_members(self.llm_api_key, self.llm_judge_url, self.llm_model),
+            parse_score,
+            image_file=image_file,
+            max_tokens=self.llm_max_tokens,
+            temperature=self.llm_temperature,
+            top_p=self.llm_top_p,
+        )
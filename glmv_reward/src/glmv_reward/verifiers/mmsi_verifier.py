@@ -1,11 +1,12 @@
 # -*- coding: utf-8 -*-
 
 
-import re
 from typing import Any, Optional, cast
 
 from glmv_reward.utils.llm import post_query_llm
 from glmv_reward.utils.logging import get_logger
+from glmv_reward.utils.metrics import timed_stage
+from glmv_reward.utils.response import parse_response
 from glmv_reward.utils.text import find_boxed_content, protect_template
 
 from ._base_verifier import Verifier
@@ -40,24 +41,12 @@ class MmsiVerifier(Verifier):
         self.llm_temperature = llm_temperature
         self.llm_top_p = llm_top_p
 
-        self.think_answer_pattern = re.compile(r"^<think>(.*?)</think>(.*)$", re.DOTALL | re.IGNORECASE)
-
     def extract_answer(self, response: str, question: Optional[str] = None) -> Optional[str]:
         del question
 
-        match = self.think_answer_pattern.search(response)
-        answer_content_to_check = None
-
-        if match:
-            think_part = cast(str, match.group(1)).strip()
-            answer_part = cast(str, match.group(2)).strip()
-            # Basic validation against nested tags
-            avoid_tags = ["<think>", "</think>"]
-            if any(tag.lower() in think_part.lower() for tag in avoid_tags):
-                return None
-            answer_content_to_check = answer_part
-        else:
-            # If no think/answer tag, directly return None
+        answer_content_to_check = parse_response(response).text_after_think
+        if answer_content_to_check is None:
+            # If no think/answer tag, or a think tag is nested in the think part, directly return None
             return None
 
         if answer_content_to_check is not None:
@@ -119,8 +108,9 @@ class MmsiVerifier(Verifier):
             # Attempt to parse with sympy
             # Add local symbols if necessary, e.g. for physics/math common symbols
             # local_dict = {"pi": sympy.pi, "e": sympy.E}
-            parsed_answer = cast(Basic, sympify(extracted_answer, strict=True))  # , locals=local_dict)
-            parsed_gt = cast(Basic, sympify(ground_truth, strict=True))  # , locals=local_dict)
+            with timed_stage("sympy"):
+                parsed_answer = cast(Basic, sympify(extracted_answer, strict=True))  # , locals=local_dict)
+                parsed_gt = cast(Basic, sympify(ground_truth, strict=True))  # , locals=local_dict)
 
         except Exception:
             # TODO(Logging): These `print` statements are temporary.  Once a project-wide
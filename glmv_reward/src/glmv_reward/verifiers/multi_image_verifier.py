@@ -1,11 +1,12 @@
 # -*- coding: utf-8 -*-
 
 
-import re
 from typing import Any, Optional, cast
 
 from glmv_reward.utils.llm import post_query_llm
 from glmv_reward.utils.logging import get_logger
+from glmv_reward.utils.metrics import timed_stage
+from glmv_reward.utils.response import parse_response
 from glmv_reward.utils.text import find_boxed_content, protect_template
 
 from ._base_verifier import Verifier
@@ -39,23 +40,10 @@ class MultiImageVerifier(Verifier):
         self.llm_temperature = llm_temperature
         self.llm_top_p = llm_top_p
 
-        self.think_answer_pattern = re.compile(r"^<think>(.*?)</think>(.*)$", re.DOTALL | re.IGNORECASE)
-
     def extract_answer(self, response: str, question: Optional[str] = None) -> Any:
         del question
-        match = self.think_answer_pattern.search(response)
-        answer_content_to_check = None
-
-        if match:
-            think_part = cast(str, match.group(1)).strip()
-            answer_part = cast(str, match.group(2)).strip()
-
-            # Basic validation against nested tags
-            avoid_tags = ["<think>", "</think>"]
-            if any(tag.lower() in think_part.lower() for tag in avoid_tags):
-                return None
-
-            answer_content_to_check = answer_part
+        # * None if a think tag is nested in the think part
+        answer_content_to_check = parse_response(response).text_after_think
 
         if answer_content_to_check is None or len(answer_content_to_check) == 0:
             return None
@@ -96,8 +84,9 @@ class MultiImageVerifier(Verifier):
         try:
             from sympy import Basic, sympify
 
-            extract_answer_number = cast(Basic, sympify(extracted_answer, strict=True))
-            extract_gt_answer_number = cast(Basic, sympify(ground_truth, strict=True))
+            with timed_stage("sympy"):
+                extract_answer_number = cast(Basic, sympify(extracted_answer, strict=True))
+                extract_gt_answer_number = cast(Basic, sympify(ground_truth, strict=True))
         except Exception:
             _logger.debug("Failed to convert the answer to a numeric value. Skip number match.")
         else:
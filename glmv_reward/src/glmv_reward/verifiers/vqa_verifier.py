@@ -1,13 +1,12 @@
 # -*- coding: utf-8 -*-
 
 
-import re
 from collections.abc import Sequence
-from typing import Any, Optional, Union, cast
+from typing import Any, Optional, Union
 
-from glmv_reward.utils.llm import post_query_llm
+from glmv_reward.utils.ensemble import get_ensemble_members, judge_with_ensemble
 from glmv_reward.utils.logging import get_logger
-from glmv_reward.utils.misc import ensure_list
+from glmv_reward.utils.response import parse_response
 from glmv_reward.utils.text import find_boxed_content, protect_template
 
 from ._base_verifier import Verifier
@@ -30,10 +29,6 @@ class VQAVerifier(Verifier):
     ) -> None:
         # assert "llm_judge_url" in self.config, "llm_judge_url is required for VQAVerifier"
 
-        self.think_answer_pattern = re.compile(
-            r"^<think>(.*?)</think>\s*<answer>(.*?)</answer>$", re.DOTALL | re.IGNORECASE
-        )
-
         self.strict_boxed = strict_boxed_extraction
         self.enable_llm_judge_fallback = enable_llm_judge_fallback
         self.llm_api_key = llm_api_key
@@ -47,21 +42,8 @@ class VQAVerifier(Verifier):
     def extract_answer(self, response: str, question: Optional[str] = None) -> Any:
         del question
 
-        match = self.think_answer_pattern.search(response)
-        answer_content_to_check = None
-
-        if match:
-            think_part = cast(str, match.group(1)).strip()
-            answer_part = cast(str, match.group(2)).strip()
-
-            # Basic validation against nested tags
-            avoid_tags = ["<think>", "</think>", "<answer>", "</answer>"]
-            if any(tag.lower() in think_part.lower() for tag in avoid_tags) or any(
-                tag.lower() in answer_part.lower() for tag in avoid_tags
-            ):
-                return None
-
-            answer_content_to_check = answer_part
+        # * parsed once with the format check, nested tags are rejected
+        answer_content_to_check = parse_response(response).answer
 
         if answer_content_to_check is None or len(answer_content_to_check) == 0:
             return None
@@ -141,37 +123,17 @@ class VQAVerifier(Verifier):
             print(f"[LLM Verifier] Prompt formatting failed: {e}. Template: '{verifier_template}'")
             return self.min_reward
 
-        api_key_lst: list[str] = ensure_list(self.llm_api_key)
-        reward_url_lst: list[str] = ensure_list(self.llm_judge_url)
-        model_lst = ["glm-4-flash"] * len(api_key_lst)
-        if self.llm_model is not None:
-            model_lst = ensure_list(self.llm_model)
-
-        reward_score = 0.0
-        for api_key, reward_url, model in zip(api_key_lst, reward_url_lst, model_lst, strict=True):
-            response_json = post_query_llm(
-                prompt,
-                api_key,
-                url=reward_url,
-                model=model,
-                image_file=image_file,
-                max_tokens=self.llm_max_tokens,
-                temperature=self.llm_temperature,
-                top_p=self.llm_top_p,
-            )
-
+        def parse_score(response_json: str) -> Optional[float]:
             # Initialize content with a default value to avoid referencing it later
             content = None
             if response_json:
                 content = response_json.strip()
                 if "1.0" in content:
-                    reward_score += 1.0
-                    continue
+                    return 1.0
                 if "0.0" in content:
-                    continue
+                    return 0.0
                 try:
-                    reward_score += float(content)  # LLM directly returns a number
-                    continue
+                    return float(content)  # LLM directly returns a number
                 except ValueError:
                     pass
 
@@ -182,6 +144,15 @@ class VQAVerifier(Verifier):
                 ground_truth,
                 response_json,
             )
+            return None
 
-        # at least > half of the reward_url_list return 1.0
-        return float(reward_score > len(reward_url_lst) / 2)
+        # at least > half of the judges return 1.0, the judges are queried concurrently
+        return judge_with_ensemble(
+            prompt,
+            get_ensemble_members(self.llm_api_key, self.llm_judge_url, self.llm_model),
+            parse_score,
+            image_file=image_file,
+            max_tokens=self.llm_max_tokens,
+            temperature=self.llm_temperature,
+            top_p=self.llm_top_p,
+        )
@@ -0,0 +1,91 @@
+import json
+
+import msgspec
+import pytest
+import requests
+
+from glmv_reward.configs import RewardSystemConfig
+from glmv_reward.utils import llm
+from glmv_reward.utils.serialization import load_yaml
+
+
+def chat_completion(content):
+    return {"choices": [{"message": {"content": content}}]}
+
+
+class FakeResponse:
+    """A response of the LLM judge with the JSON `data`."""
+
+    def __init__(self, data, status_code=200):
+        self._data = data
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = {}
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error", response=self)
+
+    def json(self):
+        return self._data
+
+
+class FakeJudge:
+    """
+    The LLM judge behind `requests.Session.post`, see the `fake_judge` fixture.
+
+    Each request is recorded as its URL and decoded payload, and answered by `reply(url, payload)`, which returns
+    the content of a chat completion, the JSON data of the response or the status code of a failed response, "1.0"
+    by default. It may also block or raise.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.reply = lambda url, payload: "1.0"
+
+    @property
+    def payloads(self):
+        return [payload for _, payload in self.requests]
+
+    def post(self, url, data=None, **kwargs):
+        payload = json.loads(data) if data is not None else None
+        self.requests.append((url, payload))
+        reply = self.reply(url, payload)
+        if isinstance(reply, int):
+            return FakeResponse(None, status_code=reply)
+        return FakeResponse(chat_completion(reply) if isinstance(reply, str) else reply)
+
+
+@pytest.fixture
+def fake_judge(monkeypatch):
+    judge = FakeJudge()
+    monkeypatch.setattr(llm.requests.Session, "post", lambda session, url, **kwargs: judge.post(url, **kwargs))
+    return judge
+
+
+@pytest.fixture
+def llm_client_options():
+    """Set the options of the LLM clients over the ones of the open reward systems, the default ones are restored."""
+    yield lambda **kwargs: llm.configure_llm_clients(llm.LLMClientOptions(**kwargs))
+    llm.configure_llm_clients(llm.LLMClientOptions())
+
+
+@pytest.fixture(scope="session")
+def math_response():
+    """Make a well-formatted response with the boxed answer."""
+
+    def make_math_response(answer):
+        return f"<think>Let me compute it.</think><answer><|begin_of_box|>{answer}<|end_of_box|></answer>"
+
+    return make_math_response
+
+
+@pytest.fixture(scope="session")
+def load_config():
+    """Load the full config with the fields in the keyword arguments replaced."""
+
+    def load_full_config(**kwargs):
+        reward_config = msgspec.convert(load_yaml("configs/full_config.yaml"), RewardSystemConfig)
+        return msgspec.structs.replace(reward_config, **kwargs)
+
+    return load_full_config
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def math_reward_inputs(math_response):
+    return {
+        "prompts": ["What is 3/2?"] * 4,
+        "answers": [
+            math_response("1.5"),
+            math_response("1.5"),
+            "<think>Two boxes.</think><answer><|begin_of_box|>1<|end_of_box|><|begin_of_box|>2<|end_of_box|></answer>",
+            "1.5",
+        ],
+        "gt_answers": [math_response("1.5")] * 4,
+        "datasources": ["math"] * 4,
+    }
+
+
+def test_aget_reward_matches_get_reward(reward_system_instance, math_reward_inputs):
+    expected = reward_system_instance.get_reward(**math_reward_inputs, return_extracted_answers=True)
+    actual = asyncio.run(reward_system_instance.aget_reward(**math_reward_inputs, return_extracted_answers=True))
+
+    assert actual == expected
+    assert actual[0] == [1.0, 1.0, 0.0, 0.0]
+
+
+def test_aget_reward_across_event_loops(reward_system_instance, math_reward_inputs):
+    # the concurrency limit is bound per event loop, so repeated `asyncio.run` calls must keep working
+    for _ in range(2):
+        assert asyncio.run(reward_system_instance.aget_reward(**math_reward_inputs)) == [1.0, 1.0, 0.0, 0.0]
+
+
+def test_ajudge_matches_judge(math_verifier):
+    assert asyncio.run(math_verifier.ajudge("(x+1)**2", "x**2 + 2*x + 1")) == math_verifier.judge(
+        "(x+1)**2", "x**2 + 2*x + 1"
+    )
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from glmv_reward.reward_system import RewardSystem
+from glmv_reward.verifiers import Verifier
+
+
+class _LengthBatchVerifier(Verifier):
+    def __init__(self):
+        self.batch_sizes = []
+
+    def extract_answer(self, response, question=None):
+        return response
+
+    def judge(self, prompts, answers, gt_answers, image_files):
+        self.batch_sizes.append(len(answers))
+        return [float(len(answer)) for answer in answers]
+
+    @property
+    def is_batch_verifier(self):
+        return True
+
+
+@pytest.fixture
+def uncached_reward_system(load_config):
+    with RewardSystem(load_config(verdict_cache_size=0)) as reward_system:
+        yield reward_system
+
+
+def _count_llm_calls_of_single_item(reward_system, fake_judge, math_response):
+    reward_system.get_reward(
+        prompts=["What is 3/2?"],
+        answers=[math_response("3/2")],
+        gt_answers=[math_response("1.5")],
+        datasources=["math"],
+    )
+    num_llm_calls = len(fake_judge.requests)
+    fake_judge.requests.clear()
+    return num_llm_calls
+
+
+def test_duplicated_items_are_judged_once(uncached_reward_system, fake_judge, math_response):
+    num_llm_calls = _count_llm_calls_of_single_item(uncached_reward_system, fake_judge, math_response)
+
+    # the last answer is a different response with the same extracted answer
+    answers = [math_response("3/2")] * 3 + [math_response("2"), math_response(" 3/2")]
+    rewards, extracted_ans, _ = uncached_reward_system.get_reward(
+        prompts=["What is 3/2?"] * 5,
+        answers=answers,
+        gt_answers=[math_response("1.5")] * 5,
+        datasources=["math"] * 5,
+        return_extracted_answers=True,
+    )
+
+    assert rewards == [1.0] * 5
+    assert extracted_ans == ["3/2", "3/2", "3/2", "2", "3/2"]
+    assert len(fake_judge.requests) == 2 * num_llm_calls
+
+
+def test_duplicated_items_are_judged_once_async(uncached_reward_system, fake_judge, math_response):
+    num_llm_calls = _count_llm_calls_of_single_item(uncached_reward_system, fake_judge, math_response)
+
+    rewards = asyncio.run(
+        uncached_reward_system.aget_reward(
+            prompts=["What is 3/2?"] * 4,
+            answers=[math_response("3/2")] * 2 + [math_response(" 3/2")] * 2,
+            gt_answers=[math_response("1.5")] * 4,
+            datasources=["math"] * 4,
+        )
+    )
+
+    assert rewards == [1.0] * 4
+    assert len(fake_judge.requests) == num_llm_calls
+
+
+def test_duplicated_items_of_batch_verifier(uncached_reward_system, monkeypatch):
+    verifier = _LengthBatchVerifier()
+    monkeypatch.setattr(uncached_reward_system, "get_verifier_from_datasource", lambda datasource: verifier)
+
+    rewards = uncached_reward_system.get_reward(
+        prompts=["prompt"] * 4, answers=["a", "bb", "a", "bb"], gt_answers=["gt"] * 4, datasources=["general"] * 4
+    )
+
+    assert rewards == [1.0, 2.0, 1.0, 2.0]
+    assert verifier.batch_sizes == [2]
+
+
+@pytest.mark.parametrize("llm_judge_scheduling", ["two_phase", "pipelined"])
+def test_llm_judges_are_sent_after_rule_based_judging(
+    fake_judge, math_response, load_config, monkeypatch, llm_judge_scheduling
+):
+    reward_config = load_config(verdict_cache_size=0, num_cpu_workers=2, llm_judge_scheduling=llm_judge_scheduling)
+    events = []
+    with RewardSystem(reward_config) as reward_system:
+        prejudge_single_item = reward_system._prejudge_single_item
+
+        def recording_prejudge(*args, **kwargs):
+            result = prejudge_single_item(*args, **kwargs)
+            events.append("prejudge")
+            return result
+
+        def recording_reply(url, payload):
+            events.append("llm")
+            return "1.0"
+
+        monkeypatch.setattr(reward_system, "_prejudge_single_item", recording_prejudge)
+        fake_judge.reply = recording_reply
+        rewards = reward_system.get_reward(
+            prompts=["What is the fraction?"] * 8,
+            answers=[math_response(f"{n}/2") for n in range(1, 5)] + [math_response(f"{n}.5") for n in range(4)],
+            gt_answers=[math_response(f"{n}.5") for n in range(4)] * 2,
+            datasources=["math"] * 8,
+        )
+
+    assert rewards == [1.0] * 8
+    assert events.count("prejudge") == 8
+    if llm_judge_scheduling == "two_phase":
+        assert events.index("llm") == 8
@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from glmv_reward.reward_system import RewardSystem
+from glmv_reward.utils.llm import LLMCallDeferred, defer_llm_calls, post_query_llm
+
+
+def test_defer_llm_calls():
+    with defer_llm_calls(), pytest.raises(LLMCallDeferred):
+        post_query_llm("prompt", "api_key")
+
+
+def test_llm_judge_runs_in_io_pool(fake_judge, math_response):
+    request_threads = []
+
+    def recording_reply(url, payload):
+        request_threads.append(threading.current_thread().name)
+        return "1.0"
+
+    fake_judge.reply = recording_reply
+
+    with RewardSystem("configs/full_config.yaml") as reward_system:
+        rewards = reward_system.get_reward(
+            prompts=["What is 3/2?"] * 2,
+            answers=[math_response("3/2"), math_response("1.5")],
+            gt_answers=[math_response("1.5")] * 2,
+            datasources=["math"] * 2,
+        )
+        executor_stats = reward_system.get_executor_stats()
+
+    assert rewards == [1.0, 1.0]
+    # the exact match is judged by rules only, the other item is handed over to the I/O pool
+    assert request_threads == ["glmv_reward_io_0"]
+    assert executor_stats["cpu"].completed == 2
+    assert executor_stats["io"].completed == 1
+    assert executor_stats["io"].queued == executor_stats["io"].running == 0
+
+
+def test_closed_reward_system_rejects_items(math_response):
+    reward_system = RewardSystem("configs/full_config.yaml")
+    reward_system.close()
+    with pytest.raises(RuntimeError):
+        reward_system.get_reward(
+            prompts=["What is 3/2?"],
+            answers=[math_response("1.5")],
+            gt_answers=[math_response("1.5")],
+            datasources=["math"],
+        )
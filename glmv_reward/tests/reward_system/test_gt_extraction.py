@@ -0,0 +1,60 @@
+import pytest
+
+from glmv_reward.reward_system import RewardSystem
+
+
+def _gt_response(answer):
+    return f"<think>Reference.</think><answer><|begin_of_box|>{answer}<|end_of_box|></answer>"
+
+
+@pytest.fixture
+def gt_extractions(monkeypatch):
+    reward_system = RewardSystem("configs/full_config.yaml")
+    verifier = reward_system.get_verifier_from_datasource("math")
+    extract_answer = verifier.extract_answer
+    extracted_responses = []
+
+    def counting_extract_answer(response, question=None):
+        extracted_responses.append(response)
+        return extract_answer(response, question=question)
+
+    monkeypatch.setattr(verifier, "extract_answer", counting_extract_answer)
+    with reward_system:
+        yield reward_system, extracted_responses
+
+
+def test_gt_is_extracted_once_per_prompt(gt_extractions, math_response):
+    reward_system, extracted_responses = gt_extractions
+    gt_answer = _gt_response("2")
+
+    for _ in range(2):
+        rewards = reward_system.get_reward(
+            prompts=["What is 1+1?"] * 3,
+            answers=[math_response("2"), math_response("3"), "bad format"],
+            gt_answers=[gt_answer] * 3,
+            datasources=["math"] * 3,
+        )
+        assert rewards == [1.0, 0.0, 0.0]
+
+    assert extracted_responses.count(gt_answer) == 1
+
+
+def test_pre_extracted_gt_skips_extraction(gt_extractions, math_response):
+    reward_system, extracted_responses = gt_extractions
+    gt_answers = [_gt_response("2"), "bad format"]
+    extracted_gt_answers = reward_system.extract_gt_answers(gt_answers, ["math"] * 2, prompts=["What is 1+1?"] * 2)
+    assert extracted_gt_answers == ["2", None]
+    extracted_responses.clear()
+
+    rewards, _, extracted_gt = reward_system.get_reward(
+        prompts=["What is 1+1?"] * 2,
+        answers=[math_response("2")] * 2,
+        gt_answers=gt_answers,
+        datasources=["math"] * 2,
+        return_extracted_answers=True,
+        extracted_gt_answers=extracted_gt_answers,
+    )
+
+    assert rewards == [1.0, 0.0]
+    assert extracted_gt == ["2", None]
+    assert not any(response in gt_answers for response in extracted_responses)
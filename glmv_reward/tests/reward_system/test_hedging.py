@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from glmv_reward.reward_system import RewardSystem
+from glmv_reward.utils import replica_pool
+from glmv_reward.utils.hedging import (
+    HedgingOptions,
+    HedgingPolicy,
+    configure_hedging,
+    get_hedging_policy,
+    get_hedging_stats,
+)
+from glmv_reward.utils.llm import post_query_llm
+from glmv_reward.utils.replica_pool import ReplicaPool, configure_replica_pools
+
+
+@pytest.fixture
+def released():
+    released = threading.Event()
+    yield released
+    released.set()
+    configure_hedging(None)
+    configure_replica_pools({})
+
+
+def test_delay_follows_recent_latencies():
+    policy = HedgingPolicy(HedgingOptions(percentile=50, min_samples=3, min_delay=0.02))
+    assert policy.stats()["delay"] is None
+
+    for latency in [0.01, 0.05, 0.03]:
+        policy.run(lambda latency=latency: time.sleep(latency))
+    assert 0.03 <= policy.stats()["delay"] < 0.05
+
+
+def test_hedges_stay_within_budget(released):
+    policy = HedgingPolicy(HedgingOptions(budget=0.0, min_samples=1))
+    policy.run(lambda: None)
+
+    thread = threading.Timer(0.2, released.set)
+    thread.start()
+    started_at = time.perf_counter()
+    assert policy.run(lambda: released.wait(5)) is True
+    # no duplicate was sent, the request took as long as its only attempt
+    assert time.perf_counter() - started_at >= 0.2
+    assert policy.stats()["hedges"] == 0
+
+
+def test_slow_request_is_hedged_to_another_replica(fake_judge, monkeypatch, released):
+    def reply(url, payload):
+        # the second request is stuck
+        if len(fake_judge.requests) == 2:
+            released.wait(5)
+        return "1.0"
+
+    fake_judge.reply = reply
+    monkeypatch.setattr(replica_pool.random, "shuffle", lambda candidates: None)
+    configure_replica_pools({"http://judge/": ReplicaPool(["http://a/", "http://b/"])})
+    configure_hedging(HedgingOptions(percentile=50, budget=1.0, min_delay=0.05, min_samples=1))
+
+    assert post_query_llm("prompt", "key", url="http://judge/") == "1.0"
+    started_at = time.perf_counter()
+    assert post_query_llm("another prompt", "key", url="http://judge/") == "1.0"
+
+    assert time.perf_counter() - started_at < 2
+    assert [url for url, _ in fake_judge.requests] == ["http://a/", "http://a/", "http://b/"]
+    stats = get_hedging_stats()["http://judge/"]
+    assert (stats["requests"], stats["hedges"], stats["hedge_wins"]) == (2, 1, 1)
+
+
+def test_reward_systems_keep_the_hedging_of_each_other(load_config):
+    with RewardSystem(load_config(enable_llm_hedging=True, llm_hedge_percentile=90.0)):
+        policy = get_hedging_policy("http://judge/")
+        assert policy is not None
+
+        # neither a reward system without hedging nor one with other options replaces it
+        with RewardSystem(load_config(enable_llm_hedging=False)):
+            assert get_hedging_policy("http://judge/") is policy
+        with RewardSystem(load_config(enable_llm_hedging=True, llm_hedge_percentile=50.0)):
+            assert get_hedging_policy("http://judge/") is policy
+        assert get_hedging_policy("http://judge/") is policy
+        assert policy.options.percentile == 90.0
+    assert get_hedging_policy("http://judge/") is None
@@ -0,0 +1,116 @@
+import multiprocessing
+
+import pytest
+
+from glmv_reward.reward_system import RewardSystem
+from glmv_reward.utils import judge_cache as judge_cache_module
+from glmv_reward.utils.judge_cache import JudgeCache, configure_judge_cache, get_judge_cache, make_judge_cache_key
+from glmv_reward.utils.llm import LLMCallDeferred, defer_llm_calls, post_query_llm
+
+
+@pytest.fixture
+def judge_requests(fake_judge):
+    yield fake_judge.requests
+    configure_judge_cache(None)
+
+
+def _put_in_process(path, key, response):
+    cache = JudgeCache(path)
+    cache.put(key, response)
+    cache.close()
+
+
+def test_cache_key_covers_model_and_sampling_params():
+    key = make_judge_cache_key("prompt", "glm-4-flash", 10, 0.1, 1.0)
+    assert key == make_judge_cache_key("prompt", "glm-4-flash", 10, 0.1, 1.0)
+    assert key != make_judge_cache_key("prompt", "glm-4-plus", 10, 0.1, 1.0)
+    assert key != make_judge_cache_key("prompt", "glm-4-flash", 10, 0.7, 1.0)
+    assert key != make_judge_cache_key("another prompt", "glm-4-flash", 10, 0.1, 1.0)
+
+
+def test_post_query_llm_reuses_cached_responses(tmp_path, judge_requests):
+    cache = JudgeCache(tmp_path / "judge.sqlite")
+    configure_judge_cache(cache)
+
+    assert post_query_llm("prompt", "key", url="http://judge/") == "1.0"
+    assert post_query_llm("prompt", "key", url="http://judge/") == "1.0"
+    assert post_query_llm("prompt", "key", url="http://judge/", temperature=0.7) == "1.0"
+    assert len(judge_requests) == 2
+
+    # a cached response is returned without being deferred, a missing one is deferred without counting a miss
+    with defer_llm_calls():
+        assert post_query_llm("prompt", "key", url="http://judge/") == "1.0"
+        with pytest.raises(LLMCallDeferred):
+            post_query_llm("another prompt", "key", url="http://judge/")
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.size) == (2, 2, 2)
+    assert stats.hit_rate == 0.5
+
+
+def test_cache_is_shared_across_processes(tmp_path):
+    path = tmp_path / "judge.sqlite"
+    cache = JudgeCache(path)
+    key = make_judge_cache_key("prompt", "glm-4-flash", 10, 0.1, 1.0)
+
+    process = multiprocessing.get_context("spawn").Process(target=_put_in_process, args=(path, key, "0.0"))
+    process.start()
+    process.join()
+
+    assert process.exitcode == 0
+    assert cache.get(key) == "0.0"
+
+
+def test_cache_eviction(tmp_path, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(judge_cache_module.time, "time", lambda: now)
+    cache = JudgeCache(tmp_path / "judge.sqlite", ttl=60, max_entries=2)
+
+    for index in range(3):
+        cache.put(str(index).encode(), str(index))
+        now += 1
+    cache.prune()
+    # the oldest response is deleted beyond `max_entries`
+    assert [cache.get(str(index).encode()) for index in range(3)] == [None, "1", "2"]
+
+    now += 59
+    # the response of key "1" is older than 60 seconds
+    assert cache.get(b"1") is None
+    assert cache.get(b"2") == "2"
+    cache.prune()
+    assert cache.stats().size == 1
+
+
+def test_read_only_cache(tmp_path):
+    path = tmp_path / "judge.sqlite"
+    cache = JudgeCache(path)
+    cache.put(b"key", "1.0")
+
+    read_only_cache = JudgeCache(path, read_only=True)
+    read_only_cache.put(b"another_key", "0.0")
+    assert read_only_cache.get(b"key") == "1.0"
+    assert read_only_cache.get(b"another_key") is None
+    assert cache.stats().size == 1
+
+    # a missing database only misses
+    assert JudgeCache(tmp_path / "missing.sqlite", read_only=True).get(b"key") is None
+    assert not (tmp_path / "missing.sqlite").exists()
+
+
+def test_reward_systems_keep_the_cache_of_each_other(tmp_path, load_config):
+    path = tmp_path / "judge.sqlite"
+    with RewardSystem(load_config(llm_cache_path=str(path))) as reward_system:
+        judge_cache = get_judge_cache()
+        assert judge_cache is not None
+        assert reward_system.get_judge_cache_stats() is not None
+
+        # neither a reward system without a cache nor one with another cache replaces it
+        with RewardSystem(load_config()) as uncached_reward_system:
+            assert get_judge_cache() is judge_cache
+        assert get_judge_cache() is judge_cache
+        with RewardSystem(load_config(llm_cache_path=str(tmp_path / "another.sqlite"))) as another_reward_system:
+            assert get_judge_cache() is judge_cache
+            assert another_reward_system.get_judge_cache_stats() is None
+        assert get_judge_cache() is judge_cache
+        assert uncached_reward_system.get_judge_cache_stats() is None
+    assert get_judge_cache() is None
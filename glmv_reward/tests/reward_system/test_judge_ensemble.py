@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from glmv_reward.utils.ensemble import (
+    get_endpoint_stats,
+    get_ensemble_members,
+    judge_with_ensemble,
+    reset_endpoint_stats,
+)
+from glmv_reward.utils.llm import LLMCallDeferred, defer_llm_calls
+from glmv_reward.verifiers import MathVerifier
+
+_TEMPLATE = "Question: {question}\nResponse: {predict}\nGround Truth: {label}"
+
+
+@pytest.fixture
+def endpoints(fake_judge):
+    """Endpoints named by their reply and latency, e.g. http://1.0-0.5/ replies 1.0 after 0.5 seconds."""
+    released = threading.Event()
+
+    def reply_after_latency(url, payload):
+        reply, latency = url.removeprefix("http://").rstrip("/").split("-")
+        released.wait(float(latency))
+        return reply
+
+    fake_judge.reply = reply_after_latency
+    reset_endpoint_stats()
+    yield
+    released.set()
+    reset_endpoint_stats()
+
+
+def _parse_score(response):
+    return float(response) if response else None
+
+
+def test_ensemble_returns_on_early_majority(endpoints):
+    members = get_ensemble_members(["key"] * 3, ["http://1.0-0/", "http://1.0-0/", "http://0.0-5/"])
+
+    started_at = time.perf_counter()
+    verdict = judge_with_ensemble("prompt", members, _parse_score)
+
+    assert verdict == 1.0
+    assert time.perf_counter() - started_at < 2
+    stats = get_endpoint_stats()
+    assert stats["http://1.0-0/@glm-4-flash"]["requests"] == 2
+    assert stats["http://1.0-0/@glm-4-flash"]["agreements"] == 2
+    # the slow endpoint has not replied yet
+    assert stats.get("http://0.0-5/@glm-4-flash", {}).get("requests", 0) == 0
+
+
+def test_ensemble_majority_and_mean(endpoints):
+    members = get_ensemble_members(["key"] * 3, ["http://0.0-0/", "http://1.0-0.1/", "http://0.0-0.2/"])
+    assert judge_with_ensemble("prompt", members, _parse_score) == 0.0
+
+    members = get_ensemble_members(["key"] * 2, ["http://0.5-0/", "http://1.0-0/"])
+    assert judge_with_ensemble("prompt", members, _parse_score, reduce="mean") == 0.75
+
+    stats = get_endpoint_stats()
+    assert stats["http://0.0-0/@glm-4-flash"]["agreements"] == 1
+    assert stats["http://0.0-0/@glm-4-flash"]["latency"]["count"] == 1
+
+
+def test_failed_members_vote_against(endpoints):
+    # the score of "boom" fails to parse
+    members = get_ensemble_members(["key"] * 3, ["http://boom-0/", "http://1.0-0/", "http://1.0-0.1/"])
+    assert judge_with_ensemble("prompt", members, _parse_score) == 1.0
+
+    members = get_ensemble_members(["key"] * 3, ["http://boom-0/", "http://1.0-0/", "http://0.0-0.1/"])
+    assert judge_with_ensemble("prompt", members, _parse_score) == 0.0
+
+    stats = get_endpoint_stats()
+    assert stats["http://boom-0/@glm-4-flash"]["requests"] == 2
+    assert stats["http://boom-0/@glm-4-flash"]["failures"] == 2
+    # the votes of the other members are still recorded
+    assert stats["http://1.0-0.1/@glm-4-flash"]["agreements"] == 1
+    assert stats["http://0.0-0.1/@glm-4-flash"]["agreements"] == 1
+
+
+def test_scores_are_clipped(endpoints):
+    members = get_ensemble_members(["key"] * 3, ["http://5.0-0/", "http://0.0-0/", "http://0.0-0.1/"])
+    assert judge_with_ensemble("prompt", members, _parse_score) == 0.0
+    assert judge_with_ensemble("prompt", members, _parse_score, reduce="mean") == pytest.approx(1 / 3)
+
+
+def test_ensemble_is_deferred(endpoints):
+    members = get_ensemble_members(["key"] * 3, ["http://1.0-0/"] * 3)
+    with defer_llm_calls(), pytest.raises(LLMCallDeferred):
+        judge_with_ensemble("prompt", members, _parse_score)
+
+
+def test_verifier_judges_with_ensemble(endpoints):
+    verifier = MathVerifier(
+        llm_api_key=["key"] * 3,
+        llm_judge_url=["http://1.0-0/", "http://0.0-5/", "http://1.0-0/"],
+        llm_model=["a", "b", "c"],
+        llm_judge_prompt_template=_TEMPLATE,
+    )
+
+    started_at = time.perf_counter()
+    assert verifier.judge("x", "y", question="What is it?") == 1.0
+    assert time.perf_counter() - started_at < 2
@@ -0,0 +1,102 @@
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from glmv_reward.reward_system import RewardSystem
+from glmv_reward.utils.llm import post_query_llm
+from glmv_reward.utils.llm_batch import (
+    BatchingOptions,
+    JudgeBatcher,
+    configure_judge_batcher,
+    get_judge_batcher,
+    pack_judge_prompts,
+    unpack_judge_responses,
+)
+
+
+@pytest.fixture
+def judge_endpoint(fake_judge):
+    """A judge which echoes its prompts, the packed replies are broken if `broken` is set."""
+    endpoint = {"requests": fake_judge.requests, "broken": False}
+
+    def echo(url, payload):
+        if url.endswith("/chat/completions") and "### Task 1" in payload["messages"][0]["content"]:
+            tasks = re.split(r"### Task \d+\n", payload["messages"][0]["content"])[1:]
+            content = (
+                "not a JSON array" if endpoint["broken"] else json.dumps([f"echo {task.strip()}" for task in tasks])
+            )
+            return f"```json\n{content}\n```"
+        if url.endswith("/chat/completions"):
+            return f"echo {payload['messages'][0]['content']}"
+        choices = [{"index": index, "text": f"echo {prompt}"} for index, prompt in enumerate(payload["prompt"])]
+        return {"choices": choices[::-1]}
+
+    fake_judge.reply = echo
+    yield endpoint
+    configure_judge_batcher(None)
+
+
+def _query_concurrently(prompts):
+    with ThreadPoolExecutor(len(prompts)) as pool:
+        return list(
+            pool.map(lambda prompt: post_query_llm(prompt, "key", url="http://judge/v1/chat/completions"), prompts)
+        )
+
+
+def test_unpack_judge_responses():
+    packed_prompt = pack_judge_prompts(["first", "second"])
+    assert "### Task 1\nfirst" in packed_prompt
+    assert "### Task 2\nsecond" in packed_prompt
+
+    assert unpack_judge_responses('```json\n["1.0", 0.0]\n```', 2) == ["1.0", "0.0"]
+    assert unpack_judge_responses('["\\boxed{Correct}", ""]', 2) == ["\\boxed{Correct}", None]
+    assert unpack_judge_responses('["1.0"]', 2) is None
+    assert unpack_judge_responses("1.0, 0.0", 2) is None
+
+
+def test_packed_batches(judge_endpoint):
+    configure_judge_batcher(JudgeBatcher(BatchingOptions(batch_size=4, flush_latency=5)))
+
+    prompts = [f"prompt {index}" for index in range(4)]
+    assert _query_concurrently(prompts) == [f"echo {prompt}" for prompt in prompts]
+    assert len(judge_endpoint["requests"]) == 1
+
+
+def test_multi_prompt_batches(judge_endpoint):
+    configure_judge_batcher(JudgeBatcher(BatchingOptions(mode="multi_prompt", batch_size=3, flush_latency=5)))
+
+    prompts = [f"prompt {index}" for index in range(3)]
+    assert _query_concurrently(prompts) == [f"echo {prompt}" for prompt in prompts]
+    assert [url for url, _ in judge_endpoint["requests"]] == ["http://judge/v1/completions"]
+    assert sorted(judge_endpoint["requests"][0][1]["prompt"]) == prompts
+
+
+def test_prompts_are_sent_alone_if_the_batch_fails(judge_endpoint):
+    judge_endpoint["broken"] = True
+    configure_judge_batcher(JudgeBatcher(BatchingOptions(batch_size=3, flush_latency=5)))
+
+    prompts = [f"prompt {index}" for index in range(3)]
+    assert _query_concurrently(prompts) == [f"echo {prompt}" for prompt in prompts]
+    # the broken batch, then each prompt by itself
+    assert len(judge_endpoint["requests"]) == 4
+
+    # a prompt without company is sent by itself after the flush latency
+    configure_judge_batcher(JudgeBatcher(BatchingOptions(batch_size=3, flush_latency=0.01)))
+    assert post_query_llm("lonely prompt", "key", url="http://judge/v1/chat/completions") == "echo lonely prompt"
+    assert len(judge_endpoint["requests"]) == 5
+
+
+def test_reward_systems_keep_the_batcher_of_each_other(load_config):
+    with RewardSystem(load_config(enable_llm_batching=True, llm_batch_size=4)):
+        judge_batcher = get_judge_batcher()
+        assert judge_batcher is not None
+
+        # neither a reward system without batching nor one with another batcher replaces it
+        with RewardSystem(load_config(enable_llm_batching=False)):
+            assert get_judge_batcher() is judge_batcher
+        with RewardSystem(load_config(enable_llm_batching=True, llm_batch_size=8)):
+            assert get_judge_batcher() is judge_batcher
+        assert get_judge_batcher() is judge_batcher
+    assert get_judge_batcher() is None
@@ -0,0 +1,214 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from glmv_reward.reward_system import RewardSystem
+from glmv_reward.utils import llm
+from glmv_reward.utils.llm import (
+    LLMClient,
+    LLMClientOptions,
+    LLMThrottledError,
+    configure_llm_clients,
+    get_llm_client,
+    post_query_llm,
+    record_llm_failures,
+)
+from glmv_reward.utils.rate_limit import AdaptiveConcurrencyLimiter, TokenBucket
+
+
+class _JudgeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        server.client_ports.add(self.client_address[1])
+        server.authorizations.append(self.headers["Authorization"])
+        json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        status, body, *headers = server.responses.pop(0) if server.responses else (200, "1.0")
+        data = json.dumps({"choices": [{"message": {"content": body}}]}).encode()
+        self.send_response(status)
+        for name, value in (headers[0] if headers else {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def judge_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _JudgeHandler)
+    server.client_ports = set()
+    server.authorizations = []
+    server.responses = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _get_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+
+def test_clients_are_shared_and_keep_connections_alive(judge_server):
+    url = _get_url(judge_server)
+    assert get_llm_client(url, "key") is get_llm_client(url, "key")
+    assert get_llm_client(url, "key") is not get_llm_client(url, "another_key")
+
+    for _ in range(5):
+        assert post_query_llm("prompt", "key", url=url) == "1.0"
+
+    assert judge_server.authorizations == ["Bearer key"] * 5
+    # all requests are sent through the same connection
+    assert len(judge_server.client_ports) == 1
+
+
+def test_client_retries_rate_limited_and_failed_requests(judge_server):
+    judge_server.responses = [(429, ""), (503, "")]
+    client = LLMClient(_get_url(judge_server), "key", LLMClientOptions(backoff_base=0.001))
+
+    response = client.post({"messages": []})
+
+    assert response["choices"][0]["message"]["content"] == "1.0"
+    assert len(judge_server.authorizations) == 3
+
+
+def test_client_gives_up_after_max_retries(judge_server):
+    judge_server.responses = [(500, "")] * 3
+    client = LLMClient(_get_url(judge_server), "key", LLMClientOptions(max_retries=1, backoff_base=0.001))
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.post({"messages": []})
+    assert len(judge_server.authorizations) == 2
+
+
+def test_configure_llm_clients_replaces_clients(judge_server):
+    url = _get_url(judge_server)
+    client = get_llm_client(url, "key")
+
+    configure_llm_clients(LLMClientOptions(read_timeout=5.0))
+    try:
+        new_client = get_llm_client(url, "key")
+        assert new_client is not client
+        assert new_client.options.read_timeout == 5.0
+    finally:
+        configure_llm_clients(LLMClientOptions())
+
+
+def test_reward_systems_keep_the_llm_clients_of_each_other(load_config, llm_client_options, monkeypatch):
+    monkeypatch.setattr(llm, "_installed_llm_client_options", None)
+    with RewardSystem(load_config(llm_read_timeout=7.0)):
+        client = get_llm_client("http://judge/", "key")
+        assert client.options.read_timeout == 7.0
+
+        # neither a reward system with other options nor one with equal options replaces the clients
+        with RewardSystem(load_config(llm_read_timeout=9.0)):
+            assert get_llm_client("http://judge/", "key") is client
+        with RewardSystem(load_config(llm_read_timeout=7.0)):
+            assert get_llm_client("http://judge/", "key") is client
+        assert get_llm_client("http://judge/", "key") is client
+
+    # the clients are kept until other options are set
+    assert get_llm_client("http://judge/", "key") is client
+    with RewardSystem(load_config(llm_read_timeout=9.0)):
+        assert get_llm_client("http://judge/", "key").options.read_timeout == 9.0
+
+
+def test_identical_concurrent_requests_are_coalesced(fake_judge):
+    released = threading.Event()
+
+    def reply(url, payload):
+        released.wait(5)
+        return "1.0"
+
+    fake_judge.reply = reply
+    with ThreadPoolExecutor(10) as pool:
+        futures = [pool.submit(post_query_llm, "prompt", "key", url="http://judge/") for _ in range(6)]
+        futures.append(pool.submit(post_query_llm, "another prompt", "key", url="http://judge/"))
+        futures.append(pool.submit(post_query_llm, "prompt", "key", url="http://another_judge/"))
+        # neither are the requests with another API key or timeout
+        futures.append(pool.submit(post_query_llm, "prompt", "another_key", url="http://judge/"))
+        futures.append(pool.submit(post_query_llm, "prompt", "key", url="http://judge/", timeout=5.0))
+        time.sleep(0.2)
+        released.set()
+        assert [future.result() for future in futures] == ["1.0"] * 10
+
+    assert len(fake_judge.requests) == 5
+    # the requests sent after the shared one completes are not coalesced
+    assert post_query_llm("prompt", "key", url="http://judge/") == "1.0"
+    assert len(fake_judge.requests) == 6
+
+
+def test_client_respects_retry_after(judge_server):
+    judge_server.responses = [(429, "", {"Retry-After": "0.3"})]
+    client = LLMClient(_get_url(judge_server), "key", LLMClientOptions(backoff_base=0.001))
+
+    started_at = time.perf_counter()
+    assert client.post({"messages": []})["choices"][0]["message"]["content"] == "1.0"
+    assert time.perf_counter() - started_at >= 0.3
+    # the throttled request halves the concurrency limit
+    assert client.concurrency_limiter.limit == 64
+
+
+def test_throttled_requests_have_their_own_retries(judge_server):
+    judge_server.responses = [(429, "")] * 5
+    client = LLMClient(_get_url(judge_server), "key", LLMClientOptions(max_retries=1, backoff_base=0.001))
+
+    assert client.post({"messages": []})["choices"][0]["message"]["content"] == "1.0"
+    assert len(judge_server.authorizations) == 6
+
+
+def test_post_query_llm_raises_when_throttled_beyond_the_retries(judge_server):
+    judge_server.responses = [(429, "")] * 5
+    url = _get_url(judge_server)
+    configure_llm_clients(LLMClientOptions(max_throttled_retries=2, backoff_base=0.001))
+    try:
+        # an overloaded judge is not mistaken for a wrong answer, which returns an empty response
+        with pytest.raises(LLMThrottledError):
+            post_query_llm("prompt", "key", url=url)
+        assert len(judge_server.authorizations) == 3
+
+        # the other failed requests return an empty response, and are recorded
+        judge_server.responses = [(500, "")] * 5
+        with record_llm_failures() as llm_failures:
+            assert post_query_llm("prompt", "key", url=url) == ""
+        assert len(llm_failures) == 1
+    finally:
+        configure_llm_clients(LLMClientOptions())
+
+
+def test_rate_limit_and_concurrency_limit():
+    bucket = TokenBucket(rate=20, burst=2)
+    started_at = time.perf_counter()
+    for _ in range(6):
+        bucket.acquire()
+    # 2 tokens at once, then 4 at 20 per second
+    assert 0.15 <= time.perf_counter() - started_at < 1
+
+    limiter = AdaptiveConcurrencyLimiter(4, min_limit=1, latency_threshold=1.0)
+    for _ in range(4):
+        limiter.acquire()
+    assert limiter.inflight == 4
+    limiter.release(0.1, overloaded=True)
+    assert limiter.limit == 2
+    limiter.release(0.1, overloaded=False)
+    limiter.release(2.0, overloaded=False)
+    limiter.release(0.1, overloaded=False)
+    assert limiter.inflight == 0
+    # the slow request does not decrease the limit again within the same round trip,
+    # and the limit grows back by 1 per round of successful requests
+    assert limiter.limit == 2
+    limiter.acquire()
+    limiter.release(0.1, overloaded=False)
+    assert limiter.limit == 3
@@ -0,0 +1,74 @@
+import gzip
+import json
+
+import pytest
+
+from glmv_reward.utils.log_writer import JsonlLogWriter
+
+
+def _read_jsonl(path):
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_appended_to_every_path(tmp_path):
+    log_writer = JsonlLogWriter()
+    for index in range(3):
+        log_writer.write([tmp_path / "all.jsonl", tmp_path / f"{index % 2}.jsonl"], {"index": index, "text": "答案"})
+    log_writer.close()
+
+    assert _read_jsonl(tmp_path / "all.jsonl") == [{"index": index, "text": "答案"} for index in range(3)]
+    assert [record["index"] for record in _read_jsonl(tmp_path / "0.jsonl")] == [0, 2]
+    assert [record["index"] for record in _read_jsonl(tmp_path / "1.jsonl")] == [1]
+
+
+def test_gzip_logs_are_rotated(tmp_path):
+    log_writer = JsonlLogWriter(max_bytes=20, compression="gzip")
+    for index in range(4):
+        log_writer.write([tmp_path / "rollout.jsonl"], {"index": index})
+        log_writer.flush()
+    log_writer.close()
+
+    # each record has 12 bytes, the files are rotated after two records
+    assert [record["index"] for record in _read_jsonl(tmp_path / "rollout.1.jsonl.gz")] == [0, 1]
+    assert [record["index"] for record in _read_jsonl(tmp_path / "rollout.2.jsonl.gz")] == [2, 3]
+    assert not (tmp_path / "rollout.jsonl.gz").exists()
+
+
+def test_records_are_dropped_when_the_queue_is_full(tmp_path):
+    log_writer = JsonlLogWriter(max_queue_size=1, overflow="drop")
+    results = [log_writer.write([tmp_path / "rollout.jsonl"], {"index": index}) for index in range(1000)]
+    log_writer.close()
+
+    assert log_writer.num_dropped == results.count(False)
+    assert len(_read_jsonl(tmp_path / "rollout.jsonl")) == results.count(True)
+
+
+def test_writer_survives_a_broken_stream(tmp_path):
+    log_writer = JsonlLogWriter()
+    path = tmp_path / "rollout.jsonl"
+    log_writer.write([path], {"index": 0})
+    log_writer.flush()
+    # the writer is idle after a flush, the stream is closed behind its back and the next write fails
+    log_writer._files[path].stream.close()
+    log_writer.write([path], {"index": 1})
+    log_writer.flush()
+    log_writer.write([path], {"index": 2})
+    log_writer.close()
+
+    assert [record["index"] for record in _read_jsonl(path)] == [0, 2]
+
+
+def test_flush_returns_after_the_writer_stops(tmp_path, monkeypatch):
+    def fail(self, items):
+        raise RuntimeError("unexpected")
+
+    monkeypatch.setattr(JsonlLogWriter, "_write_items", fail)
+    log_writer = JsonlLogWriter()
+    log_writer.write([tmp_path / "rollout.jsonl"], {"index": 0})
+    log_writer.flush()
+
+    with pytest.raises(RuntimeError, match="closed"):
+        log_writer.write([tmp_path / "rollout.jsonl"], {"index": 1})
+    log_writer.close()
@@ -0,0 +1,116 @@
+import asyncio
+import functools
+
+import msgspec
+import pytest
+import requests
+
+from glmv_reward.reward_system import RewardSystem
+from glmv_reward.utils.metrics import HistogramState
+
+
+@pytest.fixture
+def load_metrics_config(load_config):
+    return functools.partial(load_config, enable_metrics=True, verdict_cache_size=0)
+
+
+@pytest.fixture
+def reward_kwargs(math_response):
+    return {
+        "prompts": ["What is 3/2?"] * 3,
+        "answers": [math_response("1.5"), math_response("3/2"), "bad format"],
+        "gt_answers": [math_response("1.5")] * 3,
+        "datasources": ["math"] * 3,
+    }
+
+
+def test_histogram_percentiles():
+    histogram = HistogramState()
+    for seconds in [0.001] * 98 + [1.0] * 2:
+        histogram.add(seconds)
+
+    summary = histogram.summary()
+    assert summary["count"] == 100
+    assert summary["min"] == 0.001
+    assert summary["max"] == 1.0
+    assert 0.001 <= summary["p50"] < 0.002
+    assert summary["p99"] == 1.0
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_metrics_are_recorded_per_stage(fake_judge, load_metrics_config, reward_kwargs, tmp_path, use_async):
+    dump_path = tmp_path / "metrics.json"
+
+    with RewardSystem(load_metrics_config(metrics_dump_path=str(dump_path))) as reward_system:
+        if use_async:
+            rewards = asyncio.run(reward_system.aget_reward(**reward_kwargs))
+        else:
+            rewards = reward_system.get_reward(**reward_kwargs)
+        metrics = reward_system.get_metrics()
+
+    assert rewards == [1.0, 1.0, 0.0]
+    stages = metrics["stages"]
+    assert stages["check_answer_format"]["math"]["MathVerifier"]["count"] == 3
+    assert stages["extract_answer"]["math"]["MathVerifier"]["count"] == 2
+    # the rules of the LLM item are checked again when it is handed over to the LLM judge
+    assert stages["sympy"]["math"]["MathVerifier"]["count"] == 2
+    assert stages["llm_judge"]["math"]["MathVerifier"]["count"] == 1
+    assert stages["llm_request"]["math"]["MathVerifier"]["count"] >= 1
+    counters = metrics["counters"]
+    assert counters["min_reward_shortcuts"]["math"]["MathVerifier"] == 1
+    assert counters["llm_fallbacks"]["math"]["MathVerifier"] == 1
+    # the metrics are dumped when the reward system is closed
+    assert msgspec.json.decode(dump_path.read_bytes()) == metrics
+
+
+def test_throttled_llm_requests_are_counted(load_config, math_response, monkeypatch, llm_client_options):
+    throttled_requests = []
+
+    def throttle(session, url, **kwargs):
+        throttled_requests.append(url)
+        response = requests.Response()
+        response.status_code = 429
+        return response
+
+    monkeypatch.setattr(requests.Session, "post", throttle)
+    with RewardSystem(load_config(enable_metrics=True, verdict_cache_size=16)) as reward_system:
+        llm_client_options(max_throttled_retries=1, backoff_base=0.001)
+        rewards = reward_system.get_reward(
+            prompts=["What is 3/2?"],
+            answers=[math_response("3 halves")],
+            gt_answers=[math_response("1.5")],
+            datasources=["math"],
+        )
+        metrics = reward_system.get_metrics()
+        verdict_cache_stats = reward_system.get_verdict_cache_stats()
+
+    assert rewards == [0.0]
+    assert len(throttled_requests) == 2
+    counters = metrics["counters"]
+    assert counters["llm_throttled"]["math"]["MathVerifier"] == 1
+    assert counters["llm_throttled_failures"]["math"]["MathVerifier"] == 1
+    assert counters["exceptions"]["math"]["MathVerifier"] == 1
+    assert "llm_fallbacks" not in counters
+    # unlike a wrong answer, the verdict is not cached, the item is judged again next time
+    assert verdict_cache_stats.size == 0
+
+
+def test_metrics_are_disabled_by_default(fake_judge, reward_kwargs):
+    with RewardSystem("configs/full_config.yaml") as reward_system:
+        reward_system.get_reward(**reward_kwargs)
+        assert reward_system.get_metrics() is None
+
+
+def test_metrics_of_worker_processes(load_metrics_config, math_response):
+    with RewardSystem(load_metrics_config(executor_type="process", num_process_workers=1)) as reward_system:
+        rewards = reward_system.get_reward(
+            prompts=["What is 3/2?"] * 2,
+            answers=[math_response("1.5"), "bad format"],
+            gt_answers=[math_response("1.5")] * 2,
+            datasources=["math"] * 2,
+        )
+        metrics = reward_system.get_metrics()
+
+    assert rewards == [1.0, 0.0]
+    assert metrics["stages"]["judge"]["math"]["MathVerifier"]["count"] == 1
+    assert metrics["counters"]["min_reward_shortcuts"]["math"]["MathVerifier"] == 1
@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+import pytest
+
+from glmv_reward.reward_system import RewardSystem
+from glmv_reward.verifiers import MathVerifier
+
+
+def _boxed_response(answer):
+    return f"<think>Let me think.</think><answer><|begin_of_box|>{answer}<|end_of_box|></answer>"
+
+
+def test_get_reward_mixed_datasources_keeps_order(reward_system_instance):
+    math_inputs = {
+        "prompts": ["What is 3/2?", "What is 3/2?"],
+        "answers": [_boxed_response("1.5"), "1.5"],
+        "gt_answers": [_boxed_response("1.5")] * 2,
+    }
+    mix_inputs = {
+        "prompts": ["Say hi."],
+        "answers": [_boxed_response("hi")],
+        "gt_answers": [_boxed_response("hi")],
+    }
+
+    math_rewards = reward_system_instance.get_reward(**math_inputs, datasources=["math"] * 2)
+    mix_rewards = reward_system_instance.get_reward(**mix_inputs, datasources=["language_mix"])
+
+    # interleave the two datasources
+    mixed_rewards = reward_system_instance.get_reward(
+        prompts=[math_inputs["prompts"][0], mix_inputs["prompts"][0], math_inputs["prompts"][1]],
+        answers=[math_inputs["answers"][0], mix_inputs["answers"][0], math_inputs["answers"][1]],
+        gt_answers=[math_inputs["gt_answers"][0], mix_inputs["gt_answers"][0], math_inputs["gt_answers"][1]],
+        datasources=["math", "language_mix", "math"],
+    )
+
+    assert mixed_rewards == [math_rewards[0], mix_rewards[0], math_rewards[1]]
+
+
+def test_aget_reward_mixed_datasources_matches_get_reward(reward_system_instance):
+    inputs = {
+        "prompts": ["What is 3/2?", "Say hi.", "What is 3/2?"],
+        "answers": [_boxed_response("1.5"), _boxed_response("hi"), "1.5"],
+        "gt_answers": [_boxed_response("1.5"), _boxed_response("hi"), _boxed_response("1.5")],
+        "datasources": ["math", "language_mix", "math"],
+        "return_extracted_answers": True,
+    }
+    assert asyncio.run(reward_system_instance.aget_reward(**inputs)) == reward_system_instance.get_reward(**inputs)
+
+
+def test_get_reward_mismatched_lengths(reward_system_instance):
+    with pytest.raises(ValueError, match="should be the same"):
+        reward_system_instance.get_reward(
+            prompts=["What is 3/2?"] * 2,
+            answers=[_boxed_response("1.5")] * 2,
+            gt_answers=[_boxed_response("1.5")] * 2,
+            datasources=["math"],
+        )
+
+
+def test_get_reward_mixed_datasources_logs_per_datasource(reward_system_instance, tmp_path):
+    reward_system_instance.get_reward(
+        prompts=["What is 3/2?", "Say hi."],
+        answers=[_boxed_response("1.5"), _boxed_response("hi")],
+        gt_answers=[_boxed_response("1.5"), _boxed_response("hi")],
+        datasources=["math", "language_mix"],
+        log_reward_judge=True,
+        save_dir=str(tmp_path),
+    )
+    reward_system_instance.flush_reward_logs()
+
+    for datasource in ["math", "language_mix"]:
+        assert (tmp_path / datasource / "rollout_reward_pass@k.jsonl").read_text().count("\n") == 1
+        assert (tmp_path / datasource / "rollout_reward_correct.jsonl").read_text().count("\n") == 1
+
+
+def test_reward_logs_keep_non_finite_rewards(reward_system_instance, tmp_path, monkeypatch):
+    def judge(self, extracted_answer, ground_truth, *args, **kwargs):
+        return 1.0 if extracted_answer == ground_truth else float("-inf")
+
+    monkeypatch.setattr(MathVerifier, "judge", judge)
+    # * the -inf rewards are logged as they are
+    monkeypatch.setattr(RewardSystem, "_normalize_rewards", staticmethod(list))
+    rewards = reward_system_instance.get_reward(
+        prompts=["What is 7/4?"] * 2,
+        answers=[_boxed_response("1.75"), _boxed_response("-7")],
+        gt_answers=[_boxed_response("1.75")] * 2,
+        datasources=["math"] * 2,
+        log_reward_judge=True,
+        save_dir=str(tmp_path),
+    )
+    reward_system_instance.flush_reward_logs()
+    assert rewards == [1.0, float("-inf")]
+
+    # the lines are written like `json.dumps`, the non-finite rewards are not null
+    pass_at_k_lines = (tmp_path / "math" / "rollout_reward_pass@k.jsonl").read_text().splitlines()
+    records = [json.loads(line) for line in pass_at_k_lines]
+    assert [record["reward"] for record in records] == [1.0, float("-inf")]
+    assert [record["reward_sum_of_this_prompt"] for record in records] == [float("-inf")] * 2
+    assert list(records[1]) == [
+        "current_iteration",
+        "prompt",
+        "image_file",
+        "answer",
+        "gt_answer",
+        "reward",
+        "answer_token_length",
+        "reward_sum_of_this_prompt",
+        "uuid",
+    ]
+
+    (incorrect_line,) = (tmp_path / "math" / "rollout_reward_incorrect.jsonl").read_text().splitlines()
+    assert '"reward":-Infinity' in incorrect_line
+    assert list(json.loads(incorrect_line)) == [
+        "current_iteration",
+        "prompt",
+        "image_file",
+        "answer",
+        "answer_token_length",
+        "gt_answer",
+        "reward",
+        "reward_sum_of_this_prompt",
+        "uuid",
+    ]
@@ -0,0 +1,77 @@
+import msgspec
+import pytest
+import requests
+
+from glmv_reward.configs import RewardSystemConfig
+from glmv_reward.reward_system import RewardSystem
+from glmv_reward.utils.mock_judge_server import CORRECT_REPLY, INCORRECT_REPLY, JudgeRule, MockJudgeServer
+from glmv_reward.utils.serialization import load_yaml
+
+
+def _chat(url, prompt):
+    return requests.post(url, json={"model": "mock", "messages": [{"role": "user", "content": prompt}]}, timeout=5)
+
+
+def _offline_reward_system(judge_url):
+    config_dict = load_yaml("configs/offline_config.yaml")
+    for reward_config in config_dict["reward_configs"].values():
+        if "llm_judge_url" in reward_config:
+            reward_config["llm_judge_url"] = judge_url
+    config = msgspec.convert(config_dict, RewardSystemConfig)
+    return RewardSystem(msgspec.structs.replace(config, verdict_cache_size=0, llm_retry_backoff=0.0))
+
+
+def test_verdicts_follow_the_rules():
+    rules = [JudgeRule(pattern=r"Prediction: 7\b", correct=False), JudgeRule(pattern="Prediction", correct=True)]
+    with MockJudgeServer(rules=rules, default_correct=False) as server:
+        replies = [
+            _chat(server.url, prompt).json()["choices"][0]["message"]["content"]
+            for prompt in ("Prediction: 7", "Prediction: 8", "Nothing")
+        ]
+
+        completions_url = server.url.replace("/chat/completions", "/completions")
+        response = requests.post(completions_url, json={"prompt": ["Prediction: 7", "Prediction: 70"]}, timeout=5)
+        texts = [choice["text"] for choice in response.json()["choices"]]
+        health = requests.get(server.url.replace("/v1/chat/completions", "/health"), timeout=5)
+
+    assert replies == [INCORRECT_REPLY, CORRECT_REPLY, INCORRECT_REPLY]
+    assert texts == [INCORRECT_REPLY, CORRECT_REPLY]
+    assert health.status_code == 200
+
+
+def test_injected_errors_are_reproducible():
+    outcomes = []
+    for _ in range(2):
+        with MockJudgeServer(error_rate=0.2, throttle_rate=0.3, retry_after=2, seed=7) as server:
+            responses = [_chat(server.url, "Prediction: 1") for _ in range(50)]
+            stats = server.stats()
+        outcomes.append([response.status_code for response in responses])
+
+        assert stats == {"requests": 50, "errors": outcomes[-1].count(500), "throttled": outcomes[-1].count(429)}
+        assert stats["errors"] > 0 and stats["throttled"] > 0
+        assert all(response.headers["Retry-After"] == "2" for response in responses if response.status_code == 429)
+
+    assert outcomes[0] == outcomes[1]
+    with pytest.raises(ValueError, match="error_rate"):
+        MockJudgeServer(error_rate=0.6, throttle_rate=0.6)
+
+
+def test_offline_config_judges_with_the_mock(math_response):
+    inputs = {
+        "prompts": ["What is 3/2?", "What is 7/2?", "Name a color."],
+        "answers": [math_response("3/2"), math_response("7/2"), math_response("blue")],
+        "gt_answers": [math_response("1.5"), math_response("3.5"), math_response("red")],
+        "datasources": ["math", "math", "general"],
+    }
+    rules = [JudgeRule(pattern="Prediction: 7/2", correct=False)]
+    with MockJudgeServer(rules=rules, throttle_rate=0.5, seed=0) as server:
+        with _offline_reward_system(server.url) as reward_system:
+            rewards = reward_system.get_reward(**inputs)
+            metrics = reward_system.get_metrics()
+
+    assert rewards == [1.0, 0.0, 1.0]
+    counters = metrics["counters"]
+    assert counters["llm_fallbacks"]["math"]["MathVerifier"] == 2
+    assert counters["llm_fallbacks"]["general"]["GeneralVerifier"] == 1
+    # the throttled requests are retried
+    assert "llm_throttled" in counters
@@ -0,0 +1,142 @@
+import random
+import re
+
+import pytest
+
+from glmv_reward.utils.response import ParsedResponse, parse_response
+
+_THINK_ANSWER_PATTERN = re.compile(r"^<think>(.*?)</think>\s*<answer>(.*?)</answer>$", re.DOTALL | re.IGNORECASE)
+_THINK_PATTERN = re.compile(r"^<think>(.*?)</think>(.*)$", re.DOTALL | re.IGNORECASE)
+_FRAGMENTS = [
+    "<think>",
+    "</think>",
+    "<answer>",
+    "</answer>",
+    "<THINK>",
+    "</Answer>",
+    "<|begin_of_box|>",
+    "<|END_OF_BOX|>",
+    "\\boxed{",
+    "\\BOXED{",
+    "}",
+    " ",
+    "\n",
+    "x",
+    "<",
+    "thin",
+    "K",
+    "İ",
+    "<thinK>",
+]
+
+
+def _reference_format(response):
+    """The format check before the single-pass parser."""
+    match = _THINK_ANSWER_PATTERN.search(response)
+    if match is None:
+        return False
+    think_part = match.group(1).strip()
+    answer_part = match.group(2).strip()
+    if (
+        answer_part.lower().count("<|begin_of_box|>") > 1
+        or answer_part.lower().count("<|end_of_box|>") > 1
+        or answer_part.lower().count("\\boxed{") > 0
+    ):
+        return False
+    avoid_tags = ["<think>", "</think>", "<answer>", "</answer>"]
+    return not (
+        any(tag in think_part.lower() for tag in avoid_tags) or any(tag in answer_part.lower() for tag in avoid_tags)
+    )
+
+
+def _reference_answer(response):
+    """The answer part extracted by e.g. `MathVerifier` before the single-pass parser."""
+    match = _THINK_ANSWER_PATTERN.search(response)
+    if match is None:
+        return None
+    think_part = match.group(1).strip()
+    answer_part = match.group(2).strip()
+    avoid_tags = ["<think>", "</think>", "<answer>", "</answer>"]
+    if any(tag in think_part.lower() for tag in avoid_tags) or any(tag in answer_part.lower() for tag in avoid_tags):
+        return None
+    return answer_part
+
+
+def _reference_text_after_think(response, avoid_tags):
+    """The text after the think part extracted by e.g. `OCRVerifier` and `CountingVerifier`."""
+    match = _THINK_PATTERN.search(response)
+    if match is None:
+        return None
+    think_part = match.group(1).strip()
+    answer_part = match.group(2).strip()
+    if any(tag in think_part.lower() for tag in avoid_tags):
+        return None
+    if "<answer>" in avoid_tags and any(tag in answer_part.lower() for tag in avoid_tags):
+        return None
+    return answer_part
+
+
+def _parsed_text_after_think(parsed, with_answer_tags):
+    if with_answer_tags and (parsed.think_has_answer_tags or parsed.text_after_think_has_tags):
+        return None
+    return parsed.text_after_think
+
+
+def _assert_equivalent(response):
+    parsed = ParsedResponse(response)
+    assert parsed.has_valid_format() == _reference_format(response), response
+    assert parsed.answer == _reference_answer(response), response
+    assert _parsed_text_after_think(parsed, False) == _reference_text_after_think(response, ["<think>", "</think>"])
+    assert _parsed_text_after_think(parsed, True) == _reference_text_after_think(
+        response, ["<think>", "</think>", "<answer>", "</answer>"]
+    )
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        "<think>a</think><answer>b</answer>",
+        "<think>a</think> \n <answer> <|begin_of_box|>b<|end_of_box|> </answer>\n",
+        "<think>a</think><answer>b</answer>\n\n",
+        "<THINK>a</Think><Answer>b</ANSWER>",
+        "<think>a</think><answer>\\boxed{b}</answer>",
+        "<think>a</think><answer><|begin_of_box|>b<|end_of_box|><|begin_of_box|>c<|end_of_box|></answer>",
+        "<think>a<answer></think><answer>b</answer>",
+        "<think>a</think><answer>b</answer></think><answer>c</answer>",
+        "<think>a</think>b",
+        "<think><think>a</think>b",
+        "<thinK>a</think><answer>b</answer>",
+        "<think>a</thinK><answer>b</answer>",
+        " <think>a</think><answer>b</answer>",
+        "",
+    ],
+)
+def test_matches_the_regex_checks(response):
+    _assert_equivalent(response)
+
+
+def test_matches_the_regex_checks_on_random_responses():
+    rng = random.Random(0)
+    for _ in range(5000):
+        fragments = rng.choices(_FRAGMENTS, k=rng.randint(0, 12))
+        if rng.random() < 0.7:
+            fragments = [
+                "<think>",
+                *fragments[:4],
+                "</think>",
+                *fragments[4:8],
+                "<answer>",
+                *fragments[8:],
+                "</answer>",
+            ]
+        _assert_equivalent("".join(fragments))
+
+
+def test_parse_is_shared_by_the_same_response():
+    response = "<think>a</think><answer>b</answer>"
+    other_response = "<think>c</think><answer>d</answer>"
+    parsed = parse_response(response)
+    parse_response(other_response)
+    assert parse_response(response) is parsed
+    # * an equal string object is parsed again
+    assert parse_response("".join(["<think>a</think>", "<answer>b</answer>"])) is not parsed
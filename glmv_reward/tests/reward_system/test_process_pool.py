@@ -0,0 +1,71 @@
+import asyncio
+
+import msgspec
+import pytest
+
+from glmv_reward import reward_system as reward_system_module
+from glmv_reward.reward_system import RewardSystem
+from glmv_reward.utils.hedging import get_hedging_policy
+from glmv_reward.utils.judge_cache import get_judge_cache
+from glmv_reward.utils.llm_batch import get_judge_batcher
+from glmv_reward.utils.replica_pool import get_replica_pool
+
+
+@pytest.fixture(scope="module")
+def process_reward_system(load_config):
+    return RewardSystem(load_config(executor_type="process", num_process_workers=2))
+
+
+def test_process_pool_matches_thread_pool(reward_system_instance, process_reward_system, math_response):
+    inputs = {
+        "prompts": ["What is 3/2?", "Say hi.", "What is 3/2?", "What is 3/2?"],
+        "answers": [
+            math_response("1.5"),
+            math_response("hi"),
+            "1.5",
+            "<think>Two boxes.</think><answer><|begin_of_box|>1<|end_of_box|><|begin_of_box|>2<|end_of_box|></answer>",
+        ],
+        "gt_answers": [math_response("1.5"), math_response("hi"), math_response("1.5"), math_response("1.5")],
+        "datasources": ["math", "language_mix", "math", "math"],
+        "return_extracted_answers": True,
+    }
+
+    expected = reward_system_instance.get_reward(**inputs)
+    assert process_reward_system.get_reward(**inputs) == expected
+    assert asyncio.run(process_reward_system.aget_reward(**inputs)) == expected
+
+
+def test_llm_judge_runs_in_main_process(process_reward_system, fake_judge, math_response):
+    # the worker processes are spawned, so only the requests of the main process are faked
+    rewards = process_reward_system.get_reward(
+        prompts=["What is 7/2?"],
+        answers=[math_response("7/2")],
+        gt_answers=[math_response("3.5")],
+        datasources=["math"],
+    )
+
+    assert rewards == [1.0]
+    assert len(fake_judge.requests) > 0
+
+
+def test_worker_skips_the_llm_judge_setup(load_config, tmp_path, monkeypatch):
+    reward_config = load_config(
+        llm_cache_path=str(tmp_path / "judge.sqlite"),
+        llm_replica_pools={"http://judge/": ["http://a/", "http://b/"]},
+        enable_llm_hedging=True,
+        enable_llm_batching=True,
+    )
+    monkeypatch.setattr(reward_system_module, "_WORKER_REWARD_SYSTEM", None)
+
+    reward_system_module._init_process_worker(msgspec.msgpack.encode(reward_config))
+    worker_reward_system = reward_system_module._WORKER_REWARD_SYSTEM
+    try:
+        assert get_judge_cache() is None
+        assert get_replica_pool("http://judge/") is None
+        assert get_hedging_policy("http://judge/") is None
+        assert get_judge_batcher() is None
+        executor_stats = worker_reward_system.get_executor_stats()
+        assert executor_stats["cpu"].max_workers == 1
+        assert executor_stats["io"].max_workers == 1
+    finally:
+        worker_reward_system.close()
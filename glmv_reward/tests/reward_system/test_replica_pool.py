@@ -0,0 +1,122 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from glmv_reward.reward_system import RewardSystem
+from glmv_reward.utils import replica_pool
+from glmv_reward.utils.llm import LLMClientOptions, configure_llm_clients, post_query_llm
+from glmv_reward.utils.replica_pool import ReplicaPool, ReplicaPoolOptions, configure_replica_pools, get_replica_pool
+
+
+@pytest.fixture
+def no_retries():
+    configure_llm_clients(LLMClientOptions(max_retries=0))
+    yield
+    configure_llm_clients(LLMClientOptions())
+    configure_replica_pools({})
+
+
+def test_least_outstanding_spreads_requests():
+    pool = ReplicaPool(["http://a/", "http://b/"])
+
+    urls = [pool.acquire() for _ in range(4)]
+    assert sorted(urls) == ["http://a/", "http://a/", "http://b/", "http://b/"]
+
+    pool.release("http://a/", 0.1, succeeded=True)
+    pool.release("http://a/", 0.1, succeeded=True)
+    assert pool.acquire() == "http://a/"
+    assert pool.stats()["http://a/"]["outstanding"] == 1
+    assert pool.stats()["http://b/"]["outstanding"] == 2
+
+
+def test_ewma_prefers_fast_replicas():
+    pool = ReplicaPool(["http://fast/", "http://slow/"], ReplicaPoolOptions(strategy="ewma"))
+    for url, latency in [("http://fast/", 0.1), ("http://slow/", 0.25)]:
+        pool.release(pool.acquire(exclude={"http://fast/", "http://slow/"} - {url}), latency, succeeded=True)
+
+    urls = [pool.acquire() for _ in range(5)]
+    # a replica is picked while its latency times its requests in flight is the lowest
+    assert urls == ["http://fast/", "http://fast/", "http://slow/", "http://fast/", "http://fast/"]
+
+
+def test_failing_replicas_are_ejected():
+    pool = ReplicaPool(["http://a/", "http://b/"], ReplicaPoolOptions(max_failures=2, ejection_time=60))
+
+    for _ in range(2):
+        pool.release(pool.acquire(exclude={"http://b/"}), 0.1, succeeded=False)
+    assert pool.stats()["http://a/"]["ejected"]
+    assert {pool.acquire() for _ in range(4)} == {"http://b/"}
+    # all the replicas are used if all of them are excluded or ejected
+    assert pool.acquire(exclude={"http://b/"}) == "http://a/"
+
+
+def test_health_checks_eject_and_readmit_replicas(monkeypatch):
+    healthy = {"http://a/health": False, "http://b/health": True}
+
+    def fake_get(session, url, **kwargs):
+        return SimpleNamespace(ok=healthy[url])
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    pool = ReplicaPool(
+        ["http://a/v1/chat/completions", "http://b/v1/chat/completions"], ReplicaPoolOptions(health_check_interval=0.02)
+    )
+    try:
+        time.sleep(0.2)
+        assert pool.stats()["http://a/v1/chat/completions"]["ejected"]
+        assert not pool.stats()["http://b/v1/chat/completions"]["ejected"]
+
+        healthy["http://a/health"] = True
+        time.sleep(0.2)
+        assert not pool.stats()["http://a/v1/chat/completions"]["ejected"]
+    finally:
+        pool.close()
+
+
+def test_post_query_llm_fails_over_to_other_replicas(fake_judge, monkeypatch, no_retries):
+    def reply(url, payload):
+        if url == "http://down/":
+            raise requests.exceptions.ConnectionError
+        return "1.0"
+
+    fake_judge.reply = reply
+    # the idle replicas are picked in order
+    monkeypatch.setattr(replica_pool.random, "shuffle", lambda candidates: None)
+    pool = ReplicaPool(["http://down/", "http://up/"], ReplicaPoolOptions(max_failures=1))
+    configure_replica_pools({"http://judge/": pool})
+
+    for index in range(4):
+        assert post_query_llm(f"prompt {index}", "key", url="http://judge/") == "1.0"
+
+    # the failed replica is ejected after its first failure, the logical URL is never requested
+    assert [url for url, _ in fake_judge.requests] == ["http://down/"] + ["http://up/"] * 4
+    stats = pool.stats()
+    assert stats["http://down/"]["ejected"]
+    assert stats["http://up/"]["requests"] == 4
+
+
+def test_reward_systems_keep_the_replica_pools_of_each_other(load_config):
+    first_config = load_config(
+        llm_replica_pools={"http://judge/": ["http://a/", "http://b/"], "http://other/": ["http://c/"]}
+    )
+    with RewardSystem(first_config) as reward_system:
+        judge_pool = get_replica_pool("http://judge/")
+        other_pool = get_replica_pool("http://other/")
+        assert judge_pool is not None
+        assert other_pool is not None
+
+        second_config = load_config(llm_replica_pools={"http://judge/": ["http://d/"], "http://third/": ["http://e/"]})
+        with RewardSystem(second_config) as another_reward_system:
+            # the pools are merged, a URL keeps the pool registered first
+            assert get_replica_pool("http://judge/") is judge_pool
+            assert get_replica_pool("http://third/") is not None
+            assert sorted(another_reward_system.get_replica_stats()) == ["http://third/"]
+
+        assert get_replica_pool("http://judge/") is judge_pool
+        assert get_replica_pool("http://other/") is other_pool
+        assert get_replica_pool("http://third/") is None
+        assert not judge_pool._closed.is_set()
+        assert sorted(reward_system.get_replica_stats()) == ["http://judge/", "http://other/"]
+    assert get_replica_pool("http://judge/") is None
+    assert judge_pool._closed.is_set()
@@ -0,0 +1,97 @@
+import random
+
+import pytest
+
+from glmv_reward.utils.response import ParsedResponse, StreamingValidator
+from glmv_reward.utils.text import StreamingRepeatDetector, detect_repeat
+
+_TAGS = ["<think>", "</think>", "<answer>", "</answer>", "<|begin_of_box|>", "<|end_of_box|>", "\\boxed{"]
+_FRAGMENTS = [*_TAGS, "<THINK>", "</Answer>", " ", "\n", "x", "<", "ans", "K", "\u212a", "ab", "==", "|-|"]
+_TAILS = ["", "\n", "x", "</answer>", "</answer>\n", "<answer>x</answer>", "</think><answer>x</answer>"]
+
+
+def _completions(prefix):
+    """Continuations which finish a tag cut at the end of the prefix, then close the response."""
+    completions = set(_TAILS)
+    for tag in _TAGS:
+        for length in range(1, len(tag)):
+            if prefix.lower().endswith(tag[:length]):
+                completions.update(tag[length:] + tail for tail in _TAILS)
+                completions.update(tag[length:] + "x</think><answer>x</answer>" for tail in _TAILS)
+    return completions
+
+
+def _split(text, rng):
+    cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, rng.randint(0, 6))))
+    return [text[start:end] for start, end in zip([0, *cuts], [*cuts, len(text)], strict=True)]
+
+
+def _random_response(rng):
+    fragments = rng.choices(_FRAGMENTS, k=rng.randint(0, 10))
+    if rng.random() < 0.7:
+        fragments = ["<think>", *fragments[:3], "</think>", *fragments[3:5], "<answer>", *fragments[5:], "</answer>"]
+    return "".join(fragments)
+
+
+@pytest.mark.parametrize(
+    ("chunks", "failure"),
+    [
+        (["<think>a</think>\n", "<answer><|begin_of_box|>1<|end_of_box|></answer>", "\n"], None),
+        (["<th", "ink>a <answer>"], "format"),
+        (["Sure! <think>"], "format"),
+        (["<think>a</think> b"], "format"),
+        (["<think>a</think><answer>", "<|begin_of_box|>1<|end_of_box|><|begin", "_of_box|>"], "format"),
+        (["<think>a</think><answer>\\box", "ed{1}"], "format"),
+        (["<think>a</think><answer>1</answer>", "\n", "\n"], "format"),
+        (["<think>", "I will check it again. " * 30], "repetition"),
+    ],
+)
+def test_streaming_validator(chunks, failure):
+    validator = StreamingValidator()
+    results = [validator(chunk) for chunk in chunks]
+    assert validator.failure == failure
+    assert results[-1] == (failure is not None)
+    assert results[:-1] == [False] * (len(chunks) - 1)
+
+
+def test_streaming_validator_never_rejects_a_valid_completion():
+    rng = random.Random(0)
+    for _ in range(3000):
+        response = _random_response(rng)
+        validator = StreamingValidator(check_repetition=False)
+        prefix = ""
+        for chunk in _split(response, rng):
+            prefix += chunk
+            if validator.feed(chunk):
+                break
+        else:
+            continue
+
+        for completion in _completions(prefix):
+            assert not ParsedResponse(prefix + completion).has_valid_format(), (prefix, completion)
+
+
+def test_streaming_validator_rejects_text_after_the_answer():
+    rng = random.Random(0)
+    for _ in range(1000):
+        response = _random_response(rng) + "\nx"
+        # * an unclosed part may still be closed, and the Kelvin sign is left to the offline check
+        if "</think>" not in response.lower() or "</answer>" not in response.lower() or "\u212a" in response:
+            continue
+        validator = StreamingValidator(check_repetition=False)
+        assert any(validator.feed(chunk) for chunk in _split(response, rng)), response
+
+
+def test_streaming_repeat_detector_matches_detect_repeat():
+    rng = random.Random(0)
+    fragments = ["ab", "a", "b", "=", "|", "-", "|-|", "  ", " ", "..", "█"]
+    for _ in range(2000):
+        text = "".join(rng.choices(fragments, k=rng.randint(0, 60)))
+        detector = StreamingRepeatDetector(min_chars=3, min_repetition=3, exclude_length=2, check_interval=1)
+        results = [detector.feed(chunk) for chunk in _split(text, rng)]
+        if any(results):
+            # * whatever follows, the text stays repetitive
+            for tail in ["", "=", "-|", " ", "x"]:
+                assert detect_repeat(text + tail, min_chars=3, min_repetition=3, exclude_length=2), text + tail
+        # * a final character outside the formatting characters settles the whole text
+        assert detector.feed("x") == detect_repeat(text + "x", min_chars=3, min_repetition=3, exclude_length=2)
@@ -0,0 +1,158 @@
+import random
+import re
+import sys
+
+import pytest
+
+from glmv_reward.utils import text as text_utils
+from glmv_reward.utils.text import (
+    detect_long_paragraph_mixing,
+    detect_long_paragraph_mixings,
+    detect_repeat,
+    detect_repeats,
+    find_boxed_content,
+    find_boxed_content_with_boxed,
+)
+
+
+def _reference_find_boxed_content_with_boxed(text):
+    """The character loop before the linear-time scanner."""
+    results = []
+    i = 0
+    while i < len(text):
+        if text[i : i + 7] == "\\boxed{":
+            i += 7
+            content = ""
+            brace_count = 1
+            while i < len(text) and brace_count > 0:
+                if text[i] == "{":
+                    brace_count += 1
+                elif text[i] == "}":
+                    brace_count -= 1
+                if brace_count > 0:
+                    content += text[i]
+                i += 1
+            results.append(content)
+        else:
+            i += 1
+    return results
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("\\boxed{42} and \\boxed{43}", ["42", "43"]),
+        ("\\boxed{\\boxed{\\boxed{42}}}", ["\\boxed{\\boxed{42}}"]),
+        ("\\boxed{\\frac{1}{2}}", ["\\frac{1}{2}"]),
+        ("\\boxed{unclosed {", ["unclosed {"]),
+        ("\\boxed{}} \\boxed{", ["", ""]),
+        ("no box}", []),
+    ],
+)
+def test_find_boxed_content_with_boxed(text, expected):
+    assert find_boxed_content_with_boxed(text) == expected
+
+
+def test_find_boxed_content_with_boxed_matches_the_character_loop():
+    rng = random.Random(0)
+    fragments = ["\\boxed{", "{", "}", "x", " ", "\\boxed", "\\"]
+    for _ in range(5000):
+        text = "".join(rng.choices(fragments, k=rng.randint(0, 16)))
+        assert find_boxed_content_with_boxed(text) == _reference_find_boxed_content_with_boxed(text), text
+
+
+def test_find_boxed_content_falls_back_to_box_tokens():
+    assert find_boxed_content("<|begin_of_box|> 42 <|end_of_box|>") == ["42"]
+    assert find_boxed_content("\\boxed{1} <|begin_of_box|>42<|end_of_box|>") == ["1"]
+
+
+def _reference_detect_repeat(text, min_chars=50, min_repetition=10, exclude_length=3):
+    """The sliding window before the rolling hash."""
+    text = re.sub(r"\|[-]+\|", "|", text)
+    for ch in ["=", "|", "-", "~", "_", "#", "*", ".", "%", "－", "█", " ", "─"]:
+        text = re.sub(rf"{re.escape(ch)}{{{exclude_length},}}", "", text)
+    times = {}
+    for i in range(min_chars, len(text) + 1):
+        sub = text[i - min_chars : i]
+        times[sub] = times.get(sub, 0) + 1
+        if times[sub] >= min_repetition:
+            return True
+    return False
+
+
+def test_detect_repeat():
+    assert detect_repeat("I will check it again. " * 30)
+    assert not detect_repeat("".join(f"step {index}: x = {index * index}\n" for index in range(100)))
+    # * the formatting runs are removed first, e.g. table rules
+    assert not detect_repeat("|" + "-" * 1000 + "|" + "=" * 1000)
+    with pytest.raises(ValueError, match="min_repetition"):
+        detect_repeat("text", min_repetition=1)
+
+
+@pytest.mark.parametrize(
+    ("min_chars", "min_repetition", "exclude_length"), [(3, 3, 3), (5, 2, 2), (1, 4, 1), (2, 3, 0)]
+)
+def test_detect_repeats_matches_the_sliding_window(min_chars, min_repetition, exclude_length):
+    rng = random.Random(0)
+    fragments = ["ab", "a", "b", "=", "|", "-", "|-|", "  ", " ", "..", "█", "中"]
+    texts = ["".join(rng.choices(fragments, k=rng.randint(0, 60))) for _ in range(2000)]
+    expected = [_reference_detect_repeat(text, min_chars, min_repetition, exclude_length) for text in texts]
+    assert detect_repeats(texts, min_chars, min_repetition, exclude_length) == expected
+    assert [detect_repeat(text, min_chars, min_repetition, exclude_length) for text in texts[:200]] == expected[:200]
+
+
+def _reference_detect_long_paragraph_mixing(text, min_chinese_chars=50, min_english_words=200):
+    """The regular expressions on each paragraph before the single pass."""
+    paragraphs = [p.strip() for p in re.split(r"\n{2,}", text) if p.strip()]
+    has_long_chinese = False
+    has_long_english = False
+    for para in paragraphs:
+        chinese_count = len(re.findall(r"[\u4e00-\u9fff]", para))
+        english_count = len(re.findall(r"\b[a-zA-Z]{2,}\b", para))
+        if chinese_count >= min_chinese_chars and chinese_count / len(para) > 0.8:
+            has_long_chinese = True
+        if english_count >= min_english_words and english_count / (len(para.split()) + 1e-5) > 0.7:
+            has_long_english = True
+    return has_long_chinese and has_long_english
+
+
+def _random_paragraphs(rng):
+    chinese = ["中", "文", "鿿", "。", " ", "1", "ab"]
+    english = ["ab ", "word ", "x ", "Ab1 ", "中 ", "_ab ", "abé ", "\n", "\u3000", "\xa0"]
+    separators = ["\n\n", "\n\n\n", " \n\n \n", "\n"]
+    return "".join(
+        "".join(rng.choices(rng.choice([chinese, english]), k=rng.randint(0, 12))) + rng.choice(separators)
+        for _ in range(rng.randint(0, 4))
+    )
+
+
+def test_detect_long_paragraph_mixing():
+    english = " ".join(["the value of x is one"] * 50)
+    chinese = "因此答案是一" * 10
+    assert detect_long_paragraph_mixing(f"{chinese}\n\n{english}")
+    assert not detect_long_paragraph_mixing(f"{chinese}\n{english}")
+    assert not detect_long_paragraph_mixing(f"{english}\n\n{english}")
+    # * the words next to CJK characters or digits are no words
+    assert not detect_long_paragraph_mixing(f"{chinese}\n\n{english.replace(' ', '1 ')}")
+
+
+@pytest.mark.parametrize("block_length", [1, 5, 4096])
+@pytest.mark.parametrize(("min_chinese_chars", "min_english_words"), [(1, 1), (2, 2), (3, 1), (0, 0), (-1, 2)])
+def test_detect_long_paragraph_mixings_matches_the_regular_expressions(
+    monkeypatch, block_length, min_chinese_chars, min_english_words
+):
+    monkeypatch.setattr(text_utils, "_MIXING_BLOCK_LENGTH", block_length)
+    rng = random.Random(0)
+    texts = [_random_paragraphs(rng) for _ in range(2000)]
+    expected = [_reference_detect_long_paragraph_mixing(text, min_chinese_chars, min_english_words) for text in texts]
+    assert detect_long_paragraph_mixings(texts, min_chinese_chars, min_english_words) == expected
+    assert [
+        detect_long_paragraph_mixing(text, min_chinese_chars, min_english_words) for text in texts[:200]
+    ] == expected[:200]
+
+
+def test_whitespace_table_matches_str_isspace():
+    table = text_utils._WHITESPACE_TABLE
+    assert [code for code in range(sys.maxunicode + 1) if chr(code).isspace()] == [
+        code for code in range(len(table) - 1) if table[code]
+    ]
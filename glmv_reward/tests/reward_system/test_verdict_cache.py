@@ -0,0 +1,87 @@
+import pytest
+
+from glmv_reward.reward_system import RewardSystem
+from glmv_reward.utils.cache import LRUCache
+
+
+@pytest.fixture
+def llm_calls(fake_judge):
+    return fake_judge.requests
+
+
+@pytest.fixture
+def get_reward(math_response):
+    def get_reward_of_answer(reward_system, answer, current_iteration=0):
+        return reward_system.get_reward(
+            prompts=["What is 3/2?"],
+            answers=[math_response(answer)],
+            gt_answers=[math_response("1.5")],
+            datasources=["math"],
+            current_iteration=current_iteration,
+        )
+
+    return get_reward_of_answer
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.size) == (2, 1, 2)
+    assert stats.hit_rate == pytest.approx(2 / 3)
+
+
+def test_verdict_cache_skips_repeated_judges(llm_calls, get_reward, load_config):
+    with RewardSystem(load_config()) as reward_system:
+        assert get_reward(reward_system, "3/2") == [1.0]
+        num_llm_calls = len(llm_calls)
+        assert num_llm_calls > 0
+
+        # the surrounding whitespaces are ignored
+        assert get_reward(reward_system, " 3/2 ") == [1.0]
+        assert len(llm_calls) == num_llm_calls
+        stats = reward_system.get_verdict_cache_stats()
+        assert (stats.hits, stats.misses, stats.size) == (1, 1, 1)
+
+        # the cache is cleared in a new iteration
+        assert get_reward(reward_system, "3/2", current_iteration=1) == [1.0]
+        assert len(llm_calls) == 2 * num_llm_calls
+
+
+def test_failed_judges_are_not_cached(fake_judge, get_reward, load_config, llm_client_options):
+    replies = [500, "1.0"]
+    fake_judge.reply = lambda url, payload: replies.pop(0)
+
+    with RewardSystem(load_config(persist_verdict_cache=True)) as reward_system:
+        llm_client_options(max_retries=0)
+        # a failed request is not a wrong answer, the next rollout with the same answer is judged again
+        assert get_reward(reward_system, "3/2") == [0.0]
+        assert reward_system.get_verdict_cache_stats().size == 0
+        assert get_reward(reward_system, "3/2") == [1.0]
+        assert get_reward(reward_system, "3/2") == [1.0]
+        assert len(fake_judge.requests) == 2
+
+
+def test_verdict_cache_persists_across_iterations(llm_calls, get_reward, load_config):
+    with RewardSystem(load_config(persist_verdict_cache=True)) as reward_system:
+        get_reward(reward_system, "3/2", current_iteration=0)
+        num_llm_calls = len(llm_calls)
+        get_reward(reward_system, "3/2", current_iteration=1)
+
+    assert len(llm_calls) == num_llm_calls
+
+
+def test_verdict_cache_can_be_disabled(llm_calls, get_reward, load_config):
+    with RewardSystem(load_config(verdict_cache_size=0)) as reward_system:
+        get_reward(reward_system, "3/2")
+        num_llm_calls = len(llm_calls)
+        get_reward(reward_system, "3/2")
+
+        assert reward_system.get_verdict_cache_stats() is None
+    assert len(llm_calls) == 2 * num_llm_calls